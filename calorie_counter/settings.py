@@ -42,11 +42,17 @@ STORAGES = {
     "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
 }
 
+# --- Uploaded / generated files ---
+# Background exports (tracker.ExportJob) land under MEDIA_ROOT/exports/. They
+# are served through an authenticated view, never directly via MEDIA_URL.
+MEDIA_URL = "media/"
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", str(BASE_DIR / "media"))
+
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # <--- right after SecurityMiddleware
+    "calorie_counter.middleware.AsyncWhiteNoiseMiddleware",  # <--- WhiteNoise, right after SecurityMiddleware
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -87,6 +93,78 @@ if DATABASE_URL:
         "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600, ssl_require=False)
     }
 
+# --- Caches ---
+# Food search results get their own cache so it can be sized or moved to a
+# shared backend on its own, e.g.
+#   FOOD_SEARCH_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   FOOD_SEARCH_CACHE_LOCATION=/var/tmp/nutramigo-food-search
+# (for DatabaseCache, LOCATION is the table name; run `manage.py createcachetable`).
+# LocMemCache evicts least-recently-used entries once MAX_ENTRIES is reached.
+FOOD_SEARCH_CACHE_TTL = int(os.getenv("FOOD_SEARCH_CACHE_TTL", "86400"))  # seconds
+# After FOOD_SEARCH_CACHE_TTL an entry is stale: still served instantly while a
+# background refresh runs, for up to this many extra seconds.
+FOOD_SEARCH_STALE_TTL = int(os.getenv("FOOD_SEARCH_STALE_TTL", str(7 * 86400)))
+# The dashboard's data is cached per (user, day, data version); any Meal, Goal
+# or FavoriteFood write bumps the version, so entries never go stale and the
+# TTL only bounds memory. The version lives in the database (DataVersion), not
+# in this cache, so writes from other workers, management commands and imports
+# invalidate too, whatever the backend. LocMemCache is safe but per process
+# (each worker warms its own copy); use a shared backend to share entries.
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "3600"))  # seconds
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "dashboard": {
+        "BACKEND": os.getenv("DASHBOARD_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("DASHBOARD_CACHE_LOCATION", "dashboard"),
+        "TIMEOUT": DASHBOARD_CACHE_TTL,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "5000")),
+        },
+    },
+    "food_search": {
+        "BACKEND": os.getenv("FOOD_SEARCH_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("FOOD_SEARCH_CACHE_LOCATION", "food-search"),
+        "TIMEOUT": FOOD_SEARCH_CACHE_TTL,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("FOOD_SEARCH_CACHE_MAX_ENTRIES", "5000")),
+        },
+    },
+}
+
+# Browser caching (Cache-Control max-age, seconds) for food search results.
+# Dashboard and coach responses are always revalidated with their ETag.
+FOOD_SEARCH_BROWSER_TTL = int(os.getenv("FOOD_SEARCH_BROWSER_TTL", "300"))
+
+# Where /api/food-search/ looks: "local-first" (catalog, then OpenFoodFacts
+# when the catalog has no hit), "local" (catalog only) or "remote".
+# Load the catalog with `manage.py import_food_catalog <dump>`.
+FOOD_SEARCH_MODE = os.getenv("FOOD_SEARCH_MODE", "local-first")
+
+# OpenFoodFacts HTTP client (one pooled keep-alive session per process).
+# Point FOOD_API_BASE_URL at a local stub server for tests/benchmarks.
+FOOD_API_BASE_URL = os.getenv("FOOD_API_BASE_URL", "https://world.openfoodfacts.org")
+# Keep FOOD_API_POOL_SIZE >= FOOD_API_ASYNC_THREADS (or the sync worker
+# threads), or connections beyond the pool are opened and discarded per call.
+FOOD_API_POOL_SIZE = int(os.getenv("FOOD_API_POOL_SIZE", "100"))
+FOOD_API_RETRIES = int(os.getenv("FOOD_API_RETRIES", "2"))                    # connect errors / 502-504 only
+FOOD_API_BACKOFF = float(os.getenv("FOOD_API_BACKOFF", "0.2"))              # seconds
+FOOD_API_CONNECT_TIMEOUT = float(os.getenv("FOOD_API_CONNECT_TIMEOUT", "2"))  # seconds
+FOOD_API_READ_TIMEOUT = float(os.getenv("FOOD_API_READ_TIMEOUT", "5"))        # seconds
+# Circuit breaker: after N consecutive upstream failures, skip OpenFoodFacts
+# for FOOD_API_BREAKER_RESET seconds and serve cached/local results instead.
+FOOD_API_BREAKER_THRESHOLD = int(os.getenv("FOOD_API_BREAKER_THRESHOLD", "5"))
+FOOD_API_BREAKER_RESET = float(os.getenv("FOOD_API_BREAKER_RESET", "30"))   # seconds
+# Threads backing the async search view (api/food-search/async/) under ASGI.
+FOOD_API_ASYNC_THREADS = int(os.getenv("FOOD_API_ASYNC_THREADS", "100"))
+
+# --- Coach ---
+# COACH_SOLVER=1 adds an "Optimized Plan" (macro-error solver) to every
+# suggestion; otherwise clients opt in per request with solver=1.
+COACH_SOLVER = os.getenv("COACH_SOLVER", "False").lower() in ("1", "true", "yes")
+COACH_SOLVER_DEADLINE_MS = float(os.getenv("COACH_SOLVER_DEADLINE_MS", "50"))
+
 # --- Auth ---
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
@@ -0,0 +1,93 @@
+# tracker/management/commands/_off_stub.py
+"""
+Tiny stand-in for the OpenFoodFacts search API, for tests and benchmarks.
+
+    with StubOFFServer(products, latency=0.2) as stub:
+        client = FoodApiClient(base_url=stub.url)
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.requests += 1
+        stub.peers.add(self.client_address)
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        url = urlparse(self.path)
+        if stub.fail_status:
+            body, status = b"{}", stub.fail_status
+        elif url.path.rstrip("/") == "/cgi/search.pl":
+            qs = parse_qs(url.query)
+            terms = (qs.get("search_terms", [""])[0]).lower()
+            size = int(qs.get("page_size", ["10"])[0])
+            hits = [p for p in stub.products if terms in (p.get("product_name") or "").lower()]
+            body, status = json.dumps({"products": hits[:size]}).encode(), 200
+        elif url.path.startswith("/api/v2/product/"):
+            code = url.path.rsplit("/", 1)[-1].removesuffix(".json")
+            p = next((p for p in stub.products if p.get("code") == code), None)
+            payload = {"status": 1, "code": code, "product": p} if p else {"status": 0, "code": code}
+            body, status = json.dumps(payload).encode(), 200 if p else 404
+        else:
+            body, status = b"{}", 404
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512    # benchmarks open hundreds of connections at once
+
+    def handle_error(self, request, client_address):
+        # a client that timed out and hung up before a slow reply is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubOFFServer:
+    def __init__(self, products=(), latency=0.0, host="127.0.0.1", port=0):
+        self.products = list(products)
+        self.latency = latency
+        self.fail_status = None     # set to e.g. 503 to simulate an outage
+        self.requests = 0
+        self.peers = set()          # distinct client (host, port) = TCP connections
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
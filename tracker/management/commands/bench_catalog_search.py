@@ -0,0 +1,77 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from tracker.templates.tracker.services.food_catalog import index_products, search_local
+
+WORDS = [
+    "banana", "bread", "chicken", "breast", "rice", "brown", "white", "oat", "oats", "milk",
+    "greek", "yogurt", "apple", "juice", "peanut", "butter", "cheese", "cheddar", "tomato", "sauce",
+    "pasta", "whole", "wheat", "chocolate", "dark", "orange", "salmon", "tuna", "egg", "bar",
+]
+BRANDS = ["Acme", "Bonne Maman", "Carrefour", "Danone", "Heinz", "Kellogg's", "Nestlé", "Tesco"]
+QUERIES = ["ba", "ban", "banana", "banana br", "chick brea", "greek yog", "peanut butt", "zz", "tesco milk", "rice"]
+
+
+def synthetic_products(n, seed=0):
+    rnd = random.Random(seed)
+    for i in range(n):
+        name = " ".join(rnd.sample(WORDS, rnd.randint(1, 3)) + [f"x{rnd.randrange(50_000)}"])
+        yield {
+            "code": f"bench{i:09d}",
+            "product_name": name.title(),
+            "brands": rnd.choice(BRANDS),
+            "unique_scans_n": int(rnd.paretovariate(1.2)),
+            "nutriments": {"energy-kcal_100g": rnd.uniform(0, 900), "proteins_100g": rnd.uniform(0, 40),
+                           "carbohydrates_100g": rnd.uniform(0, 90), "fat_100g": rnd.uniform(0, 60)},
+        }
+
+
+class Command(BaseCommand):
+    help = ("Time search_local over a synthetic catalog of the given size (seeded inside "
+            "a transaction that is rolled back) and show the query plan of each query")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=200_000, help="Products to seed")
+        parser.add_argument("--reps", type=int, default=20)
+        parser.add_argument("--plan", action="store_true", help="Print EXPLAIN for every query")
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            t0 = time.perf_counter()
+            batch = []
+            for p in synthetic_products(opts["size"]):
+                batch.append(p)
+                if len(batch) == 5000:
+                    index_products(batch)
+                    batch = []
+            index_products(batch)
+            if connection.vendor == "sqlite":
+                with connection.cursor() as cur:
+                    cur.execute("ANALYZE")
+            self.stdout.write(f"seeded {opts['size']} products in {time.perf_counter() - t0:.1f}s")
+            self.stdout.write(f"{'query':<14} {'hits':>5} {'p50 ms':>8} {'max ms':>8}")
+            for q in QUERIES:
+                times = []
+                for _ in range(opts["reps"]):
+                    t0 = time.perf_counter()
+                    hits = search_local(q)
+                    times.append((time.perf_counter() - t0) * 1000)
+                self.stdout.write(f"{q:<14} {len(hits):>5} {statistics.median(times):>8.2f} {max(times):>8.2f}")
+                if opts["plan"]:
+                    self._explain(q)
+            transaction.set_rollback(True)
+
+    def _explain(self, q):
+        with CaptureQueriesContext(connection) as ctx:
+            search_local(q)
+        with connection.cursor() as cur:
+            for query in ctx.captured_queries:
+                prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+                cur.execute(prefix + query["sql"])
+                for row in cur.fetchall():
+                    self.stdout.write("    " + " ".join(str(x) for x in row))
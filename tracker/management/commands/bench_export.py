@@ -0,0 +1,70 @@
+import datetime as dt
+import sys
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from tracker.models import Meal
+from tracker.views import export_csv
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+
+def peak_rss():
+    """High-water RSS of this process in bytes (None where unsupported)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024     # KiB on Linux
+
+
+class Command(BaseCommand):
+    help = ("Measure peak memory of export_csv as meal count grows: Python allocations "
+            "(tracemalloc) and the process's peak RSS, which also counts C buffers "
+            "(database driver, csv module). Seeds a throwaway user inside a "
+            "transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("sizes", nargs="*", type=int, default=[1_000, 10_000, 100_000],
+                            help="Meal counts to test (e.g. 1000 10000 100000 1000000)")
+
+    def handle(self, *args, **opts):
+        # RSS is a process high-water mark: run sizes in increasing order
+        self.stdout.write(f"{'meals':>10} {'MB out':>8} {'secs':>7} {'peak MiB':>9} {'RSS MiB':>8}")
+        for n in opts["sizes"]:
+            with transaction.atomic():
+                user = get_user_model().objects.create(username=f"bench-export-{time.time_ns()}")
+                self._seed(user, n)
+                out_bytes, secs, peak = self._export(user)
+                transaction.set_rollback(True)
+            rss = peak_rss()
+            rss = f"{rss / 2**20:>8.1f}" if rss is not None else f"{'n/a':>8}"
+            self.stdout.write(f"{n:>10} {out_bytes / 1e6:>8.1f} {secs:>7.2f} {peak / 2**20:>9.2f} {rss}")
+
+    def _seed(self, user, n, batch=10_000):
+        start = dt.date(2000, 1, 1)
+        for i in range(0, n, batch):
+            Meal.objects.bulk_create(
+                Meal(user=user, name=f"Food {j % 500}", date=start + dt.timedelta(days=j // 5),
+                     calories=400, protein=30.5, carbs=42.0, fat=12.25)
+                for j in range(i, min(n, i + batch))
+            )
+
+    def _export(self, user):
+        request = RequestFactory().get("/export.csv")
+        request.user = user
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        resp = export_csv(request)
+        out = sum(len(chunk) for chunk in resp)   # what the WSGI server would do
+        secs = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return out, secs, peak
@@ -0,0 +1,121 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from tracker.templates.tracker.services.food_api import FoodApiClient, set_client
+from tracker.templates.tracker.services.search_cache import CACHE_ALIAS
+from tracker.management.commands._off_stub import StubOFFServer
+
+
+def _products(n):
+    # codes aren't barcodes, so remember_products leaves FoodItem untouched
+    return [
+        {"code": f"bench-{i}", "product_name": f"Banana {i}",
+         "nutriments": {"energy-kcal_100g": 89, "proteins_100g": 1.1,
+                        "carbohydrates_100g": 22.8, "fat_100g": 0.3}}
+        for i in range(n)
+    ]
+
+
+def _summary(label, workers, latencies, elapsed):
+    lat = sorted(latencies)
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+    return (f"{label:<12} {workers:>8} {len(lat):>8} {elapsed:>8.2f} {len(lat) / elapsed:>10.1f} "
+            f"{statistics.median(lat) * 1000:>8.1f} {p99 * 1000:>8.1f}")
+
+
+class Command(BaseCommand):
+    help = ("Compare sustained food searches/second through the real views: food_search "
+            "under WSGIHandler (django.test.Client) in worker threads vs food_search_async "
+            "under ASGIHandler (AsyncClient) on one event loop, at the same concurrency, "
+            "against a local stub upstream with injected latency. FOOD_SEARCH_MODE is "
+            "forced to 'remote' and every query is distinct, so each request misses the "
+            "search cache and goes upstream. Logs in as a throwaway user (deleted afterwards).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--latency", type=float, default=0.2, help="Stub upstream latency (s)")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 50, 200],
+                            help="In-flight requests: sync worker threads (gunicorn --threads) "
+                                 "and concurrent requests on the event loop")
+
+    def handle(self, *args, **opts):
+        n = opts["requests"]
+        user = get_user_model().objects.create(username=f"bench-search-{time.time_ns()}")
+        hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        try:
+            with StubOFFServer(_products(n), latency=opts["latency"]) as stub, \
+                    override_settings(FOOD_SEARCH_MODE="remote", ALLOWED_HOSTS=hosts):
+                self.stdout.write(f"stub upstream {stub.url}, latency {opts['latency'] * 1000:.0f} ms, "
+                                  f"{n} searches, {settings.FOOD_API_ASYNC_THREADS} async upstream threads\n")
+                self.stdout.write(f"{'view':<12} {'workers':>8} {'n':>8} {'secs':>8} {'search/s':>10} "
+                                  f"{'p50 ms':>8} {'p99 ms':>8}")
+                for c in opts["concurrency"]:
+                    set_client(FoodApiClient(base_url=stub.url, pool_size=c, retries=0))
+                    self.stdout.write(self._bench_sync(user, n, c))
+                    self.stdout.write(self._bench_async(user, n, c))
+        finally:
+            set_client(None)
+            user.delete()
+
+    def _login(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def _check(self, resp):
+        if resp.status_code != 200 or not resp.json()["results"]:
+            raise CommandError(f"food search answered {resp.status_code}: {resp.content[:200]!r}")
+
+    def _bench_sync(self, user, n, threads):
+        # every worker thread blocks in the view for the whole upstream round trip
+        caches[CACHE_ALIAS].clear()
+        url, login, local = reverse("food_search"), self._login(user), threading.local()
+
+        def one(i):
+            if not hasattr(local, "client"):
+                local.client = Client()
+                local.client.cookies = login.cookies
+            t0 = time.perf_counter()
+            self._check(local.client.get(url, {"q": f"banana {i}"}))
+            return time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = list(pool.map(one, range(n)))
+        elapsed = time.perf_counter() - t0
+        login.logout()
+        return _summary("wsgi-sync", threads, latencies, elapsed)
+
+    def _bench_async(self, user, n, concurrency):
+        caches[CACHE_ALIAS].clear()
+        url, login = reverse("food_search_async"), self._login(user)
+
+        async def run():
+            client = AsyncClient()
+            client.cookies = login.cookies
+            sem = asyncio.Semaphore(concurrency)
+            latencies = []
+
+            async def one(i):
+                async with sem:
+                    t0 = time.perf_counter()
+                    self._check(await client.get(url, {"q": f"banana {i}"}))
+                    latencies.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(n)))
+            return latencies, time.perf_counter() - t0
+
+        latencies, elapsed = asyncio.run(run())
+        login.logout()
+        return _summary("asgi-async", concurrency, latencies, elapsed)
@@ -0,0 +1,69 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.templates.tracker.services.ai_assistant import FOODS, Food, suggest_meals_reference
+from tracker.templates.tracker.services.food_library import TAG_BITS, FoodLibrary
+from tracker.templates.tracker.services.meal_solver import solve_plan
+
+NEED = {"kcal": 650, "p": 45, "c": 70, "f": 20}
+PREFS = [
+    {},
+    {"vegetarian": True},
+    {"vegan": True, "gluten_free": True},
+    {"no_dairy": True, "no_nuts": True},
+]
+
+
+def synthetic_foods(n, seed=0):
+    """The real library plus n - len(FOODS) random foods with plausible macros."""
+    rnd = random.Random(seed)
+    tags = list(TAG_BITS)
+    foods = list(FOODS[:n])
+    for i in range(n - len(foods)):
+        p, c, f = rnd.uniform(0, 35), rnd.uniform(0, 80), rnd.uniform(0, 40)
+        foods.append(Food(f"Food {i}", round(4 * p + 4 * c + 9 * f, 1), round(p, 1), round(c, 1), round(f, 1),
+                          set(rnd.sample(tags, rnd.randint(0, 3)))))
+    return foods
+
+
+def _time(fn, reps):
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+class Command(BaseCommand):
+    help = ("Time suggest_meals at several library sizes: per-object greedy vs the NumPy "
+            "food library, plus the optimizing solver under its deadline")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,10000,500000",
+                            help="Comma-separated library sizes")
+        parser.add_argument("--reps", type=int, default=5)
+        parser.add_argument("--deadline", type=float, default=50.0, help="Solver deadline (ms)")
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"{'foods':>8} {'build ms':>9} {'warm ms':>9} {'greedy ms':>10} {'numpy ms':>9} "
+                          f"{'speedup':>8} {'solver ms':>10}")
+        for n in (int(x) for x in opts["sizes"].split(",")):
+            foods = synthetic_foods(n)
+            t0 = time.perf_counter()
+            lib = FoodLibrary.from_foods(foods)
+            build = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            lib.warm()      # all 32 preference partitions
+            warm = (time.perf_counter() - t0) * 1000
+
+            reps = opts["reps"] if n <= 100_000 else max(1, opts["reps"] // 2)
+            greedy = _time(lambda: [suggest_meals_reference(NEED, p, foods) for p in PREFS], reps) / len(PREFS)
+            vector = _time(lambda: [lib.suggest(NEED, p) for p in PREFS], reps) / len(PREFS)
+            solver = _time(lambda: [solve_plan(NEED, p, lib=lib, deadline_ms=opts["deadline"]) for p in PREFS],
+                           reps) / len(PREFS)
+            self.stdout.write(f"{n:>8} {build:>9.1f} {warm:>9.1f} {greedy:>10.3f} {vector:>9.3f} "
+                              f"{greedy / vector:>7.1f}x {solver:>10.1f}")
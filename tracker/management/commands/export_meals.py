@@ -0,0 +1,48 @@
+import datetime as dt
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.models import Meal
+from tracker.templates.tracker.services.exports import ExportUnavailable, stream_export
+
+FORMATS = ("csv", "ndjson", "parquet", "arrow")
+
+
+class Command(BaseCommand):
+    help = "Bulk-export meals for all users (or some) as CSV, NDJSON, Parquet or Arrow IPC"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="parquet")
+        parser.add_argument("-o", "--output", default="-", help="File path, or - for stdout")
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only this user id (repeatable); default: everyone")
+        parser.add_argument("--start", type=dt.date.fromisoformat)
+        parser.add_argument("--end", type=dt.date.fromisoformat)
+
+    def handle(self, *args, **opts):
+        qs = Meal.objects.all()
+        if opts["user_ids"]:
+            qs = qs.filter(user_id__in=opts["user_ids"])
+        if opts["start"]:
+            qs = qs.filter(date__gte=opts["start"])
+        if opts["end"]:
+            qs = qs.filter(date__lte=opts["end"])
+
+        try:
+            chunks = stream_export(qs, opts["format"], with_user=True)
+        except ExportUnavailable as e:
+            raise CommandError(str(e))
+
+        out = sys.stdout.buffer if opts["output"] == "-" else open(opts["output"], "wb")
+        written = 0
+        try:
+            for chunk in chunks:
+                data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+                out.write(data)
+                written += len(data)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        if opts["output"] != "-":
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {opts['output']}."))
@@ -0,0 +1,35 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from tracker.templates.tracker.services.food_catalog import index_products, iter_dump
+
+
+class Command(BaseCommand):
+    help = "Stream an OpenFoodFacts dump (JSONL or CSV/TSV, .gz ok) into the local food catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Dump file path, or - for stdin")
+        parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                            help="Default: guessed from the file name")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--limit", type=int, default=None, help="Stop after N products")
+
+    def handle(self, *args, **opts):
+        products = iter_dump(opts["path"], opts["format"])
+        if opts["limit"]:
+            products = islice(products, opts["limit"])
+
+        seen = written = 0
+        while True:
+            batch = list(islice(products, opts["batch_size"]))
+            if not batch:
+                break
+            seen += len(batch)
+            written += index_products(batch)
+            if opts["verbosity"] > 1:
+                self.stdout.write(f"{seen} read, {written} indexed")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {written} foods ({seen - written} skipped: no code/macros or duplicate)."
+        ))
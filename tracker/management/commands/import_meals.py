@@ -0,0 +1,61 @@
+import gzip
+import io
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.templates.tracker.services.meal_import import (
+    DEFAULT_BATCH_SIZE, guess_format, import_meals,
+)
+
+
+def _open_text(path):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8-sig", newline="")
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+class Command(BaseCommand):
+    help = "Import meals for one user from CSV/TSV or NDJSON (.gz ok), e.g. another tracker's export"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File path, or - for stdin")
+        parser.add_argument("--user", required=True, help="Username or id to import for")
+        parser.add_argument("--format", choices=["csv", "ndjson"], default=None,
+                            help="Default: guessed from the file name")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--strict", action="store_true",
+                            help="Import nothing if any row is invalid")
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        who = opts["user"]
+        user = User.objects.filter(**({"pk": int(who)} if who.isdigit() else {"username": who})).first()
+        if user is None:
+            raise CommandError(f"No such user: {who}")
+
+        fmt = opts["format"] or guess_format(opts["path"])
+        try:
+            fh = _open_text(opts["path"])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        t0 = time.perf_counter()
+        try:
+            report = import_meals(user, fh, fmt, batch_size=opts["batch_size"], strict=opts["strict"])
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+        took = time.perf_counter() - t0
+
+        for err in report["errors"]:
+            self.stderr.write(f"line {err['line']}: {err['error']}")
+        style = self.style.SUCCESS if report["created"] or not report["skipped"] else self.style.ERROR
+        self.stdout.write(style(
+            f"Imported {report['created']} of {report['rows']} rows for {user} "
+            f"({report['skipped']} invalid) in {took:.2f}s."
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tracker.templates.tracker.services.recents import rebuild_recent_foods
+
+
+class Command(BaseCommand):
+    help = "Rebuild the RecentFood index from Meal, in batches of users"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Users per transaction")
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only rebuild this user id (repeatable)")
+
+    def handle(self, *args, **opts):
+        total = 0
+        for n, written in enumerate(rebuild_recent_foods(opts["user_ids"], opts["batch_size"]), 1):
+            total += written
+            if opts["verbosity"] > 1:
+                self.stdout.write(f"batch {n}: {written} foods")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} recent foods."))
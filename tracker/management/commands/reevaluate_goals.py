@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.models import Goal
+from tracker.templates.tracker.services.dashboard_cache import bump_version
+from tracker.templates.tracker.services.nutrition import GOAL_FIELDS, cache_clear, recommend_batch
+
+
+class Command(BaseCommand):
+    help = ("Nightly: recompute every user's TDEE-based calorie and macro targets in one "
+            "vectorized pass; report goals that drifted, and with --apply write them")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--apply", action="store_true",
+                            help="Update calories/protein/carbs/fat of goals with a TDEE estimate")
+        parser.add_argument("--tolerance", type=int, default=50,
+                            help="kcal difference that counts as drift (default 50)")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        rows = list(Goal.objects.order_by("pk").values_list("pk", "protein", "carbs", "fat", *GOAL_FIELDS))
+        ids = [r[0] for r in rows]
+        res = recommend_batch([r[4:] for r in rows])
+        current = [r[4 + GOAL_FIELDS.index("calories")] or 0 for r in rows]
+
+        valid = res["valid"]
+        drifted = valid & (abs(res["recommended"] - current) > opts["tolerance"])
+        took = time.perf_counter() - t0
+        self.stdout.write(
+            f"{len(rows)} goals, {int(valid.sum())} with a TDEE estimate, "
+            f"{int(drifted.sum())} off by more than {opts['tolerance']} kcal ({took * 1000:.0f} ms)."
+        )
+        if not opts["apply"]:
+            return
+
+        changed = []
+        for i in valid.nonzero()[0].tolist():
+            new = (int(res["recommended"][i]), int(res["protein"][i]), int(res["carbs"][i]), int(res["fat"][i]))
+            if new != (current[i], rows[i][1], rows[i][2], rows[i][3]):
+                changed.append(Goal(pk=ids[i], calories=new[0], protein=new[1], carbs=new[2], fat=new[3]))
+        Goal.objects.bulk_update(changed, ["calories", "protein", "carbs", "fat"], batch_size=opts["batch_size"])
+        # bulk_update skips Goal.save(), which is what invalidates cached dashboards
+        bump_version(Goal.objects.filter(pk__in=[g.pk for g in changed]).values_list("user_id", flat=True))
+        cache_clear()
+        self.stdout.write(self.style.SUCCESS(f"Updated {len(changed)} goals."))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.templates.tracker.services.export_jobs import (
+    claim_next_job, purge_jobs, requeue_stale, run_job,
+)
+
+
+class Command(BaseCommand):
+    help = ("Worker for background meal exports (tracker.ExportJob). Polls the table, "
+            "so no broker is needed; run one or more next to the web process")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue, then exit (cron-style)")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Idle poll interval (s)")
+        parser.add_argument("--stale-after", type=int, default=3600,
+                            help="Requeue jobs stuck in 'running' this long (s)")
+        parser.add_argument("--purge-days", type=int, default=7,
+                            help="Delete finished jobs and their files after this many days")
+
+    def handle(self, *args, **opts):
+        requeue_stale(opts["stale_after"])
+        purge_jobs(opts["purge_days"])
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if opts["once"]:
+                    return
+                time.sleep(opts["sleep"])
+                continue
+
+            t0 = time.perf_counter()
+            run_job(job)
+            took = time.perf_counter() - t0
+            if job.status == "done":
+                self.stdout.write(self.style.SUCCESS(
+                    f"Export {job.pk}: {job.rows} meals, {job.size} bytes {job.format} in {took:.2f}s"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Export {job.pk} failed: {job.error}"))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_goal_activity_goal_age_goal_height_cm_goal_objective_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('brand', models.CharField(blank=True, max_length=100)),
+                ('cal_per_100g', models.FloatField(default=0)),
+                ('protein_per_100g', models.FloatField(default=0)),
+                ('carbs_per_100g', models.FloatField(default=0)),
+                ('fat_per_100g', models.FloatField(default=0)),
+                ('serving_size', models.CharField(blank=True, max_length=100)),
+                ('popularity', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FoodToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='tracker.fooditem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'food'], name='foodtoken_term_food_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill(apps, schema_editor):
+    Meal = apps.get_model("tracker", "Meal")
+    DailyTotals = apps.get_model("tracker", "DailyTotals")
+    rows = (
+        Meal.objects.exclude(user=None)
+        .values("user_id", "date")
+        .annotate(kcal=Sum("calories"), protein=Sum("protein"), carbs=Sum("carbs"),
+                  fat=Sum("fat"), meal_count=Count("id"))
+        .order_by()
+    )
+    DailyTotals.objects.bulk_create(
+        (DailyTotals(user_id=r["user_id"], date=r["date"], kcal=r["kcal"] or 0,
+                     protein=r["protein"] or 0, carbs=r["carbs"] or 0, fat=r["fat"] or 0,
+                     meal_count=r["meal_count"])
+         for r in rows.iterator(chunk_size=2000)),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_fooditem_foodtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('kcal', models.IntegerField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('fat', models.FloatField(default=0)),
+                ('meal_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='dailytotals_user_date_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
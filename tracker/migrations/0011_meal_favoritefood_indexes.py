@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_dailytotals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favoritefood',
+            index=models.Index(fields=['user', 'created_at'], name='fav_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favoritefood',
+            index=models.Index(fields=['user', 'name'], name='fav_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['user', 'date', 'id'], name='meal_user_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['user', 'source_id'], name='meal_user_source_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    Meal = apps.get_model("tracker", "Meal")
+    RecentFood = apps.get_model("tracker", "RecentFood")
+    latest, counts = {}, {}
+    rows = (
+        Meal.objects.exclude(user=None).order_by("user_id", "-date", "-id")
+        .values("id", "user_id", "name", "date", "grams", "calories", "protein", "carbs", "fat",
+                "cal_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g")
+    )
+    for m in rows.iterator(chunk_size=2000):
+        key = (m["user_id"], (m["name"] or "").strip().lower())
+        if not key[1]:
+            continue
+        counts[key] = counts.get(key, 0) + 1
+        latest.setdefault(key, m)
+
+    def per_100g(m, field, total):
+        if m[field] is not None or not m["grams"]:
+            return m[field] or 0
+        return round(m[total] * 100.0 / m["grams"], 1)
+
+    RecentFood.objects.bulk_create(
+        (RecentFood(user_id=uid, key=key[:200], name=m["name"][:200], last_used=m["date"],
+                    last_meal_id=m["id"], use_count=counts[(uid, key)], default_grams=m["grams"] or 100,
+                    cal_per_100g=per_100g(m, "cal_per_100g", "calories"),
+                    protein_per_100g=per_100g(m, "protein_per_100g", "protein"),
+                    carbs_per_100g=per_100g(m, "carbs_per_100g", "carbs"),
+                    fat_per_100g=per_100g(m, "fat_per_100g", "fat"))
+         for (uid, key), m in latest.items()),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_exportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecentFood',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200)),
+                ('name', models.CharField(max_length=200)),
+                ('last_used', models.DateField()),
+                ('last_meal_id', models.BigIntegerField()),
+                ('use_count', models.IntegerField(default=0)),
+                ('default_grams', models.FloatField(default=100)),
+                ('cal_per_100g', models.FloatField(default=0)),
+                ('protein_per_100g', models.FloatField(default=0)),
+                ('carbs_per_100g', models.FloatField(default=0)),
+                ('fat_per_100g', models.FloatField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recent_foods', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_used', '-last_meal_id'], name='recent_user_last_idx'), models.Index(fields=['user', '-use_count', '-last_used'], name='recent_user_count_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='recentfood_user_key_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0013_recentfood'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fooditem',
+            index=models.Index(fields=['-popularity', 'name'], name='fooditem_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foodtoken',
+            index=models.Index(fields=['food', 'term'], name='foodtoken_food_term_idx'),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.db import models
 from django.db import models
 from django.contrib.auth.models import User
+from django.db import transaction
 
 
 class Meal(models.Model):
@@ -37,6 +38,62 @@ class Goal(models.Model):
     def __str__(self):
         return f"{self.user.username} goals"
     
+def _refresh_rollups(keys, names=(), added=()):
+    """
+    Bring the per-day totals and the recent-foods index in line after a Meal
+    write: `keys` are the (user_id, date) pairs touched, `names` the
+    (user_id, name) pairs edited or deleted, `added` the meals inserted.
+    """
+    # imported lazily: the services package imports these models
+    from .templates.tracker.services.recents import add_recent_foods, refresh_recent_foods
+    from .templates.tracker.services.rollups import refresh_daily_totals
+    refresh_daily_totals(keys)
+    refresh_recent_foods(names)
+    add_recent_foods(added)
+
+
+def _dashboard_changed(user_id):
+    from .templates.tracker.services.dashboard_cache import bump_version
+    bump_version([user_id])
+
+
+class MealQuerySet(models.QuerySet):
+    """Keeps DailyTotals in sync for writes that bypass Meal.save()/delete()."""
+
+    def _rollup_keys(self):
+        return set(self.order_by().values_list("user_id", "date").distinct())
+
+    def _recent_keys(self):
+        return set(self.order_by().values_list("user_id", "name").distinct())
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            _refresh_rollups({(m.user_id, m.date) for m in objs}, added=objs)
+        return created
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            keys, names = self._rollup_keys(), self._recent_keys()
+            n = super().update(**kwargs)
+            after = Meal.objects.filter(pk__in=pks)
+            keys |= after._rollup_keys()
+            names |= after._recent_keys()
+            _refresh_rollups(keys, names)
+        return n
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            keys, names = self._rollup_keys(), self._recent_keys()
+            result = super().delete()
+            _refresh_rollups(keys, names)
+        return result
+    delete.alters_data = True
+
+
 class Meal(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
@@ -70,13 +127,48 @@ class Meal(models.Model):
             if self.fat_per_100g is not None:
                 self.fat = round((self.fat_per_100g or 0) * scale, 1)
 
+    objects = MealQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # filter(user, date) / date__range + order_by(-date, -id): the
+            # (user, date) prefix serves the filter, the trailing id the order
+            models.Index(fields=["user", "date", "id"], name="meal_user_date_id_idx"),
+            # barcode lookup in the user's history
+            models.Index(fields=["user", "source_id"], name="meal_user_source_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        # remember the day (and food) this meal counted towards, in case an edit moves it
+        obj._rollup_key = (obj.__dict__.get("user_id"), obj.__dict__.get("date"))
+        obj._recent_key = (obj.__dict__.get("user_id"), obj.__dict__.get("name"))
+        return obj
+
     def save(self, *args, **kwargs):
         # If we have grams and any per-100g value, recompute totals
         if self.grams and any(v is not None for v in [
             self.cal_per_100g, self.protein_per_100g, self.carbs_per_100g, self.fat_per_100g
         ]):
             self.recalc_totals()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            keys = {(self.user_id, self.date), getattr(self, "_rollup_key", (None, None))}
+            if adding:
+                _refresh_rollups(keys, added=[self])
+            else:
+                names = {(self.user_id, self.name), getattr(self, "_recent_key", (None, None))}
+                _refresh_rollups(keys, names)
+        self._rollup_key = (self.user_id, self.date)
+        self._recent_key = (self.user_id, self.name)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            _refresh_rollups({(self.user_id, self.date)}, {(self.user_id, self.name)})
+        return result
 
     def __str__(self):
         return f"{self.name} ({self.date})"
@@ -99,6 +191,21 @@ class FavoriteFood(models.Model):
     source_id = models.CharField(max_length=64, blank=True)   # e.g. barcode/code
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="fav_user_created_idx"),
+            models.Index(fields=["user", "name"], name="fav_user_name_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        _dashboard_changed(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        _dashboard_changed(self.user_id)
+        return result
+
     def __str__(self):
         return self.name
 
@@ -142,5 +249,184 @@ class Goal(models.Model):
     ]
     activity = models.CharField(max_length=12, choices=ACTIVITY_CHOICES, default="moderate")
 
+    def save(self, *args, **kwargs):
+        # a new Goal comes from the dashboard's own get_or_create: nothing cached to drop
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            _dashboard_changed(self.user_id)
+
     def __str__(self):
         return f"Goals for {self.user}"
+
+
+class FoodItem(models.Model):
+    """Local copy of an OpenFoodFacts product (filled by `import_food_catalog`)."""
+    code  = models.CharField(max_length=64, unique=True)   # OFF barcode
+    name  = models.CharField(max_length=200)
+    brand = models.CharField(max_length=100, blank=True)
+
+    cal_per_100g     = models.FloatField(default=0)
+    protein_per_100g = models.FloatField(default=0)
+    carbs_per_100g   = models.FloatField(default=0)
+    fat_per_100g     = models.FloatField(default=0)
+    serving_size = models.CharField(max_length=100, blank=True)
+
+    # OFF unique_scans_n; used to rank search hits
+    popularity = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # search_local's ORDER BY, walked in order for common prefixes
+            models.Index(fields=["-popularity", "name"], name="fooditem_popularity_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class FoodToken(models.Model):
+    """
+    Inverted index: one row per distinct normalized word of a FoodItem's
+    name/brand. Prefix search is a range scan on `term`.
+    """
+    term = models.CharField(max_length=64)
+    food = models.ForeignKey(FoodItem, on_delete=models.CASCADE, related_name="tokens")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["term", "food"], name="foodtoken_term_food_idx"),
+            # "does this product have a word starting with ...?" probes
+            models.Index(fields=["food", "term"], name="foodtoken_food_term_idx"),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class DailyTotals(models.Model):
+    """
+    Per-user, per-day sums of Meal, kept up to date on every Meal write
+    (see MealQuerySet / Meal.save). Rebuild with `manage.py rebuild_daily_totals`.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="daily_totals")
+    date = models.DateField()
+    kcal    = models.IntegerField(default=0)
+    protein = models.FloatField(default=0)
+    carbs   = models.FloatField(default=0)
+    fat     = models.FloatField(default=0)
+    meal_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="dailytotals_user_date_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.date}: {self.kcal} kcal"
+
+
+class RecentFood(models.Model):
+    """
+    One row per food (normalized name) a user has logged: the latest
+    portion and per-100g values plus how often it was used. Kept up to date
+    on every Meal write (see MealQuerySet / Meal.save), so the quick-add
+    "recents" are one indexed LIMIT query. Rebuild with
+    `manage.py rebuild_recent_foods`.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="recent_foods")
+    key  = models.CharField(max_length=200)      # name.strip().lower()
+    name = models.CharField(max_length=200)      # as last logged
+    last_used    = models.DateField()
+    last_meal_id = models.BigIntegerField()      # tie-break within a day, like the meal list
+    use_count    = models.IntegerField(default=0)
+
+    default_grams    = models.FloatField(default=100)
+    cal_per_100g     = models.FloatField(default=0)
+    protein_per_100g = models.FloatField(default=0)
+    carbs_per_100g   = models.FloatField(default=0)
+    fat_per_100g     = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="recentfood_user_key_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-last_used", "-last_meal_id"], name="recent_user_last_idx"),
+            models.Index(fields=["user", "-use_count", "-last_used"], name="recent_user_count_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.name} x{self.use_count}"
+
+
+class DataVersion(models.Model):
+    """
+    Per-user counter bumped (in the writing transaction) by every Meal, Goal
+    or FavoriteFood write. Cached dashboards, projections and ETags are keyed
+    on it, so every process and management command sees the same version.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name="+")
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
+
+class WeightProjection(models.Model):
+    """
+    A user's weekly weight-projection chart (services/projection.py), filled
+    nightly by `manage.py project_weights` and on demand. Valid only for its
+    `start` day and the DataVersion it was computed at.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    weeks = models.PositiveSmallIntegerField()
+    version = models.BigIntegerField()
+    start = models.DateField()
+    chart = models.JSONField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "weeks"], name="weightprojection_user_weeks_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.weeks}w from {self.start}"
+
+
+class ExportJob(models.Model):
+    """A meal export generated in the background by `manage.py run_export_jobs`."""
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    FORMAT_CHOICES = [
+        ("csv", "CSV"),
+        ("ndjson", "NDJSON"),
+        ("parquet", "Parquet"),
+        ("arrow", "Arrow IPC"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="export_jobs")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default="csv")
+    start = models.DateField(null=True, blank=True)    # both empty = all meals
+    end   = models.DateField(null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    file = models.FileField(upload_to="exports/", blank=True)
+    size = models.BigIntegerField(null=True, blank=True)    # bytes
+    rows = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at  = models.DateTimeField(auto_now_add=True)
+    started_at  = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"], name="exportjob_status_created_idx")]
+
+    def __str__(self):
+        return f"Export {self.pk} ({self.format}, {self.status})"
@@ -85,14 +85,35 @@ def _totals(food: Food, g: float) -> Dict[str,float]:
         "f": round(food.f * s, 1),
     }
 
-def suggest_meals(need: Dict[str,float], prefs: Dict[str,bool]) -> List[Dict[str,Any]]:
+def suggest_meals(need: Dict[str,float], prefs: Dict[str,bool],
+                  solver: bool = False, deadline_ms: float = 50.0) -> List[Dict[str,Any]]:
     """
     Return 3 suggestion 'plans'. Each plan has 1–3 foods with grams and totals.
-    Very simple greedy pairing based on remaining macros + preferences.
+    Greedy pairing based on remaining macros + preferences, computed on the
+    array-backed food library (see food_library.FoodLibrary).
+    With solver=True an "Optimized Plan" minimizing macro error comes first,
+    found within `deadline_ms` (see meal_solver.solve_plan).
     """
-    pool = [f for f in FOODS if _fits(f, prefs)]
+    # imported here: both modules import this one
+    from .food_library import get_library
+    from .meal_solver import solve_plan
+
+    plans = get_library().suggest(need, prefs)
+    if solver:
+        best = solve_plan(need, prefs, deadline_ms=deadline_ms)
+        if best:
+            plans.insert(0, best)
+    return plans
+
+def suggest_meals_reference(need: Dict[str,float], prefs: Dict[str,bool],
+                            foods: List[Food] = FOODS) -> List[Dict[str,Any]]:
+    """
+    The original per-object greedy, kept as the reference the vectorized
+    library is tested and benchmarked against.
+    """
+    pool = [f for f in foods if _fits(f, prefs)]
     if not pool:
-        pool = FOODS[:]  # fallback
+        pool = list(foods)  # fallback
 
     # Sort helpers
     lean_protein  = sorted(pool, key=lambda x: (x.p, -x.f, x.cal), reverse=True)
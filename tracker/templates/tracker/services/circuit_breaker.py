@@ -0,0 +1,106 @@
+# tracker/services/circuit_breaker.py
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is known to be failing."""
+
+
+class CircuitBreaker:
+    """
+    closed     -> calls go through; `threshold` consecutive failures trip it
+    open       -> calls fail fast with CircuitOpenError for `reset_after` seconds
+    half_open  -> one trial call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, threshold=5, reset_after=30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._stats = {"trips": 0, "short_circuited": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            self._stats["short_circuited"] += 1
+        raise CircuitOpenError("upstream circuit is open")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                if self._opened_at is None or self._trial_running:
+                    self._stats["trips"] += 1
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+    def release_trial(self):
+        """The call ended without a verdict (cancelled): let the next one be the trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def call(self, fn, *args, **kwargs):
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:     # CancelledError, KeyboardInterrupt, ...
+            self.release_trial()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn, *args, **kwargs):
+        self.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:     # CancelledError, KeyboardInterrupt, ...
+            self.release_trial()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"state": self._state(), "consecutive_failures": self._failures, **self._stats}
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+            for k in self._stats:
+                self._stats[k] = 0
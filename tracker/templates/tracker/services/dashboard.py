@@ -0,0 +1,104 @@
+# tracker/services/dashboard.py
+import datetime as dt
+import json
+
+from django.db.models import Q
+
+from tracker.models import DailyTotals, FavoriteFood, Goal, Meal
+from .recents import recent_foods
+
+MEAL_COLUMNS = ("id", "name", "calories", "protein", "carbs", "fat", "date")
+FAVORITE_COLUMNS = ("id", "name", "brand", "default_grams", "cal_per_100g",
+                    "protein_per_100g", "carbs_per_100g", "fat_per_100g")
+
+
+def pct(x, g):  # avoid div-by-zero
+    return round(100 * x / g, 1) if g else 0
+
+
+def badge_status(total, goal_val, kind):
+    if not goal_val or goal_val <= 0:
+        return "secondary"
+    ratio = total / goal_val
+    if kind == "calories":
+        # under/on target = green, up to +10% = amber, beyond = red
+        if ratio <= 1.00:
+            return "success"
+        elif ratio <= 1.10:
+            return "warning"
+        else:
+            return "danger"
+    else:  # macros
+        # within ±10% of goal = green, under = amber, over = red
+        if 0.90 <= ratio <= 1.10:
+            return "success"
+        elif ratio < 0.90:
+            return "warning"
+        else:
+            return "danger"
+
+
+def daily_sums(user, week, day):
+    """
+    One read of the DailyTotals rollup covering the 7-day window and the
+    selected day (which may fall outside it).
+    Returns {date: {calories, protein, carbs, fat}}.
+    """
+    rows = (
+        DailyTotals.objects.filter(Q(date__range=[week[0], week[-1]]) | Q(date=day), user=user)
+        .values("date", "kcal", "protein", "carbs", "fat")
+    )
+    return {
+        r["date"]: {"calories": r["kcal"], "protein": r["protein"], "carbs": r["carbs"], "fat": r["fat"]}
+        for r in rows
+    }
+
+
+def build_dashboard(user, day, today=None):
+    """
+    Everything meal_list renders, in a fixed number of queries no matter how
+    many meals the user has: goal, per-day sums (from the DailyTotals rollup),
+    the day's meals, favorites, recents. Rows come back as dicts with only
+    the columns the page uses.
+    """
+    today = today or dt.date.today()
+    goal, _ = Goal.objects.get_or_create(user=user)
+
+    week = [today - dt.timedelta(days=i) for i in range(6, -1, -1)]
+    sums = daily_sums(user, week, day)
+
+    zero = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}
+    totals = {k: v or 0 for k, v in sums.get(day, zero).items()}
+
+    meals = list(
+        Meal.objects.filter(user=user, date=day).order_by("-id").values(*MEAL_COLUMNS)
+    )
+    favorites = list(
+        FavoriteFood.objects.filter(user=user).order_by("-created_at").values(*FAVORITE_COLUMNS)
+    )
+
+    progress = {
+        "calories": pct(totals["calories"], goal.calories),
+        "protein":  pct(totals["protein"],  goal.protein),
+        "carbs":    pct(totals["carbs"],    goal.carbs),
+        "fat":      pct(totals["fat"],      goal.fat),
+    }
+    badges = {
+        "calories": badge_status(totals["calories"], goal.calories, "calories"),
+        "protein":  badge_status(totals["protein"],  goal.protein,  "macro"),
+        "carbs":    badge_status(totals["carbs"],    goal.carbs,    "macro"),
+        "fat":      badge_status(totals["fat"],      goal.fat,      "macro"),
+    }
+
+    return {
+        "goal": goal,
+        "meals": meals,
+        "totals": totals,
+        "progress": progress,                 # raw % (e.g., 120.0)
+        "progress_capped": {k: min(100, v) for k, v in progress.items()},  # 0–100 (bar widths)
+        "weekly_labels": json.dumps([d.strftime("%b %d") for d in week]),
+        "weekly_kcal": json.dumps([(sums.get(d) or {}).get("calories") or 0 for d in week]),
+        "favorites": favorites,
+        "recents": recent_foods(user),
+        "badges": badges,
+    }
@@ -0,0 +1,98 @@
+# tracker/services/dashboard_cache.py
+import datetime as dt
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from tracker.models import DataVersion
+from .dashboard import build_dashboard
+
+CACHE_ALIAS = getattr(settings, "DASHBOARD_CACHE_ALIAS", "dashboard")
+KEY_PREFIX = "dash:v1"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "bumps": 0}
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def data_version(user_id):
+    """
+    The user's dashboard data version: a DataVersion row, so writes from any
+    worker, command or import invalidate everywhere. A user without a row
+    (nothing written since it was added) is at version 0.
+    """
+    return DataVersion.objects.filter(user_id=user_id).values_list("version", flat=True).first() or 0
+
+
+def bump_version(user_ids):
+    """
+    Invalidate the cached dashboards of these users; called after Meal /
+    Goal / FavoriteFood writes, inside their transaction when there is one.
+    A page built from the old data is cached under the old version, so it
+    is never served once the new version is visible.
+    """
+    ids = sorted({uid for uid in user_ids if uid is not None})
+    if not ids:
+        return
+    DataVersion.objects.bulk_create([DataVersion(user_id=uid) for uid in ids], ignore_conflicts=True)
+    # strictly increasing, and never below the clock: versions don't repeat
+    # after a restore or a rolled-back transaction, so neither do cache keys
+    DataVersion.objects.filter(user_id__in=ids).update(version=Greatest(F("version") + 1, time.time_ns()))
+    _count("bumps", len(ids))
+
+
+def user_etag(user_id, *parts):
+    """
+    Strong ETag value for a response built only from this user's data (and
+    `parts`): it changes whenever the data version does, and costs one
+    primary-key read, so a conditional request is answered before the
+    view's own queries run.
+    """
+    raw = ":".join(str(p) for p in (user_id, data_version(user_id), *parts))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cached_dashboard(user, day, today=None):
+    """build_dashboard(), cached per (user, data version, day, today)."""
+    today = today or dt.date.today()     # the week chart ends today
+    key = f"{KEY_PREFIX}:{user.pk}:{data_version(user.pk)}:{day.isoformat()}:{today.isoformat()}"
+    cache = _cache()
+    dash = cache.get(key)
+    if dash is not None:
+        _count("hits")
+        return dash
+    _count("misses")
+    dash = build_dashboard(user, day, today)
+    cache.set(key, dash)
+    return dash
+
+
+def cache_stats():
+    """Hit/miss/invalidation counters for this process (for monitoring)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "backend": settings.CACHES[CACHE_ALIAS]["BACKEND"],
+        **stats,
+        "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
@@ -0,0 +1,111 @@
+# tracker/services/export_jobs.py
+import datetime as dt
+import tempfile
+
+from django.core.files import File
+from django.utils import timezone
+
+from tracker.models import ExportJob, Meal
+from .exports import COLUMNAR_FORMATS, _pyarrow, stream_export
+
+JOB_FORMATS = ("csv", "ndjson", "parquet", "arrow")
+
+
+def enqueue_export(user, fmt, start=None, end=None):
+    """
+    Queue an export; the worker picks it up, so this is a single INSERT.
+    Raises ExportUnavailable up front if the format needs pyarrow and it
+    isn't installed, rather than queueing a job that can only fail.
+    """
+    if fmt not in JOB_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    if fmt in COLUMNAR_FORMATS:
+        _pyarrow()
+    return ExportJob.objects.create(user=user, format=fmt, start=start, end=end)
+
+
+def job_queryset(job):
+    qs = Meal.objects.filter(user_id=job.user_id)
+    if job.start:
+        qs = qs.filter(date__gte=job.start)
+    if job.end:
+        qs = qs.filter(date__lte=job.end)
+    return qs
+
+
+def job_filename(job):
+    if job.start and job.end:
+        stem = (f"meals_{job.start.isoformat()}" if job.start == job.end
+                else f"meals_{job.start.isoformat()}_to_{job.end.isoformat()}")
+    else:
+        stem = "meals"
+    return f"{stem}.{job.format}"
+
+
+def claim_next_job():
+    """
+    Take the oldest pending job. The claim is a conditional UPDATE
+    (status pending -> running), so two workers never run the same job,
+    on SQLite as well as PostgreSQL. Returns the job or None.
+    """
+    candidates = (
+        ExportJob.objects.filter(status="pending")
+        .order_by("created_at", "id").values_list("id", flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = ExportJob.objects.filter(pk=pk, status="pending").update(
+            status="running", started_at=timezone.now(), error="",
+        )
+        if claimed:
+            return ExportJob.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale(older_than):
+    """Put jobs back in the queue whose worker died mid-export (running for > `older_than`)."""
+    cutoff = timezone.now() - dt.timedelta(seconds=older_than)
+    return ExportJob.objects.filter(status="running", started_at__lt=cutoff).update(status="pending")
+
+
+def run_job(job):
+    """
+    Generate the export into a temp file, then move it into default storage
+    (MEDIA_ROOT/exports/). Marks the job done or failed; never raises.
+    """
+    rows = 0
+
+    def count(n):
+        nonlocal rows
+        rows += n
+
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in stream_export(job_queryset(job), job.format, on_rows=count):
+                tmp.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            size = tmp.tell()
+            tmp.seek(0)
+            if job.file:
+                job.file.delete(save=False)
+            job.file.save(f"{job.user_id}/{job.pk}_{job_filename(job)}", File(tmp), save=False)
+    except Exception as e:
+        job.status, job.error = "failed", str(e) or e.__class__.__name__
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        return job
+
+    job.status, job.size, job.rows = "done", size, rows
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "file", "size", "rows", "finished_at"])
+    return job
+
+
+def purge_jobs(older_than_days):
+    """Delete finished jobs (and their files) older than `older_than_days`."""
+    cutoff = timezone.now() - dt.timedelta(days=older_than_days)
+    n = 0
+    for job in ExportJob.objects.filter(status__in=["done", "failed"], finished_at__lt=cutoff):
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        n += 1
+    return n
@@ -0,0 +1,172 @@
+# tracker/services/exports.py
+import csv
+import json
+
+from tracker.models import Meal
+
+CSV_HEADER = ["Date", "Name", "Calories", "Protein", "Carbs", "Fat"]
+CSV_COLUMNS = ("date", "name", "calories", "protein", "carbs", "fat")
+CHUNK_SIZE = 2000
+
+# full-fidelity exports (NDJSON / Arrow / Parquet) carry every Meal column
+EXPORT_FIELDS = [f.attname for f in Meal._meta.concrete_fields]
+COLUMNAR_FORMATS = ("parquet", "arrow")
+FORMATS = ("ndjson",) + COLUMNAR_FORMATS
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+class ExportUnavailable(Exception):
+    """Requested format needs an optional dependency that isn't installed."""
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(qs, chunk_size=CHUNK_SIZE, with_user=False, on_rows=None):
+    """
+    Yield CSV lines for a Meal queryset, oldest first. Rows are plain tuples
+    read through a DB cursor (server-side on PostgreSQL), so memory stays
+    flat however many meals there are. `with_user` adds a leading User ID
+    column (and groups rows by user) for multi-user dumps. `on_rows(n)` is
+    called with the row count once every row has been written.
+    """
+    w = csv.writer(_Echo())
+    if with_user:
+        yield w.writerow(["User ID", *CSV_HEADER])
+        rows = qs.order_by("user_id", "date", "id").values_list("user_id", *CSV_COLUMNS)
+    else:
+        yield w.writerow(CSV_HEADER)
+        rows = qs.order_by("date", "id").values_list(*CSV_COLUMNS)
+    rows = rows.iterator(chunk_size=chunk_size)
+    n = 0
+    for n, row in enumerate(rows, 1):
+        yield w.writerow(row)
+    if on_rows:
+        on_rows(n)
+
+
+def iter_batches(qs, batch_size=CHUNK_SIZE, on_rows=None):
+    """
+    Lists of EXPORT_FIELDS tuples, `batch_size` at a time, from one cursor.
+    `on_rows(n)` is called with the size of each batch as it is handed out.
+    """
+    batch = []
+    for row in qs.order_by("user_id", "date", "id").values_list(*EXPORT_FIELDS).iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            if on_rows:
+                on_rows(len(batch))
+            yield batch
+            batch = []
+    if batch:
+        if on_rows:
+            on_rows(len(batch))
+        yield batch
+
+
+def stream_ndjson(qs, batch_size=CHUNK_SIZE, on_rows=None):
+    for batch in iter_batches(qs, batch_size, on_rows):
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str, ensure_ascii=False) + "\n"
+            for row in batch
+        )
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportUnavailable("Parquet/Arrow export needs pyarrow (pip install pyarrow).")
+    return pa, pq
+
+
+def arrow_schema():
+    pa, _ = _pyarrow()
+    types = {
+        "IntegerField": pa.int32(), "BigAutoField": pa.int64(), "ForeignKey": pa.int64(),
+        "FloatField": pa.float64(), "CharField": pa.string(), "DateField": pa.date32(),
+    }
+    return pa.schema([
+        pa.field(f.attname, types[f.get_internal_type()], nullable=f.null)
+        for f in Meal._meta.concrete_fields
+    ])
+
+
+class _ChunkSink:
+    """Write-only file object that lets a generator hand out what was written so far."""
+
+    def __init__(self):
+        self._parts, self._pos, self.closed = [], 0, False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        out, self._parts = b"".join(self._parts), []
+        return out
+
+
+def stream_columnar(qs, fmt, batch_size=50_000, on_rows=None):
+    """
+    Yield a Parquet file or Arrow IPC stream in pieces: each DB batch becomes
+    one Parquet row group / Arrow record batch, so only one batch is in memory.
+    """
+    pa, pq = _pyarrow()
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        write = writer.write_table
+        to_chunk = pa.Table.from_batches
+    elif fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        write = writer.write_batch
+        to_chunk = lambda batches: batches[0]
+    else:
+        raise ValueError(f"unknown columnar format {fmt!r}")
+
+    for batch in iter_batches(qs, batch_size, on_rows):
+        columns = list(zip(*batch))
+        record = pa.record_batch([pa.array(col, type=schema.field(i).type) for i, col in enumerate(columns)],
+                                 schema=schema)
+        write(to_chunk([record]))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(qs, fmt, with_user=False, on_rows=None):
+    """
+    Iterator of str/bytes chunks for any supported format. The other formats
+    always carry user_id; CSV only with `with_user`. `on_rows(n)` is told how
+    many rows went out, so callers can count them without a second query.
+    """
+    if fmt == "csv":
+        return stream_csv(qs, with_user=with_user, on_rows=on_rows)
+    if fmt == "ndjson":
+        return stream_ndjson(qs, on_rows=on_rows)
+    if fmt in COLUMNAR_FORMATS:
+        _pyarrow()   # fail before the response starts, not halfway through it
+        return stream_columnar(qs, fmt, on_rows=on_rows)
+    raise ValueError(f"unknown export format {fmt!r}")
@@ -1,49 +1,182 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = "https://world.openfoodfacts.org"
+USER_AGENT = "Nutramigo/1.0 (https://nutramigo.onrender.com)"
+
+def _num(nutr, x):
+    try:
+        return float(nutr.get(x))
+    except (TypeError, ValueError):
+        return None
+
+def parse_product(p):
+    """
+    Normalize one OpenFoodFacts product dict to our per-100g shape.
+    Returns None when the product has no usable macros.
+    """
+    name = p.get("product_name") or p.get("generic_name") or p.get("brands") or "Food"
+    nutr = p.get("nutriments", {}) or {}
+
+    # kcal can be in energy-kcal_100g or energy_100g (kJ → convert)
+    kcal = _num(nutr, "energy-kcal_100g")
+    if kcal is None and (kJ := _num(nutr, "energy_100g")) is not None:
+        kcal = kJ / 4.184
+
+    protein = _num(nutr, "proteins_100g")
+    carbs   = _num(nutr, "carbohydrates_100g")
+    fat     = _num(nutr, "fat_100g")
+
+    if not any(v is not None for v in (kcal, protein, carbs, fat)):
+        return None
+    return {
+        "id": p.get("code"),
+        "name": name.strip(),
+        "brand": (p.get("brands") or "").strip(),
+        "per": 100,  # values are per 100g
+        "calories": round(kcal or 0, 1),
+        "protein": round(protein or 0, 1),
+        "carbs":   round(carbs or 0, 1),
+        "fat":     round(fat or 0, 1),
+        "serving_size": (p.get("serving_size") or "").strip(),
+    }
+
+class FoodApiClient:
+    """
+    OpenFoodFacts client on top of one pooled keep-alive `requests.Session`,
+    so repeat searches skip DNS + TCP + TLS setup.
+    `base_url` can point at a local stub server for tests/benchmarks.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, pool_size=10, retries=2,
+                 backoff=0.2, connect_timeout=2.0, read_timeout=5.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Retry refused/reset connections and gateway errors only. A read
+        # timeout is not retried (read=False re-raises it as ReadTimeout):
+        # the upstream is slow, and asking again would multiply the wait.
+        retry = Retry(
+            total=retries,
+            read=False,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "User-Agent": USER_AGENT,
+        })
+
+    def search(self, q: str, limit: int = 10):
+        """
+        Returns foods with macros per 100g from OpenFoodFacts (no key needed).
+        """
+        params = {
+            "search_terms": q,
+            "search_simple": 1,
+            "action": "process",
+            "json": 1,
+            "page_size": limit,
+        }
+        r = self.session.get(f"{self.base_url}/cgi/search.pl", params=params, timeout=self.timeout)
+        r.raise_for_status()
+        out = []
+        for p in r.json().get("products", []):
+            item = parse_product(p)
+            if item:
+                out.append(item)
+        return out
+
+    def product(self, code: str):
+        """
+        Look up one product by barcode. Same shape as a search result,
+        or None if OpenFoodFacts doesn't know the code.
+        """
+        r = self.session.get(f"{self.base_url}/api/v2/product/{code}.json", timeout=self.timeout)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        data = r.json()
+        if data.get("status") != 1 or not data.get("product"):
+            return None
+        return parse_product({"code": code, **data["product"]})
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide client built from FOOD_API_* settings (created lazily, after fork)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from django.conf import settings
+                _client = FoodApiClient(
+                    base_url=getattr(settings, "FOOD_API_BASE_URL", DEFAULT_BASE_URL),
+                    pool_size=getattr(settings, "FOOD_API_POOL_SIZE", 100),
+                    retries=getattr(settings, "FOOD_API_RETRIES", 2),
+                    backoff=getattr(settings, "FOOD_API_BACKOFF", 0.2),
+                    connect_timeout=getattr(settings, "FOOD_API_CONNECT_TIMEOUT", 2.0),
+                    read_timeout=getattr(settings, "FOOD_API_READ_TIMEOUT", 5.0),
+                )
+    return _client
+
+def set_client(client):
+    """Swap the process-wide client (tests, benchmarks)."""
+    global _client
+    with _client_lock:
+        old, _client = _client, client
+    if old is not None and old is not client:
+        old.close()
 
 def search_openfoodfacts(q: str, limit: int = 10):
     """
     Returns foods with macros per 100g from OpenFoodFacts (no key needed).
     """
-    url = "https://world.openfoodfacts.org/cgi/search.pl"
-    params = {
-        "search_terms": q,
-        "search_simple": 1,
-        "action": "process",
-        "json": 1,
-        "page_size": limit,
-    }
-    r = requests.get(url, params=params, timeout=6)
-    r.raise_for_status()
-    out = []
-    for p in r.json().get("products", []):
-        name = p.get("product_name") or p.get("generic_name") or p.get("brands") or "Food"
-        nutr = p.get("nutriments", {}) or {}
-
-        def num(x):
-            try:
-                return float(nutr.get(x))
-            except (TypeError, ValueError):
-                return None
-
-        # kcal can be in energy-kcal_100g or energy_100g (kJ → convert)
-        kcal = num("energy-kcal_100g")
-        if kcal is None and (kJ := num("energy_100g")) is not None:
-            kcal = kJ / 4.184
-
-        protein = num("proteins_100g")
-        carbs   = num("carbohydrates_100g")
-        fat     = num("fat_100g")
-
-        if any(v is not None for v in (kcal, protein, carbs, fat)):
-            out.append({
-                "id": p.get("code"),
-                "name": name.strip(),
-                "brand": (p.get("brands") or "").strip(),
-                "per": 100,  # values are per 100g
-                "calories": round(kcal or 0, 1),
-                "protein": round(protein or 0, 1),
-                "carbs":   round(carbs or 0, 1),
-                "fat":     round(fat or 0, 1),
-                "serving_size": (p.get("serving_size") or "").strip(),
-            })
-    return out
+    return get_client().search(q, limit)
+
+
+def lookup_openfoodfacts(code: str):
+    return get_client().product(code)
+
+
+_executor = None
+
+def _async_executor():
+    global _executor
+    if _executor is None:
+        with _client_lock:
+            if _executor is None:
+                from django.conf import settings
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "FOOD_API_ASYNC_THREADS", 100),
+                    thread_name_prefix="food-api",
+                )
+    return _executor
+
+async def asearch_openfoodfacts(q: str, limit: int = 10, client=None, executor=None):
+    """
+    Async search for ASGI views. The blocking pooled client runs on a
+    dedicated thread pool, so the event loop is never blocked and one worker
+    can wait on as many searches as there are pool threads.
+    """
+    client = client or get_client()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or _async_executor(), client.search, q, limit)
@@ -0,0 +1,199 @@
+# tracker/services/food_catalog.py
+import csv
+import gzip
+import io
+import json
+import re
+import sys
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from tracker.models import FoodItem, FoodToken
+from .food_api import parse_product
+
+MIN_PREFIX = 2      # shorter query words would match half the catalog
+MAX_TERM = 64       # FoodToken.term max_length
+# below this many token matches, sorting the matches beats walking the
+# popularity index (see search_local)
+SELECTIVE_MATCHES = 2000
+
+# CSV columns we need from the OFF dump (tab-separated)
+NUTRIMENT_COLUMNS = [
+    "energy-kcal_100g", "energy_100g", "proteins_100g", "carbohydrates_100g", "fat_100g",
+]
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize_text(s: str) -> str:
+    """Lowercase and strip accents so 'Crème' and 'creme' index the same."""
+    s = unicodedata.normalize("NFKD", s or "")
+    return "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(s: str):
+    return [w[:MAX_TERM] for w in _WORD.findall(normalize_text(s))]
+
+
+def _prefix_end(prefix: str) -> str:
+    # smallest string greater than every string starting with `prefix`
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _as_result(row):
+    return {
+        "id": row["code"],
+        "name": row["name"],
+        "brand": row["brand"],
+        "per": 100,
+        "calories": round(row["cal_per_100g"], 1),
+        "protein": round(row["protein_per_100g"], 1),
+        "carbs":   round(row["carbs_per_100g"], 1),
+        "fat":     round(row["fat_per_100g"], 1),
+        "serving_size": row["serving_size"],
+    }
+
+
+def _term_range(word):
+    return {"term__gte": word, "term__lt": _prefix_end(word)}
+
+
+def search_local(q: str, limit: int = 10):
+    """
+    Prefix search over the local catalog: every query word must prefix-match
+    some word of the product's name/brand. Same shape as search_openfoodfacts.
+
+    Two plans, picked by how many tokens the rarest word matches (a count
+    capped at SELECTIVE_MATCHES, so it is one short index range scan):
+      - few matches: start from that word's token range and sort just those;
+      - many: walk FoodItem in popularity order (fooditem_popularity_idx)
+        and probe each product's tokens (foodtoken_food_term_idx) until
+        `limit` products match, instead of sorting every match.
+    """
+    words = sorted({w for w in tokenize(q) if len(w) >= MIN_PREFIX}, key=len, reverse=True)
+    if not words:
+        return []
+
+    counts = {w: FoodToken.objects.filter(**_term_range(w))[:SELECTIVE_MATCHES].count() for w in words}
+    rarest = min(words, key=counts.get)
+    if not counts[rarest]:
+        return []
+
+    qs = FoodItem.objects.all()
+    for w in words:
+        qs = qs.filter(Exists(FoodToken.objects.filter(food=OuterRef("pk"), **_term_range(w))))
+    if counts[rarest] < SELECTIVE_MATCHES:
+        qs = qs.filter(pk__in=FoodToken.objects.filter(**_term_range(rarest)).values("food_id"))
+    rows = (
+        qs.order_by("-popularity", "name")
+        .values("code", "name", "brand", "cal_per_100g", "protein_per_100g",
+                "carbs_per_100g", "fat_per_100g", "serving_size")[:limit]
+    )
+    return [_as_result(r) for r in rows]
+
+
+# ---- Ingestion -------------------------------------------------------------
+
+def _open_text(path):
+    if path == "-":
+        return sys.stdin
+    if str(path).endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace", newline="")
+
+
+def _csv_row_to_product(row):
+    return {
+        "code": row.get("code"),
+        "product_name": row.get("product_name"),
+        "generic_name": row.get("generic_name"),
+        "brands": row.get("brands"),
+        "serving_size": row.get("serving_size"),
+        "unique_scans_n": row.get("unique_scans_n"),
+        "nutriments": {k: row.get(k) for k in NUTRIMENT_COLUMNS},
+    }
+
+
+def iter_dump(path, fmt=None):
+    """
+    Stream product dicts from an OFF dump (JSONL or CSV/TSV, optionally .gz).
+    One line is held in memory at a time.
+    """
+    name = str(path)
+    if fmt is None:
+        fmt = "csv" if (".csv" in name or ".tsv" in name) else "jsonl"
+
+    fh = _open_text(path)
+    try:
+        if fmt == "jsonl":
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        else:
+            csv.field_size_limit(sys.maxsize)
+            first = fh.readline()
+            delimiter = "\t" if "\t" in first else ","
+            header = next(csv.reader([first], delimiter=delimiter))
+            for row in csv.DictReader(fh, fieldnames=header, delimiter=delimiter):
+                yield _csv_row_to_product(row)
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def _popularity(p):
+    try:
+        return int(float(p.get("unique_scans_n") or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def index_products(products):
+    """
+    Upsert one batch of OFF product dicts into FoodItem + FoodToken.
+    Returns the number of items written.
+    """
+    items = {}
+    for p in products:
+        code = str(p.get("code") or "").strip()[:64]
+        parsed = parse_product(p)
+        if not code or not parsed:
+            continue
+        items[code] = FoodItem(
+            code=code,
+            name=parsed["name"][:200],
+            brand=parsed["brand"][:100],
+            cal_per_100g=parsed["calories"],
+            protein_per_100g=parsed["protein"],
+            carbs_per_100g=parsed["carbs"],
+            fat_per_100g=parsed["fat"],
+            serving_size=parsed["serving_size"][:100],
+            popularity=_popularity(p),
+        )
+    if not items:
+        return 0
+
+    with transaction.atomic():
+        # re-imports replace the product and its tokens
+        FoodItem.objects.filter(code__in=list(items)).delete()
+        created = FoodItem.objects.bulk_create(items.values())
+        if any(f.pk is None for f in created):
+            # backend can't return ids from bulk insert
+            ids = dict(FoodItem.objects.filter(code__in=list(items)).values_list("code", "id"))
+            for f in created:
+                f.pk = ids[f.code]
+
+        tokens = [
+            FoodToken(term=term, food_id=f.pk)
+            for f in created
+            for term in set(tokenize(f"{f.name} {f.brand}"))
+        ]
+        FoodToken.objects.bulk_create(tokens, batch_size=5000)
+    return len(created)
@@ -0,0 +1,222 @@
+# tracker/services/food_library.py
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .ai_assistant import FOODS, Food, _totals
+
+TAG_BITS = {
+    "vegan": 1 << 0,
+    "vegetarian": 1 << 1,
+    "gluten-free": 1 << 2,
+    "dairy": 1 << 3,
+    "nuts": 1 << 4,
+    "meat": 1 << 5,
+}
+# parse_message flag -> (tag bits a food must have, tag bits it must not have)
+PREF_RULES = {
+    "vegan":       (TAG_BITS["vegan"], 0),
+    "vegetarian":  (TAG_BITS["vegetarian"], 0),
+    "gluten_free": (TAG_BITS["gluten-free"], 0),
+    "no_dairy":    (0, TAG_BITS["dairy"]),
+    "no_nuts":     (0, TAG_BITS["nuts"]),
+}
+BOWL_VEG = "Broccoli"     # the Balanced Bowl's vegetable, when the pool has it
+
+
+def tag_mask(tags) -> int:
+    return sum(bit for tag, bit in TAG_BITS.items() if tag in tags)
+
+
+def pref_bits(prefs: Dict[str, bool]):
+    """(required, forbidden) tag bits for a parse_message() dict."""
+    required = forbidden = 0
+    for flag, (req, forb) in PREF_RULES.items():
+        if prefs.get(flag):
+            required |= req
+            forbidden |= forb
+    return required, forbidden
+
+
+class FoodLibrary:
+    """
+    The coach's food library as contiguous column arrays (per-100g kcal and
+    macros plus a tag bitmask), so filtering and ranking cost a few array
+    operations whether it holds 10 foods or a whole catalog.
+    """
+
+    def __init__(self, names, cal, p, c, f, tags):
+        self.names = list(names)
+        self.cal = np.ascontiguousarray(cal, dtype=np.float64)
+        self.p = np.ascontiguousarray(p, dtype=np.float64)
+        self.c = np.ascontiguousarray(c, dtype=np.float64)
+        self.f = np.ascontiguousarray(f, dtype=np.float64)
+        self.tags = np.ascontiguousarray(tags, dtype=np.uint16)
+        self.is_bowl_veg = np.fromiter((BOWL_VEG in n for n in self.names), dtype=bool, count=len(self.names))
+        # keys (most significant first, larger is better) of the three greedy rankings
+        self.rankings = {
+            "lean_protein": (self.p, -self.f, self.cal),
+            "carb_sources": (self.c, -self.f, -self.p),
+            "healthy_fats": (self.f, self.cal),
+        }
+        for a in (self.cal, self.p, self.c, self.f, self.tags, self.is_bowl_veg):
+            a.flags.writeable = False   # derived caches below assume the columns never change
+        self._partitions = {}
+
+    @classmethod
+    def from_foods(cls, foods: List[Food]) -> "FoodLibrary":
+        return cls(
+            [x.name for x in foods],
+            [x.cal for x in foods], [x.p for x in foods], [x.c for x in foods], [x.f for x in foods],
+            [tag_mask(x.tags) for x in foods],
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def food(self, i: int) -> Food:
+        tags = {t for t, bit in TAG_BITS.items() if int(self.tags[i]) & bit}
+        return Food(self.names[i], float(self.cal[i]), float(self.p[i]), float(self.c[i]), float(self.f[i]), tags)
+
+    # --- filtering / ranking -------------------------------------------------
+
+    def fits(self, prefs: Dict[str, bool]) -> np.ndarray:
+        """Boolean mask of foods allowed by the preferences (_fits, as bit ops)."""
+        required, forbidden = pref_bits(prefs)
+        return ((self.tags & required) == required) & ((self.tags & forbidden) == 0)
+
+    def partition(self, prefs: Dict[str, bool]) -> "Partition":
+        """The precomputed pool for these preferences (built on first use, then cached)."""
+        key = pref_bits(prefs)
+        part = self._partitions.get(key)
+        if part is None:
+            part = self._partitions[key] = Partition(self, *key)
+        return part
+
+    def warm(self):
+        """Build the partitions of all 2^5 dietary-flag combinations up front."""
+        for bits in range(1 << len(PREF_RULES)):
+            self.partition({flag: bool(bits >> i & 1) for i, flag in enumerate(PREF_RULES)})
+        return self
+
+    def grams_for(self, idx, need: Dict[str, float]) -> np.ndarray:
+        """_grams_for for an array of food indices at once."""
+        idx = np.asarray(idx)
+        weights = {
+            "p": max(need["p"], 0) * 1.3,
+            "c": max(need["c"], 0) * 1.0,
+            "f": max(need["f"], 0) * 0.7,
+        }
+        key = max(weights, key=weights.get)
+        per100 = {"p": self.p, "c": self.c, "f": self.f}[key][idx]
+        per100 = np.where(per100 == 0, 0.0001, per100)
+        g = np.clip((need[key] / per100) * 100.0, 30, 400)
+
+        cal = self.cal[idx]
+        over = cal * g / 100.0 > max(need["kcal"] * 1.2, 400)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            capped = np.maximum(30, np.minimum(g, (need["kcal"] / cal) * 100.0))
+        return np.round(np.where(over, capped, g), 0)
+
+    # --- plans -----------------------------------------------------------------
+
+    def _item(self, i: int, g) -> Dict[str, Any]:
+        g = float(g)
+        return {"name": self.names[i], "grams": g, **_totals(self.food(i), g)}
+
+    def suggest(self, need: Dict[str, float], prefs: Dict[str, bool]) -> List[Dict[str, Any]]:
+        """
+        Same three plans as the greedy suggest_meals. The foods come
+        precomputed from the preference partition; only portions depend on
+        `need`, so a call is a dict lookup, a few array reads and gram sizing.
+        """
+        part = self.partition(prefs)
+        picks = part.picks
+        dominant = max([("p", need["p"]), ("c", need["c"]), ("f", need["f"])], key=lambda x: x[1])[0]
+        ranked = part.ranks[{"p": "lean_protein", "c": "carb_sources", "f": "healthy_fats"}[dominant]]
+        f1, f2p, f2c, f2v = picks["protein_fix"], picks["bowl_protein"], picks["bowl_carb"], picks["bowl_veg"]
+        f3a = int(ranked[0])
+        f3b = int(ranked[1]) if len(ranked) > 1 else f3a
+        # every portion sized against the full need, in one pass
+        g1, g2p, g3a = self.grams_for([f1, f2p, f3a], need)
+        out = []
+
+        # 1) High-protein fix
+        out.append({"title": "Quick Protein Fix", "items": [self._item(f1, g1)]})
+
+        # 2) Balanced bowl (protein + carb + veg)
+        kcal_left = need["kcal"] - _totals(self.food(f2p), float(g2p))["kcal"]
+        g2c = self.grams_for([f2c], {"kcal": kcal_left, "p": 0, "c": need["c"], "f": 0})[0]
+        out.append({
+            "title": "Balanced Bowl",
+            "items": [self._item(f2p, g2p), self._item(f2c, g2c), self._item(f2v, 100.0)],
+        })
+
+        # 3) Fill the macro gap that's largest
+        first = _totals(self.food(f3a), float(g3a))
+        need2 = {k: max(need[k] - first[k], 0) for k in ["kcal", "p", "c", "f"]}
+        g3b = self.grams_for([f3b], need2)[0]
+        out.append({"title": "Macro Gap Filler", "items": [self._item(f3a, g3a), self._item(f3b, g3b)]})
+
+        for plan in out:
+            plan["totals"] = {
+                "kcal": sum(i["kcal"] for i in plan["items"]),
+                "p":    round(sum(i["p"] for i in plan["items"]), 1),
+                "c":    round(sum(i["c"] for i in plan["items"]), 1),
+                "f":    round(sum(i["f"] for i in plan["items"]), 1),
+            }
+        return out
+
+
+class Partition:
+    """
+    The foods allowed by one combination of dietary flags, with each greedy
+    ranking as a pre-sorted index array and the plan picks that don't
+    depend on the remaining need resolved in advance.
+    """
+
+    def __init__(self, lib: FoodLibrary, required: int, forbidden: int):
+        mask = ((lib.tags & required) == required) & ((lib.tags & forbidden) == 0)
+        if not mask.any():
+            mask = np.ones(len(lib), dtype=bool)     # fallback: whole library
+        self.pool = np.flatnonzero(mask)
+
+        # stable sort, larger keys first, ties in library order = sorted(pool, reverse=True)
+        self.ranks = {
+            name: self.pool[np.lexsort(tuple(-k[self.pool] for k in reversed(keys)))]
+            for name, keys in lib.rankings.items()
+        }
+        lean, carbs = self.ranks["lean_protein"], self.ranks["carb_sources"]
+
+        def first(order, cond):
+            hit = np.flatnonzero(cond[order])
+            return int(order[hit[0]]) if hit.size else int(order[0])
+
+        veg = np.flatnonzero(lib.is_bowl_veg[self.pool])
+        self.picks = {
+            "protein_fix":  first(lean, (lib.p >= 10) & (lib.f <= 6)),
+            "bowl_protein": first(lean, (lib.p >= 8) & (lib.f < 12)),
+            "bowl_carb":    first(carbs, (lib.c >= 20) & (lib.cal <= 200)),
+            "bowl_veg":     int(self.pool[veg[0]]) if veg.size else int(self.pool[0]),
+        }
+
+
+_library: Optional[FoodLibrary] = None
+
+
+def get_library() -> FoodLibrary:
+    """The coach's library (built from ai_assistant.FOODS on first use, all partitions warm)."""
+    global _library
+    if _library is None:
+        _library = FoodLibrary.from_foods(FOODS).warm()
+    return _library
+
+
+def set_library(lib: Optional[FoodLibrary]):
+    """
+    Swap in another library (e.g. a catalog-sized one); None rebuilds from
+    FOODS on next use. Partitions and solver arrays live on the library
+    object, so replacing it is what invalidates them.
+    """
+    global _library
+    _library = lib
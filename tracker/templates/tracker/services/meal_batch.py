@@ -0,0 +1,303 @@
+# tracker/services/meal_batch.py
+import datetime as dt
+import math
+
+from django.db import connection, transaction
+
+from tracker.models import Meal
+from .ai_assistant import food_by_name
+from .meal_import import MAX_AMOUNT, check_derived_totals, fill_totals
+from .recents import refresh_recent_foods
+from .rollups import refresh_daily_totals
+
+
+def resolve_plan_item(it):
+    """
+    One coach-plan item -> Meal field dict (per-100g from the food library,
+    else derived from the kcal/p/c/f totals the client sent).
+    Raises ValueError with a user-facing message.
+    """
+    if not isinstance(it, dict):
+        raise ValueError("Bad item")
+    name = (it.get("name") or "").strip()
+    if not name:
+        raise ValueError("Missing name")
+    try:
+        # same guard as quick-add: finite, 0..MAX_AMOUNT ("inf", "nan", 1e308 are errors)
+        grams = _num(it, "grams", 0.0)
+        kcal, p, c, fat = (_num(it, k, 0.0) for k in ("kcal", "p", "c", "f"))
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}")
+    if grams <= 0:
+        raise ValueError(f"{name}: grams <= 0")
+
+    f = food_by_name(name)
+    if f:
+        cal100, p100, c100, fat100 = f.cal, f.p, f.c, f.f
+    else:
+        if (kcal, p, c, fat) == (0, 0, 0, 0):
+            raise ValueError(f"{name}: not in library and no macros provided")
+
+        factor = 100.0 / grams
+        cal100 = round(kcal * factor, 2)
+        p100   = round(p    * factor, 2)
+        c100   = round(c    * factor, 2)
+        fat100 = round(fat  * factor, 2)
+
+    row = {
+        "name": name[:200],
+        "grams": grams,
+        "cal_per_100g": cal100,
+        "protein_per_100g": p100,
+        "carbs_per_100g": c100,
+        "fat_per_100g": fat100,
+        "source": "coach",
+        "source_id": "plan",
+    }
+    try:
+        check_derived_totals(row)       # e.g. 1e6 g of a library food
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}")
+    return row
+
+
+def log_plans(user, plans):
+    """
+    Log one or more coach plans, [{"date": date, "items": [...]}, ...],
+    all or nothing: every item is resolved first, totals are computed for
+    the whole batch in one pass, then a single bulk_create runs inside a
+    transaction. If any item is invalid nothing is written.
+
+    Returns {"created", "seen", "ids", "errors"}.
+    """
+    rows, errors = [], []
+    for plan in plans:
+        day = plan["date"]
+        for it in plan["items"]:
+            try:
+                rows.append({**resolve_plan_item(it), "date": day})
+            except ValueError as e:
+                errors.append(f"{day.isoformat()}: {e}" if len(plans) > 1 else str(e))
+
+    report = {"created": 0, "seen": len(rows) + len(errors), "ids": [], "errors": errors}
+    if errors or not rows:
+        return report
+
+    fill_totals(rows)
+    with transaction.atomic():
+        meals = Meal.objects.bulk_create([Meal(user=user, **r) for r in rows])
+    report["created"] = len(meals)
+    report["ids"] = [m.pk for m in meals]
+    return report
+
+
+def parse_plans(data, default_day):
+    """
+    Normalize the ai_log_plan payload: either the single-plan form
+    (date + items) or plans=[{"date", "items"}, ...] for several days.
+    Raises ValueError for malformed input.
+    """
+    raw = data.get("plans")
+    if raw is None:
+        raw = [{"date": data.get("date"), "items": data.get("items") or []}]
+    if not isinstance(raw, list):
+        raise ValueError("plans must be a list")
+
+    plans = []
+    for p in raw:
+        if not isinstance(p, dict) or not isinstance(p.get("items", []), list):
+            raise ValueError("each plan needs an items list")
+        day = default_day
+        if p.get("date"):
+            try:
+                day = dt.date.fromisoformat(str(p["date"]))
+            except ValueError:
+                raise ValueError(f"Bad date: {p['date']}")
+        plans.append({"date": day, "items": p.get("items") or []})
+    return plans
+
+
+MAX_BATCH_ITEMS = 200
+_PER_100G_OF = {"calories": "cal_per_100g", "protein": "protein_per_100g",
+                "carbs": "carbs_per_100g", "fat": "fat_per_100g"}
+
+
+def _num(data, key, default=None):
+    v = data.get(key)
+    if v in (None, ""):
+        return default
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} is not a number")
+    if not (math.isfinite(v) and 0 <= v <= MAX_AMOUNT):     # NaN, "inf", JSON 1e999
+        raise ValueError(f"{key} must be between 0 and {MAX_AMOUNT}")
+    return v
+
+
+def resolve_quick_add_item(data, default_day):
+    """
+    One quick-add entry (form POST or JSON object) -> Meal field dict.
+    Per-100g values are preferred; any that are missing are derived from
+    the totals and grams, so later edits can rescale the meal.
+    Raises ValueError with a user-facing message.
+    """
+    if not hasattr(data, "get"):
+        raise ValueError("Bad item")
+    name = str(data.get("name") or "").strip()
+    if not name:
+        raise ValueError("Missing name")
+    grams = _num(data, "grams", 100.0)
+    if grams <= 0:
+        raise ValueError("grams must be > 0")
+    date_str = data.get("date")
+    try:
+        day = dt.date.fromisoformat(str(date_str)) if date_str else default_day
+    except ValueError:
+        raise ValueError(f"Bad date: {date_str}")
+
+    row = {
+        "name": name[:200],
+        "date": day,
+        "grams": grams,
+        "calories": int(_num(data, "calories", 0.0)),
+        "protein": _num(data, "protein", 0.0),
+        "carbs": _num(data, "carbs", 0.0),
+        "fat": _num(data, "fat", 0.0),
+        "source": str(data.get("source") or "OFF")[:50],
+        "source_id": str(data.get("source_id") or "")[:64],
+    }
+    for total, per in _PER_100G_OF.items():
+        v = _num(data, per)
+        row[per] = v if v is not None else round(row[total] * 100.0 / grams, 1)
+    check_derived_totals(row)
+    return row
+
+
+def quick_add_batch(user, items, default_day, all_or_nothing=False):
+    """
+    Log many quick-add entries with one bulk_create in one transaction.
+    Invalid entries are reported and skipped (or, with all_or_nothing,
+    nothing is written). Returns {"created", "results"} where results[i]
+    is {"ok": True, "id"} or {"ok": False, "error"} for items[i].
+    """
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"At most {MAX_BATCH_ITEMS} items per request")
+
+    results, rows = [], []
+    for it in items:
+        try:
+            rows.append(resolve_quick_add_item(it, default_day))
+            results.append({"ok": True})
+        except ValueError as e:
+            results.append({"ok": False, "error": str(e)})
+
+    if all_or_nothing and len(rows) < len(items):
+        results = [r if not r["ok"] else {"ok": False, "error": "Not logged: other items are invalid"}
+                   for r in results]
+        rows = []
+    if not rows:
+        return {"created": 0, "results": results}
+
+    fill_totals(rows)
+    with transaction.atomic():
+        meals = Meal.objects.bulk_create([Meal(user=user, **r) for r in rows])
+    ids = iter(m.pk for m in meals)
+    for r in results:
+        if r["ok"]:
+            r["id"] = next(ids)
+    return {"created": len(meals), "results": results}
+
+
+MAX_REPLAY_DAYS = 366
+# every Meal column except the pk and the date, which replay rewrites
+REPLAY_FIELDS = [f for f in Meal._meta.concrete_fields if not f.primary_key and f.attname != "date"]
+_INSERT_SELECT_VENDORS = ("sqlite", "postgresql", "mysql")
+
+
+def replay_days(src_start, src_end, dst_start, dst_end=None):
+    """
+    [(source_day, target_day), ...]: the source range repeated over the
+    target range, so a 7-day plan replayed over a month cycles weekly.
+    dst_end defaults to one copy of the source range.
+    """
+    n = (src_end - src_start).days + 1
+    if n <= 0:
+        raise ValueError("Source range ends before it starts")
+    dst_end = dst_end or dst_start + dt.timedelta(days=n - 1)
+    total = (dst_end - dst_start).days + 1
+    if total <= 0:
+        raise ValueError("Target range ends before it starts")
+    if total > MAX_REPLAY_DAYS:
+        raise ValueError(f"Target range is limited to {MAX_REPLAY_DAYS} days")
+    return [(src_start + dt.timedelta(days=i % n), dst_start + dt.timedelta(days=i)) for i in range(total)]
+
+
+def _replay_insert_select(user_id, mapping):
+    """
+    One INSERT ... SELECT joined to a (src, dst) date map: the copies are
+    made inside the database, no Meal rows are loaded into Python.
+    """
+    qn = connection.ops.quote_name
+    table = qn(Meal._meta.db_table)
+    cols = [qn(f.column) for f in REPLAY_FIELDS]
+    date_col = qn(Meal._meta.get_field("date").column)
+    user_col = qn(Meal._meta.get_field("user").column)
+
+    ph = "CAST(%s AS date)" if connection.vendor == "postgresql" else "%s"
+    day_map = " UNION ALL ".join(f"SELECT {ph} AS src, {ph} AS dst" for _ in mapping)
+    params = []
+    for src, dst in mapping:
+        params += [connection.ops.adapt_datefield_value(src), connection.ops.adapt_datefield_value(dst)]
+    params.append(user_id)
+
+    sql = (
+        f"INSERT INTO {table} ({', '.join(cols)}, {date_col}) "
+        f"SELECT {', '.join('m.' + c for c in cols)}, d.dst "
+        f"FROM {table} m INNER JOIN ({day_map}) d ON m.{date_col} = d.src "
+        f"WHERE m.{user_col} = %s ORDER BY d.dst, m.{qn('id')}"
+    )
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.rowcount
+
+
+def _replay_bulk(user_id, mapping):
+    """Fallback: read the source rows once, write all copies with one bulk_create."""
+    by_src = {}
+    for src, dst in mapping:
+        by_src.setdefault(src, []).append(dst)
+    rows = (
+        Meal.objects.filter(user_id=user_id, date__in=by_src)
+        .order_by("date", "id").values("date", *[f.attname for f in REPLAY_FIELDS])
+    )
+    clones = [Meal(**{**r, "date": dst}) for r in rows for dst in by_src[r["date"]]]
+    clones.sort(key=lambda m: m.date)
+    return len(Meal.objects.bulk_create(clones, batch_size=2000))
+
+
+def replay_meals(user, src_start, src_end, dst_start, dst_end=None, replace=False):
+    """
+    Copy the user's meals from src_start..src_end onto dst_start..dst_end
+    with every column preserved (grams, per-100g, source). With
+    replace=True meals already on the target days are removed first.
+    Returns {"created", "deleted", "days"}.
+    """
+    mapping = replay_days(src_start, src_end, dst_start, dst_end)
+    targets = [dst for _, dst in mapping]
+    if replace and set(targets) & {src for src, _ in mapping}:
+        raise ValueError("Target range overlaps the source range")
+
+    with transaction.atomic():
+        deleted = 0
+        if replace:
+            deleted, _ = Meal.objects.filter(user=user, date__in=targets).delete()
+        if connection.vendor in _INSERT_SELECT_VENDORS:
+            created = _replay_insert_select(user.pk, mapping)
+        else:
+            created = _replay_bulk(user.pk, mapping)
+        refresh_daily_totals({(user.pk, d) for d in targets})
+        # the raw INSERT bypasses MealQuerySet, so the recents are refreshed here too
+        names = Meal.objects.filter(user=user, date__in={src for src, _ in mapping}).values_list("name", flat=True)
+        refresh_recent_foods({(user.pk, n) for n in names.distinct()})
+    return {"created": created, "deleted": deleted, "days": len(targets)}
@@ -0,0 +1,185 @@
+# tracker/services/meal_import.py
+import csv
+import datetime as dt
+import json
+import math
+import sys
+
+import numpy as np
+from django.db import transaction
+
+from tracker.models import Meal
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+# header/key (lower-cased) -> Meal field; our own CSV and NDJSON exports import as-is
+FIELD_ALIASES = {
+    "date": "date", "day": "date",
+    "name": "name", "food": "name",
+    "calories": "calories", "kcal": "calories", "energy": "calories",
+    "protein": "protein",
+    "carbs": "carbs", "carbohydrates": "carbs",
+    "fat": "fat",
+    "grams": "grams", "quantity_g": "grams",
+    "cal_per_100g": "cal_per_100g", "kcal_per_100g": "cal_per_100g",
+    "protein_per_100g": "protein_per_100g",
+    "carbs_per_100g": "carbs_per_100g",
+    "fat_per_100g": "fat_per_100g",
+    "source": "source",
+    "source_id": "source_id", "barcode": "source_id",
+}
+NUMERIC_FIELDS = ("calories", "protein", "carbs", "fat", "grams",
+                  "cal_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g")
+# no food amount, macro or total comes anywhere near this; it keeps
+# grams x per-100g products and the int cast of calories far from overflowing
+MAX_AMOUNT = 1_000_000
+# total field -> the per-100g field it is derived from when grams are known
+PER_100G = {
+    "calories": "cal_per_100g",
+    "protein": "protein_per_100g",
+    "carbs": "carbs_per_100g",
+    "fat": "fat_per_100g",
+}
+
+
+def guess_format(filename):
+    name = (filename or "").lower().removesuffix(".gz")
+    return "ndjson" if name.endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+def iter_records(fh, fmt):
+    """
+    Stream (line_number, dict) from a CSV/TSV (header row) or NDJSON text
+    stream. Unparseable NDJSON lines come through as (line, None).
+    """
+    if fmt == "ndjson":
+        for n, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                rec = None
+            yield n, rec if isinstance(rec, dict) else None
+        return
+
+    csv.field_size_limit(sys.maxsize)
+    first = fh.readline().lstrip("\ufeff")
+    delimiter = "\t" if "\t" in first else ","
+    header = next(csv.reader([first], delimiter=delimiter), [])
+    reader = csv.DictReader(fh, fieldnames=header, delimiter=delimiter)
+    for row in reader:
+        yield reader.line_num + 1, row
+
+
+def clean_record(rec):
+    """Map a raw record onto Meal fields. Raises ValueError with a readable reason."""
+    if rec is None:
+        raise ValueError("not a JSON object")
+    row = {}
+    for key, value in rec.items():
+        field = FIELD_ALIASES.get(str(key).strip().lower())
+        if field and value not in (None, ""):
+            row[field] = value.strip() if isinstance(value, str) else value
+
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("missing name")
+    row["name"] = name[:200]
+
+    try:
+        row["date"] = dt.date.fromisoformat(str(row.get("date") or "")[:10])
+    except ValueError:
+        raise ValueError(f"bad date {row.get('date')!r} (use YYYY-MM-DD)")
+
+    for f in NUMERIC_FIELDS:
+        if f in row:
+            try:
+                v = float(row[f])
+            except (TypeError, ValueError):
+                raise ValueError(f"{f} is not a number: {row[f]!r}")
+            if not (math.isfinite(v) and 0 <= v <= MAX_AMOUNT):     # "nan", "inf", "1e999"
+                raise ValueError(f"{f} must be between 0 and {MAX_AMOUNT}")
+            row[f] = v
+    check_derived_totals(row)
+
+    row["source"] = str(row.get("source") or "import")[:50]
+    row["source_id"] = str(row.get("source_id") or "")[:64]
+    return row
+
+
+def check_derived_totals(row):
+    """ValueError if grams x a per-100g value would make a total over MAX_AMOUNT."""
+    grams = row.get("grams") or 0
+    for total, per in PER_100G.items():
+        if row.get(per) is not None and grams * row[per] / 100.0 > MAX_AMOUNT:
+            raise ValueError(f"{total} (grams x {per}) must be at most {MAX_AMOUNT}")
+
+
+def fill_totals(rows):
+    """
+    Column-wise Meal.recalc_totals for a batch: where grams and a per-100g
+    value are present the total is grams × per-100g / 100, else the total
+    given in the file (or 0) is kept.
+    """
+    if not rows:
+        return rows
+    grams = np.array([r.get("grams", np.nan) for r in rows], dtype=float)
+    has_grams = grams > 0          # NaN compares False
+    for total, per in PER_100G.items():
+        per100 = np.array([r.get(per, np.nan) for r in rows], dtype=float)
+        given = np.array([r.get(total, 0.0) for r in rows], dtype=float)
+        values = np.where(has_grams & ~np.isnan(per100), per100 * grams / 100.0, given)
+        values = np.minimum(values, MAX_AMOUNT)      # callers validate; never cast an unbounded value
+        if total == "calories":
+            values = np.rint(values).astype(int)
+        else:
+            values = np.round(values, 1)
+        for r, v in zip(rows, values.tolist()):
+            r[total] = v
+    return rows
+
+
+def import_meals(user, fh, fmt="csv", batch_size=DEFAULT_BATCH_SIZE, strict=False,
+                 max_errors=MAX_REPORTED_ERRORS):
+    """
+    Validate and insert meals from a text stream for one user. Rows are
+    validated as they are read and written with bulk_create `batch_size` at
+    a time, all inside one transaction. Bad rows are skipped and reported
+    by line; with strict=True any bad row rolls the whole import back.
+
+    Returns {"rows", "created", "skipped", "errors": [{"line", "error"}]}
+    (errors capped at `max_errors`).
+    """
+    report = {"rows": 0, "created": 0, "skipped": 0, "errors": []}
+
+    def flush(batch):
+        if strict and report["skipped"]:
+            return            # rolled back anyway; keep validating for the report
+        fill_totals(batch)
+        Meal.objects.bulk_create([Meal(user=user, **r) for r in batch], batch_size=batch_size)
+        report["created"] += len(batch)
+
+    with transaction.atomic():
+        batch = []
+        for line, rec in iter_records(fh, fmt):
+            report["rows"] += 1
+            try:
+                batch.append(clean_record(rec))
+            except ValueError as e:
+                report["skipped"] += 1
+                if len(report["errors"]) < max_errors:
+                    report["errors"].append({"line": line, "error": str(e)})
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        if strict and report["skipped"]:
+            transaction.set_rollback(True)
+            report["created"] = 0
+    return report
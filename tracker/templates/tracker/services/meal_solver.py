@@ -0,0 +1,163 @@
+# tracker/services/meal_solver.py
+import time
+from itertools import combinations, islice
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .ai_assistant import _totals
+from .food_library import FoodLibrary, get_library
+
+MIN_GRAMS, MAX_GRAMS = 30.0, 400.0      # same portion bounds as _grams_for
+# error weights on kcal / protein / carbs / fat (protein first, as in _grams_for)
+DEFAULT_WEIGHTS = (1.0, 1.3, 1.0, 0.7)
+KCAL_PER_GRAM = np.array([1.0, 4.0, 4.0, 9.0])   # macros are compared in kcal
+KCAL_SLACK = 1.10         # a plan may overshoot the remaining kcal by at most 10%
+CANDIDATES = 24           # foods kept after the single-food screen
+SWEEPS = 25               # coordinate-descent passes per combination
+CHUNK = 512               # combinations solved per vectorized batch
+
+
+def _targets(need):
+    t = np.array([need["kcal"], need["p"], need["c"], need["f"]], dtype=np.float64)
+    return np.maximum(t, 0) * KCAL_PER_GRAM
+
+
+class _Profile:
+    """Need-independent arrays the solver derives from a library, built once per library."""
+
+    def __init__(self, lib: FoodLibrary):
+        # (4, n) kcal-equivalents per gram of kcal/p/c/f, one contiguous row per nutrient
+        self.per_gram = np.stack([lib.cal, lib.p, lib.c, lib.f]) * (KCAL_PER_GRAM / 100.0)[:, None]
+        self.squared = self.per_gram ** 2
+        # macro kcal per food kcal: where the "densest source" picks come from
+        self.share = self.per_gram[1:] / np.maximum(self.per_gram[0], 1e-9)
+
+
+def _profile(lib: FoodLibrary) -> _Profile:
+    prof = getattr(lib, "_solver_profile", None)
+    if prof is None:
+        prof = lib._solver_profile = _Profile(lib)
+    return prof
+
+
+def screen(lib: FoodLibrary, pool, t, w, keep=CANDIDATES):
+    """
+    Score every food in the pool at once by how well it alone (at its best
+    portion) covers the need, and keep the best `keep` plus the densest
+    source of each macro, so mixes have something to combine.
+    """
+    idx = np.flatnonzero(pool)
+    if idx.size <= keep:
+        return idx
+    prof = _profile(lib)
+    b = (w * t) @ prof.per_gram                              # sum_m w a t, per food
+    q = w @ prof.squared                                     # sum_m w a^2
+    g = np.clip(b / np.maximum(q, 1e-12), MIN_GRAMS, MAX_GRAMS)
+    err = g * g * q - 2 * g * b                              # + const, same for all foods
+    err[~pool] = np.inf
+    picked = set(np.argpartition(err, keep - 1)[:keep].tolist())
+    for share in prof.share:
+        picked.add(int(np.argmax(np.where(pool, share, -np.inf))))
+    return np.array(sorted(picked))
+
+
+def solve_grams(A, t, w, sweeps=SWEEPS):
+    """
+    Box-constrained weighted least squares for a batch of combinations:
+    A is (M, 4, k) kcal-equivalents per gram, returns grams (M, k) within
+    [MIN_GRAMS, MAX_GRAMS] minimizing sum_m w_m (A g - t)_m^2, by exact
+    coordinate descent (convex, so it converges to the box optimum).
+    """
+    M, _, k = A.shape
+    wt = w[None, :, None]
+    diag = np.maximum((wt * A * A).sum(1), 1e-12)            # (M, k)
+    g = np.full((M, k), MIN_GRAMS)
+    r = np.einsum("mik,mk->mi", A, g) - t                    # residuals (M, 4)
+    for _ in range(sweeps):
+        for j in range(k):
+            a = A[:, :, j]
+            step = (w * a * r).sum(1) / diag[:, j]
+            new = np.clip(g[:, j] - step, MIN_GRAMS, MAX_GRAMS)
+            r += a * (new - g[:, j])[:, None]
+            g[:, j] = new
+    return g
+
+
+def _evaluate(A, t, w, kcal_cap):
+    g = np.round(solve_grams(A, t, w))
+    got = np.einsum("mik,mk->mi", A, g)
+    kcal = got[:, 0]
+    # too many calories: shrink portions toward the cap, then re-check
+    over = kcal > kcal_cap
+    if over.any():
+        scale = np.where(over, kcal_cap / np.maximum(kcal, 1e-9), 1.0)
+        g = np.floor(np.clip(g * scale[:, None], MIN_GRAMS, MAX_GRAMS))
+        got = np.einsum("mik,mk->mi", A, g)
+    err = (w * (got - t) ** 2).sum(1)
+    err[got[:, 0] > kcal_cap + 1e-6] = np.inf
+    return g, err
+
+
+def solve_plan(need: Dict[str, float], prefs: Dict[str, bool], lib: Optional[FoodLibrary] = None,
+               max_items: int = 3, deadline_ms: float = 50.0, weights=DEFAULT_WEIGHTS,
+               clock=time.perf_counter) -> Optional[Dict[str, Any]]:
+    """
+    Pick up to `max_items` foods and portions (30–400 g) minimizing the
+    weighted macro error against `need`, without exceeding its kcal by more
+    than 10%. Combinations are tried smallest first, in vectorized chunks;
+    once `deadline_ms` has passed the best plan so far is returned.
+    Returns a plan dict (suggest_meals shape) or None if nothing fits.
+    """
+    start = clock()
+    lib = lib or get_library()
+    t = _targets(need)
+    if not t.any():
+        return None
+    w = np.asarray(weights, dtype=np.float64)
+    kcal_cap = max(t[0] * KCAL_SLACK, 0.0)
+
+    pool = lib.fits(prefs)
+    if not pool.any():
+        pool = np.ones(len(lib), dtype=bool)
+    cand = screen(lib, pool, t, w)
+    prof = _profile(lib).per_gram[:, cand].T                   # (candidates, 4)
+
+    best_err, best = np.inf, None
+    timed_out = False
+    for k in range(1, max_items + 1):
+        combos = combinations(range(len(cand)), k)
+        while True:
+            chunk = np.array(list(islice(combos, CHUNK)), dtype=np.intp).reshape(-1, k)
+            if not chunk.size:
+                break
+            A = prof[chunk].transpose(0, 2, 1)               # (M, 4, k)
+            g, err = _evaluate(A, t, w, kcal_cap)
+            i = int(np.argmin(err))
+            if err[i] < best_err:
+                best_err, best = err[i], (cand[chunk[i]], g[i])
+            if (clock() - start) * 1000 >= deadline_ms:
+                timed_out = True
+                break
+        if timed_out:
+            break
+
+    if best is None:
+        return None
+    foods, grams = best
+    items = []
+    for i, gr in zip(foods.tolist(), grams.tolist()):
+        items.append({"name": lib.names[i], "grams": float(gr), **_totals(lib.food(i), float(gr))})
+    return {
+        "title": "Optimized Plan",
+        "items": items,
+        "totals": {
+            "kcal": sum(i["kcal"] for i in items),
+            "p":    round(sum(i["p"] for i in items), 1),
+            "c":    round(sum(i["c"] for i in items), 1),
+            "f":    round(sum(i["f"] for i in items), 1),
+        },
+        "solver": {"error": round(float(np.sqrt(best_err)), 1), "complete": not timed_out,
+                   "ms": round((clock() - start) * 1000, 1)},
+    }
+
@@ -1,4 +1,16 @@
 # tracker/services/nutrition.py
+from functools import lru_cache
+from types import SimpleNamespace
+
+import numpy as np
+
+ACTIVITY_FACTORS = {
+    "sedentary":   1.20,
+    "light":       1.375,
+    "moderate":    1.55,
+    "active":      1.725,
+    "very_active": 1.90,
+}
 
 def mifflin_bmr(sex: str, weight_kg: float, height_cm: float, age: int):
     if not (sex and weight_kg and height_cm and age):
@@ -10,13 +22,7 @@ def mifflin_bmr(sex: str, weight_kg: float, height_cm: float, age: int):
     return None
 
 def activity_factor(activity: str):
-    return {
-        "sedentary":   1.20,
-        "light":       1.375,
-        "moderate":    1.55,
-        "active":      1.725,
-        "very_active": 1.90,
-    }.get(activity or "moderate", 1.55)
+    return ACTIVITY_FACTORS.get(activity or "moderate", 1.55)
 
 def suggest_calorie_target(goal):
     bmr = mifflin_bmr(goal.sex, goal.weight_kg, goal.height_cm, goal.age)
@@ -96,3 +102,121 @@ def suggest_macros(goal, target_calories=None):
         "carbs": carbs_g,
         "method": "ratio",
     }
+
+
+# --- memoized / batch recommendations -----------------------------------
+
+# every Goal field the recommendations read
+GOAL_FIELDS = ("sex", "weight_kg", "height_cm", "age", "activity", "weekly_rate_kg", "objective", "calories")
+
+
+def goal_key(goal):
+    return tuple(getattr(goal, f) for f in GOAL_FIELDS)
+
+
+@lru_cache(maxsize=4096)
+def _calorie_target(key):
+    return suggest_calorie_target(SimpleNamespace(**dict(zip(GOAL_FIELDS, key))))
+
+
+@lru_cache(maxsize=4096)
+def _macros(key, target_calories):
+    return suggest_macros(SimpleNamespace(**dict(zip(GOAL_FIELDS, key))), target_calories)
+
+
+def calorie_target(goal):
+    """suggest_calorie_target, memoized on the goal fields it reads."""
+    return dict(_calorie_target(goal_key(goal)))
+
+
+def macro_target(goal, target_calories=None):
+    """suggest_macros, memoized on the goal fields and the calorie target."""
+    return dict(_macros(goal_key(goal), target_calories))
+
+
+def recommend(goal):
+    """
+    (calorie reco, macro reco) as the dashboard shows them. Results are
+    cached on the values they are computed from, so saving a Goal with new
+    inputs changes the key and a stale recommendation is never served;
+    an unchanged goal costs a dict lookup. Callers get their own copies.
+    """
+    reco = calorie_target(goal)
+    return reco, macro_target(goal, reco.get("recommended") or goal.calories)
+
+
+def cache_info():
+    return {"calories": _calorie_target.cache_info(), "macros": _macros.cache_info()}
+
+
+def cache_clear():
+    _calorie_target.cache_clear()
+    _macros.cache_clear()
+
+
+def _round5_array(x):
+    return (np.rint(x / 5.0) * 5).astype(np.int64)
+
+
+def recommend_batch(rows):
+    """
+    BMR / TDEE / calorie target / macros for many goals in one NumPy pass.
+    `rows` are GOAL_FIELDS tuples (e.g. Goal.objects.values_list(*GOAL_FIELDS)).
+    Same numbers as suggest_calorie_target + suggest_macros, as arrays:
+    {"valid", "bmr", "tdee", "recommended", "delta_per_day", "calories",
+     "protein", "fat", "carbs", "per_kg"}; entries where valid is False
+    have no TDEE estimate (recommended = 0), their macros use the current
+    calorie goal.
+    """
+    cols = list(zip(*rows)) or [()] * len(GOAL_FIELDS)
+    sex, weight, height, age, activity, rate, objective, calories = cols
+
+    def num(col):
+        return np.array([v or 0 for v in col], dtype=np.float64)
+
+    w, h, a = num(weight), num(height), num(age)
+    sex = np.array(sex, dtype=object)
+    offset = np.where(sex == "M", 5.0, -161.0)
+    valid = ((sex == "M") | (sex == "F")) & (w != 0) & (h != 0) & (a != 0)
+
+    bmr = 10 * w + 6.25 * h - 5 * a + offset
+    factor = np.array([ACTIVITY_FACTORS.get(x or "moderate", 1.55) for x in activity])
+    tdee = bmr * factor
+
+    delta = num(rate) * 7700 / 7.0
+    objective = np.array(objective, dtype=object)
+    delta = np.where(objective == "lose", -np.abs(delta), np.where(objective == "gain", np.abs(delta), 0.0))
+    cap = 0.20 * tdee
+    delta = np.minimum(np.maximum(delta, -cap), cap)
+    recommended = np.where(valid, np.rint(tdee + delta), 0).astype(np.int64)
+
+    # macro target: the recommendation, else the current goal, else 2000
+    current = num(calories)
+    target = np.where(recommended != 0, recommended, current)
+    target = np.where(target > 0, target, np.where(current != 0, current, 2000)).astype(np.float64)
+
+    per_kg = w != 0
+    prot = np.clip(_round5_array(1.8 * w), 60, 250)
+    fat = np.clip(_round5_array(0.8 * w), 30, 120)
+    rem = target - 4 * prot - 9 * fat
+    carbs = _round5_array(np.maximum(0, rem / 4.0))
+    squeeze = (carbs == 0) & (rem < 0)
+    fat = np.where(squeeze, np.maximum(30, _round5_array((target - 4 * prot) / 9.0 * 0.25)), fat)
+    carbs = np.where(squeeze, _round5_array(np.maximum(0, (target - 4 * prot - 9 * fat) / 4.0)), carbs)
+
+    r_prot = _round5_array((target * 0.30) / 4.0)
+    r_fat = _round5_array((target * 0.25) / 9.0)
+    r_carbs = _round5_array(np.maximum(0, (target - 4 * r_prot - 9 * r_fat) / 4.0))
+
+    return {
+        "valid": valid,
+        "bmr": np.where(valid, bmr, np.nan),
+        "tdee": np.where(valid, tdee, np.nan),
+        "recommended": recommended,
+        "delta_per_day": np.where(valid, delta, 0.0),
+        "calories": target.astype(np.int64),
+        "protein": np.where(per_kg, prot, r_prot),
+        "fat": np.where(per_kg, fat, r_fat),
+        "carbs": np.where(per_kg, carbs, r_carbs),
+        "per_kg": per_kg,
+    }
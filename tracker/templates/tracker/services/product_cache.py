@@ -0,0 +1,125 @@
+# tracker/services/product_cache.py
+import re
+
+from django.core.cache import caches
+
+from tracker.models import FavoriteFood, FoodItem, FoodToken, Meal
+from .food_api import lookup_openfoodfacts
+from .search_cache import CACHE_ALIAS, breaker
+
+MISS_TTL = 3600          # remember unknown barcodes for an hour
+_GRAMS_SUFFIX = re.compile(r"\s*\(\d+(?:\.\d+)?\s*g\)\s*$")   # "Banana (150 g)"
+
+
+def is_barcode(code: str) -> bool:
+    return bool(re.fullmatch(r"\d{4,32}", code or ""))
+
+
+def _as_result(f: FoodItem):
+    return {
+        "id": f.code,
+        "name": f.name,
+        "brand": f.brand,
+        "per": 100,
+        "calories": round(f.cal_per_100g, 1),
+        "protein": round(f.protein_per_100g, 1),
+        "carbs":   round(f.carbs_per_100g, 1),
+        "fat":     round(f.fat_per_100g, 1),
+        "serving_size": f.serving_size,
+    }
+
+
+def _as_item(r):
+    return FoodItem(
+        code=str(r["id"])[:64],
+        name=(r.get("name") or "Food")[:200],
+        brand=(r.get("brand") or "")[:100],
+        cal_per_100g=r.get("calories") or 0,
+        protein_per_100g=r.get("protein") or 0,
+        carbs_per_100g=r.get("carbs") or 0,
+        fat_per_100g=r.get("fat") or 0,
+        serving_size=(r.get("serving_size") or "")[:100],
+    )
+
+
+def remember_products(results):
+    """
+    Upsert search/lookup results (search_openfoodfacts shape) into FoodItem
+    so their barcodes resolve locally later. Rows are not tokenized, so they
+    don't leak into local catalog search. Catalog rows (the ones with
+    tokens) are left alone: `import_food_catalog` owns them, and renaming
+    one here would leave search matching its old tokens. FoodItem is shared
+    by every user: only pass payloads that came from the food API, never
+    user-entered data.
+    """
+    items = {str(r["id"]): _as_item(r) for r in results if is_barcode(str(r.get("id") or ""))}
+    indexed = FoodToken.objects.filter(food__code__in=list(items)).values_list("food__code", flat=True)
+    for code in set(indexed):
+        del items[code]
+    if not items:
+        return 0
+    FoodItem.objects.bulk_create(
+        items.values(),
+        update_conflicts=True,
+        unique_fields=["code"],
+        update_fields=["name", "brand", "cal_per_100g", "protein_per_100g",
+                       "carbs_per_100g", "fat_per_100g", "serving_size"],
+    )
+    return len(items)
+
+
+def _from_history(user, code):
+    """
+    Per-100g values from the user's favorites or past meals with this
+    barcode. Served to that user only: it is whatever they typed in.
+    """
+    fields = ["name", "cal_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g"]
+    row = (
+        FavoriteFood.objects.filter(user=user, source_id=code, cal_per_100g__isnull=False)
+        .order_by("-created_at").values(*fields, "brand").first()
+        or Meal.objects.filter(user=user, source_id=code, cal_per_100g__isnull=False)
+        .order_by("-date", "-id").values(*fields).first()
+    )
+    if not row:
+        return None
+    return {
+        "id": code,
+        "name": _GRAMS_SUFFIX.sub("", row["name"]) or "Food",
+        "brand": row.get("brand") or "",
+        "per": 100,
+        "calories": round(row["cal_per_100g"] or 0, 1),
+        "protein": round(row["protein_per_100g"] or 0, 1),
+        "carbs":   round(row["carbs_per_100g"] or 0, 1),
+        "fat":     round(row["fat_per_100g"] or 0, 1),
+        "serving_size": "",
+    }
+
+
+def lookup_product(code: str, user=None, fetch=lookup_openfoodfacts):
+    """
+    Resolve a barcode: local FoodItem -> user's favorites/meals -> upstream.
+    Returns (result, source) or (None, None). Upstream hits are written back
+    to FoodItem, so a known product never needs the network again; history
+    hits are not, so one user's entries never reach another user.
+    """
+    f = FoodItem.objects.filter(code=code).first()
+    if f:
+        return _as_result(f), "cache"
+
+    if user is not None and user.is_authenticated:
+        r = _from_history(user, code)
+        if r:
+            return r, "history"
+
+    misses = caches[CACHE_ALIAS]
+    miss_key = f"offproduct:miss:{code}"
+    if misses.get(miss_key):
+        return None, None
+
+    r = breaker.call(fetch, code)
+    if r is None:
+        misses.set(miss_key, True, MISS_TTL)
+        return None, None
+    r["id"] = code
+    remember_products([r])
+    return r, "upstream"
@@ -0,0 +1,148 @@
+# tracker/services/projection.py
+import datetime as dt
+
+import numpy as np
+from django.db.models import Avg, Count
+
+from tracker.models import DailyTotals, DataVersion, Goal, WeightProjection
+from .dashboard_cache import data_version
+from .nutrition import ACTIVITY_FACTORS
+
+KCAL_PER_KG = 7700.0      # same rule as suggest_calorie_target
+DEFAULT_WEEKS = 12
+HISTORY_DAYS = 28         # intake is averaged over the logged days in this window
+MIN_LOGGED_DAYS = 3       # fewer than this: project the calorie goal instead
+
+
+def project_weights(weight_kg, height_cm, age, sex_offset, factor, intake, days):
+    """
+    Daily weight for `days` days for many people at once, shape (U, days + 1).
+    Each day the energy balance (intake - TDEE) moves weight by 1/7700 kg per
+    kcal, and TDEE is re-derived from the new weight (Mifflin-St Jeor x
+    activity factor), so the deficit shrinks as weight drops.
+
+    All arguments are (U,) arrays; intake may also be (U, days) for a
+    per-day plan. The recurrence w[t+1] = r w[t] + b[t] with
+    r = 1 - 10 factor / 7700 is solved in closed form, so the whole
+    (users x days) grid is a few array operations, no Python loop.
+    """
+    w0 = np.asarray(weight_kg, dtype=np.float64)
+    factor = np.asarray(factor, dtype=np.float64)
+    # TDEE = factor * (10 w + k): k is everything in the BMR but weight
+    k = 6.25 * np.asarray(height_cm, dtype=np.float64) - 5 * np.asarray(age, dtype=np.float64) + sex_offset
+    intake = np.broadcast_to(np.asarray(intake, dtype=np.float64).reshape(len(w0), -1), (len(w0), days))
+
+    r = 1.0 - 10.0 * factor / KCAL_PER_KG
+    b = (intake - (factor * k)[:, None]) / KCAL_PER_KG         # (U, days)
+    t = np.arange(days + 1, dtype=np.float64)
+    rt = r[:, None] ** t                                         # r^t, (U, days + 1)
+    # w[t] = r^t (w0 + sum_{s<t} b[s] r^-(s+1))
+    acc = np.cumsum(b / rt[:, 1:], axis=1)
+    return rt * np.concatenate([w0[:, None], w0[:, None] + acc], axis=1)
+
+
+def recent_intake(user_ids=None, today=None, history_days=HISTORY_DAYS):
+    """{user_id: (mean kcal over logged days, logged days)} from DailyTotals, in one query."""
+    today = today or dt.date.today()
+    qs = DailyTotals.objects.filter(
+        date__gte=today - dt.timedelta(days=history_days), date__lt=today, meal_count__gt=0,
+    )
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    rows = qs.values("user_id").annotate(avg=Avg("kcal"), n=Count("id")).order_by()
+    return {r["user_id"]: (r["avg"], r["n"]) for r in rows}
+
+
+def project_users(user_ids=None, weeks=DEFAULT_WEEKS, today=None, history_days=HISTORY_DAYS):
+    """
+    Project every user (or `user_ids`) whose Goal has sex, age, height and
+    weight: three queries, then one project_weights call for all of them.
+    Returns {"start", "user_ids", "versions", "weights" (U, 7 weeks + 1),
+    "intake", "logged_days", "tdee_start", "tdee_end"}; `versions` are the
+    users' data versions read before their data, so a write that lands
+    meanwhile makes the result stale rather than mislabelled.
+    """
+    today = today or dt.date.today()
+    versions = DataVersion.objects.all()
+    if user_ids is not None:
+        versions = versions.filter(user_id__in=user_ids)
+    versions = dict(versions.values_list("user_id", "version"))
+    goals = Goal.objects.filter(sex__in=("M", "F"), age__gt=0, height_cm__gt=0, weight_kg__gt=0)
+    if user_ids is not None:
+        goals = goals.filter(user_id__in=user_ids)
+    rows = list(goals.order_by("user_id").values_list(
+        "user_id", "sex", "age", "height_cm", "weight_kg", "activity", "calories"))
+    intake_by_user = recent_intake([r[0] for r in rows] if user_ids is not None else None, today, history_days)
+
+    ids = [r[0] for r in rows]
+    if not ids:
+        empty = np.zeros(0)
+        return {"start": today, "user_ids": [], "versions": [], "weights": np.zeros((0, weeks * 7 + 1)),
+                "intake": empty, "logged_days": empty, "tdee_start": empty, "tdee_end": empty}
+    sex_offset = np.array([5.0 if r[1] == "M" else -161.0 for r in rows])
+    age = np.array([r[2] for r in rows], dtype=np.float64)
+    height = np.array([r[3] for r in rows], dtype=np.float64)
+    weight = np.array([r[4] for r in rows], dtype=np.float64)
+    factor = np.array([ACTIVITY_FACTORS.get(r[5] or "moderate", 1.55) for r in rows])
+    logged = np.array([intake_by_user.get(uid, (0, 0))[1] for uid in ids], dtype=np.int64)
+    intake = np.array([
+        intake_by_user[uid][0] if n >= MIN_LOGGED_DAYS else (r[6] or 0)
+        for uid, n, r in zip(ids, logged.tolist(), rows)
+    ], dtype=np.float64)
+
+    weights = project_weights(weight, height, age, sex_offset, factor, intake, weeks * 7)
+    tdee = factor[:, None] * (10 * weights[:, [0, -1]] + (6.25 * height - 5 * age + sex_offset)[:, None])
+    return {
+        "start": today,
+        "user_ids": ids,
+        "versions": [versions.get(uid, 0) for uid in ids],
+        "weights": weights,
+        "intake": intake,
+        "logged_days": logged,
+        "tdee_start": tdee[:, 0],
+        "tdee_end": tdee[:, 1],
+    }
+
+
+def chart_points(result, i):
+    """Weekly chart payload for row i of a project_users() result."""
+    start = result["start"]
+    weekly = result["weights"][i, ::7]
+    return {
+        "start": start.isoformat(),
+        "weeks": [(start + dt.timedelta(weeks=n)).isoformat() for n in range(len(weekly))],
+        "weight_kg": [round(float(x), 2) for x in weekly],
+        "intake": round(float(result["intake"][i])),
+        "from_log": bool(result["logged_days"][i] >= MIN_LOGGED_DAYS),
+        "tdee_start": round(float(result["tdee_start"][i])),
+        "tdee_end": round(float(result["tdee_end"][i])),
+    }
+
+
+def store_projections(result, weeks=DEFAULT_WEEKS, batch_size=2000):
+    """Upsert every user's chart into WeightProjection, tagged with its data version and start day."""
+    WeightProjection.objects.bulk_create(
+        (WeightProjection(user_id=uid, weeks=weeks, version=version, start=result["start"],
+                          chart=chart_points(result, i))
+         for i, (uid, version) in enumerate(zip(result["user_ids"], result["versions"]))),
+        batch_size=batch_size, update_conflicts=True, unique_fields=["user", "weeks"],
+        update_fields=["version", "start", "chart"],
+    )
+    return len(result["user_ids"])
+
+
+def projection_for(user, weeks=DEFAULT_WEEKS, today=None):
+    """
+    The user's chart: the stored one while it is from today and the user's
+    data version hasn't moved (any Meal or Goal write bumps it), else
+    projected now and stored.
+    """
+    today = today or dt.date.today()
+    stored = WeightProjection.objects.filter(user=user, weeks=weeks).values("version", "start", "chart").first()
+    if stored and stored["start"] == today and stored["version"] == data_version(user.pk):
+        return stored["chart"]
+    result = project_users([user.pk], weeks=weeks, today=today)
+    if not result["user_ids"]:
+        return None
+    store_projections(result, weeks)
+    return chart_points(result, 0)
@@ -0,0 +1,177 @@
+# tracker/services/recents.py
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from tracker.models import Meal, RecentFood
+
+RECENT_COLUMNS = ("name", "default_grams", "cal_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g")
+ORDERINGS = {
+    "recent":   ("-last_used", "-last_meal_id"),
+    "frequent": ("-use_count", "-last_used"),
+}
+_DATE_FIELD = Meal._meta.get_field("date")
+_MEAL_COLUMNS = ("id", "name", "date", "grams", "calories", "protein", "carbs", "fat",
+                 "cal_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g")
+# refreshing more foods than this at once re-reads all of the user's meals
+# instead of OR-ing one name lookup per food
+MAX_NAME_LOOKUPS = 50
+
+
+def normalize_name(name):
+    """'Banana ' and 'banana' are the same recent food."""
+    return (name or "").strip().lower()
+
+
+def _per_100g(m):
+    """Per-100g values of a meal row, derived from totals and grams when they weren't stored."""
+    cal100, pro100 = m["cal_per_100g"], m["protein_per_100g"]
+    carb100, fat100 = m["carbs_per_100g"], m["fat_per_100g"]
+    if (cal100 is None or pro100 is None or carb100 is None or fat100 is None) and m["grams"]:
+        s = 100.0 / m["grams"]
+        cal100  = cal100  if cal100  is not None else round(m["calories"] * s, 1)
+        pro100  = pro100  if pro100  is not None else round(m["protein"]  * s, 1)
+        carb100 = carb100 if carb100 is not None else round(m["carbs"]    * s, 1)
+        fat100  = fat100  if fat100  is not None else round(m["fat"]      * s, 1)
+    return cal100 or 0, pro100 or 0, carb100 or 0, fat100 or 0
+
+
+def _recent_rows(user_id, meals):
+    """Fold meal rows (any order) into one RecentFood per normalized name."""
+    latest, counts = {}, defaultdict(int)
+    for m in meals:
+        key = normalize_name(m["name"])
+        if not key:
+            continue
+        counts[key] += 1
+        cur = latest.get(key)
+        if cur is None or (m["date"], m["id"]) > (cur["date"], cur["id"]):
+            latest[key] = m
+    objs = []
+    for key, m in latest.items():
+        cal100, pro100, carb100, fat100 = _per_100g(m)
+        objs.append(RecentFood(
+            user_id=user_id, key=key[:200], name=m["name"][:200],
+            last_used=m["date"], last_meal_id=m["id"], use_count=counts[key],
+            default_grams=m["grams"] or 100, cal_per_100g=cal100, protein_per_100g=pro100,
+            carbs_per_100g=carb100, fat_per_100g=fat100,
+        ))
+    return objs
+
+
+def _fields(obj):
+    return {f.attname: getattr(obj, f.attname) for f in RecentFood._meta.concrete_fields if not f.primary_key}
+
+
+def _upsert(objs):
+    if objs:
+        RecentFood.objects.bulk_create(
+            objs, batch_size=2000, update_conflicts=True, unique_fields=["user", "key"],
+            update_fields=["name", "last_used", "last_meal_id", "use_count", "default_grams",
+                           "cal_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g"],
+        )
+
+
+def refresh_recent_foods(pairs):
+    """
+    Recompute the RecentFood rows for the given (user_id, meal name) pairs
+    from Meal, like refresh_daily_totals does for days: one read of the
+    matching meals and one upsert per user. Foods left without meals are
+    removed.
+
+    SQL can't reproduce normalize_name everywhere (SQLite's LOWER folds only
+    ASCII, TRIM strips only spaces), so the SQL filter only ever narrows to
+    a superset and the key is decided in Python: icontains on an ASCII key
+    matches every case and whitespace variant of it; a key with other
+    characters reads all of the user's meals.
+    """
+    by_user = defaultdict(set)
+    for user_id, name in pairs:
+        key = normalize_name(name)
+        if user_id is not None and key:
+            by_user[user_id].add(key)
+
+    for user_id, keys in by_user.items():
+        meals = Meal.objects.filter(user_id=user_id)
+        if len(keys) <= MAX_NAME_LOOKUPS and all(k.isascii() for k in keys):
+            meals = meals.filter(reduce(or_, (Q(name__icontains=k) for k in keys)))
+        objs = [o for o in _recent_rows(user_id, meals.values(*_MEAL_COLUMNS).iterator(chunk_size=2000))
+                if o.key in keys]
+        _upsert(objs)
+        gone = keys - {o.key for o in objs}
+        if gone:
+            RecentFood.objects.filter(user_id=user_id, key__in=gone).delete()
+
+
+def add_recent_foods(meals):
+    """
+    Fold newly inserted meals into RecentFood without reading Meal: per
+    user, an insert of any missing rows, one locked read of the affected
+    rows and one upsert. Meals without a pk (backends that can't return ids
+    from bulk_create) fall back to refresh_recent_foods.
+    """
+    by_user = defaultdict(list)
+    for m in meals:
+        if m.user_id is not None and normalize_name(m.name):
+            row = {f: getattr(m, f) for f in _MEAL_COLUMNS}
+            row["date"] = _DATE_FIELD.to_python(row["date"])     # Meal(date="2025-01-01") is allowed
+            by_user[m.user_id].append(row)
+
+    for user_id, rows in by_user.items():
+        if any(r["id"] is None for r in rows):
+            refresh_recent_foods({(user_id, r["name"]) for r in rows})
+            continue
+        new = {o.key: o for o in _recent_rows(user_id, rows)}
+        # SELECT ... FOR UPDATE can't lock a row that doesn't exist yet: two
+        # first uses of a food would both see none and one count would be
+        # lost. Insert missing rows (count 0) first, so every row is locked.
+        RecentFood.objects.bulk_create(
+            [RecentFood(**{**_fields(o), "use_count": 0}) for o in new.values()], ignore_conflicts=True,
+        )
+        current = RecentFood.objects.select_for_update().filter(user_id=user_id, key__in=list(new))
+        for old in current:
+            o = new[old.key]
+            if (old.last_used, old.last_meal_id) > (o.last_used, o.last_meal_id):
+                old.use_count += o.use_count
+                new[old.key] = old
+            else:
+                o.use_count += old.use_count
+        _upsert(list(new.values()))
+
+
+def rebuild_recent_foods(user_ids=None, batch_size=500):
+    """
+    Rebuild RecentFood from scratch, `batch_size` users per transaction.
+    Yields the number of rows written per batch (for progress output).
+    """
+    users = Meal.objects.exclude(user=None)
+    if user_ids:
+        users = users.filter(user_id__in=user_ids)
+    all_ids = sorted(set(users.values_list("user_id", flat=True).order_by()))
+
+    for i in range(0, len(all_ids), batch_size):
+        batch = all_ids[i:i + batch_size]
+        by_user = defaultdict(list)
+        for m in Meal.objects.filter(user_id__in=batch).values("user_id", *_MEAL_COLUMNS).iterator(chunk_size=2000):
+            by_user[m["user_id"]].append(m)
+        objs = [o for uid, meals in by_user.items() for o in _recent_rows(uid, meals)]
+        with transaction.atomic():
+            RecentFood.objects.filter(user_id__in=batch).delete()
+            RecentFood.objects.bulk_create(objs, batch_size=2000)
+        yield len(objs)
+
+    if not user_ids:
+        RecentFood.objects.filter(~Exists(Meal.objects.filter(user_id=OuterRef("user_id")))).delete()
+
+
+def recent_foods(user, limit=8, order="recent"):
+    """
+    The user's foods for quick re-adding, most recently ("recent") or most
+    often ("frequent") logged first: one indexed LIMIT query.
+    """
+    return list(
+        RecentFood.objects.filter(user=user).order_by(*ORDERINGS[order]).values(*RECENT_COLUMNS)[:limit]
+    )
@@ -0,0 +1,101 @@
+# tracker/services/rollups.py
+import datetime as dt
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+
+from tracker.models import DailyTotals, Meal
+from .dashboard_cache import bump_version
+
+ROLLUP_SUMS = {
+    "kcal": Sum("calories"),
+    "protein": Sum("protein"),
+    "carbs": Sum("carbs"),
+    "fat": Sum("fat"),
+    "meal_count": Count("id"),
+}
+ROLLUP_FIELDS = list(ROLLUP_SUMS)
+
+
+def _as_date(d):
+    return dt.date.fromisoformat(d) if isinstance(d, str) else d
+
+
+def _row(user_id, r):
+    return DailyTotals(
+        user_id=user_id,
+        date=r["date"],
+        kcal=r["kcal"] or 0,
+        protein=r["protein"] or 0,
+        carbs=r["carbs"] or 0,
+        fat=r["fat"] or 0,
+        meal_count=r["meal_count"],
+    )
+
+
+def refresh_daily_totals(keys):
+    """
+    Recompute the DailyTotals rows for the given (user_id, date) pairs from
+    Meal. Cost is one aggregate + one upsert per user touched, proportional
+    to the meals on those days only. Days left without meals are removed.
+    """
+    by_user = defaultdict(set)
+    for user_id, day in keys:
+        if user_id is not None and day is not None:
+            by_user[user_id].add(_as_date(day))
+
+    for user_id, days in by_user.items():
+        rows = (
+            Meal.objects.filter(user_id=user_id, date__in=days)
+            .values("date").annotate(**ROLLUP_SUMS).order_by()
+        )
+        objs = [_row(user_id, r) for r in rows]
+        if objs:
+            DailyTotals.objects.bulk_create(
+                objs, update_conflicts=True,
+                unique_fields=["user", "date"], update_fields=ROLLUP_FIELDS,
+            )
+        empty = days - {o.date for o in objs}
+        if empty:
+            DailyTotals.objects.filter(user_id=user_id, date__in=empty).delete()
+    bump_version(by_user)
+
+
+def rebuild_daily_totals(user_ids=None, batch_size=500):
+    """
+    Rebuild DailyTotals from scratch, `batch_size` users per transaction.
+    Yields the number of rollup rows written per batch (for progress output).
+    """
+    users = Meal.objects.exclude(user=None)
+    if user_ids:
+        users = users.filter(user_id__in=user_ids)
+    all_ids = sorted(set(users.values_list("user_id", flat=True).order_by()))
+
+    for i in range(0, len(all_ids), batch_size):
+        batch = all_ids[i:i + batch_size]
+        rows = (
+            Meal.objects.filter(user_id__in=batch)
+            .values("user_id", "date").annotate(**ROLLUP_SUMS).order_by()
+        )
+        with transaction.atomic():
+            DailyTotals.objects.filter(user_id__in=batch).delete()
+            objs = DailyTotals.objects.bulk_create(
+                (_row(r["user_id"], r) for r in rows.iterator(chunk_size=2000)),
+                batch_size=2000,
+            )
+            bump_version(batch)
+        yield len(objs)
+
+    if not user_ids:
+        # users whose meals are all gone (a correlated NOT EXISTS, not a NOT IN of every id)
+        DailyTotals.objects.filter(~Exists(Meal.objects.filter(user_id=OuterRef("user_id")))).delete()
+
+
+def day_totals(user, day):
+    """Totals for one day in the coach's {kcal, p, c, f} shape."""
+    r = (
+        DailyTotals.objects.filter(user=user, date=day)
+        .values("kcal", "protein", "carbs", "fat").first()
+    ) or {"kcal": 0, "protein": 0, "carbs": 0, "fat": 0}
+    return {"kcal": r["kcal"], "p": r["protein"], "c": r["carbs"], "f": r["fat"]}
@@ -0,0 +1,191 @@
+# tracker/services/search_cache.py
+import hashlib
+import threading
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .circuit_breaker import CircuitBreaker
+from .food_api import asearch_openfoodfacts, search_openfoodfacts
+from .singleflight import AsyncSingleFlight, SingleFlight
+
+CACHE_ALIAS = getattr(settings, "FOOD_SEARCH_CACHE_ALIAS", "food_search")
+KEY_PREFIX = "offsearch:v2"   # v2: entries carry a fresh_until timestamp
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "stale": 0, "misses": 0, "refresh_errors": 0}
+_refreshing = set()     # keys with a background refresh running
+
+# identical misses in flight at the same time share one upstream call
+_flight = SingleFlight()
+_aflight = AsyncSingleFlight()
+
+# fail fast (and serve stale/local results) while OpenFoodFacts is down
+breaker = CircuitBreaker(
+    threshold=getattr(settings, "FOOD_API_BREAKER_THRESHOLD", 5),
+    reset_after=getattr(settings, "FOOD_API_BREAKER_RESET", 30.0),
+)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def normalize_query(q: str) -> str:
+    """Lowercase + collapse whitespace so 'Banana ' and 'banana' share an entry."""
+    return " ".join((q or "").lower().split())
+
+
+def cache_key(q: str, limit: int) -> str:
+    # hash the query so any backend (memcached included) accepts the key
+    digest = hashlib.sha1(normalize_query(q).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{int(limit)}:{digest}"
+
+
+def _bump(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _ttls(timeout):
+    fresh = timeout if timeout is not None else getattr(settings, "FOOD_SEARCH_CACHE_TTL", 86400)
+    stale = getattr(settings, "FOOD_SEARCH_STALE_TTL", 7 * 86400)
+    return fresh, stale
+
+
+def _entry(results, fresh):
+    return {"results": results, "fresh_until": time.time() + fresh}
+
+
+def _claim_refresh(key) -> bool:
+    with _stats_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+        return True
+
+
+def _release_refresh(key, ok):
+    with _stats_lock:
+        _refreshing.discard(key)
+        if not ok:
+            _stats["refresh_errors"] += 1
+
+
+def _refresh_in_background(key, load):
+    if not _claim_refresh(key):
+        return
+
+    def run():
+        ok = False
+        try:
+            _flight.do(key, load)
+            ok = True
+        except Exception:
+            pass    # keep serving the stale entry; the breaker saw the failure
+        finally:
+            _release_refresh(key, ok)
+            connections.close_all()   # only this thread's connections
+
+    threading.Thread(target=run, name="food-search-refresh", daemon=True).start()
+
+
+def cached_search(q: str, limit: int = 10, fetch=search_openfoodfacts, timeout=None, on_fetch=None):
+    """
+    Serve a food search from the shared cache, calling `fetch` only on a miss.
+
+    - fresh entry: returned as-is
+    - stale entry (past `timeout` but within FOOD_SEARCH_STALE_TTL): returned
+      immediately while one background thread refreshes it
+    - miss: concurrent misses for the same key share one `fetch`, guarded by
+      the circuit breaker (CircuitOpenError while the upstream is failing)
+
+    Upstream errors are not cached (they propagate to every waiter).
+    `on_fetch(results)` runs after each successful upstream fetch.
+    """
+    key = cache_key(q, limit)
+    cache = _cache()
+    fresh, stale = _ttls(timeout)
+
+    def load():
+        results = breaker.call(fetch, normalize_query(q), limit)
+        cache.set(key, _entry(results, fresh), fresh + stale)
+        if on_fetch:
+            on_fetch(results)
+        return results
+
+    entry = cache.get(key)
+    if entry is not None:
+        if time.time() < entry["fresh_until"]:
+            _bump("hits")
+        else:
+            _bump("stale")
+            _refresh_in_background(key, load)
+        return entry["results"]
+
+    _bump("misses")
+    return _flight.do(key, load)
+
+
+async def acached_search(q: str, limit: int = 10, fetch=asearch_openfoodfacts, timeout=None,
+                         on_fetch=None):
+    """Async twin of cached_search (same cache, same keys) for ASGI views."""
+    key = cache_key(q, limit)
+    cache = _cache()
+    fresh, stale = _ttls(timeout)
+
+    async def load():
+        results = await breaker.acall(fetch, normalize_query(q), limit)
+        await cache.aset(key, _entry(results, fresh), fresh + stale)
+        if on_fetch:
+            await sync_to_async(on_fetch)(results)
+        return results
+
+    entry = await cache.aget(key)
+    if entry is not None:
+        if time.time() < entry["fresh_until"]:
+            _bump("hits")
+        else:
+            _bump("stale")
+            # a thread, not an asyncio task: under WSGI the view runs in a
+            # per-request event loop (async_to_sync) that cancels pending
+            # tasks as soon as the view returns
+            _refresh_in_background(key, async_to_sync(load))
+        return entry["results"]
+
+    _bump("misses")
+    return await _aflight.do(key, load)
+
+
+def invalidate(q: str, limit: int = 10):
+    _cache().delete(cache_key(q, limit))
+
+
+def cache_stats():
+    """Hit/miss counters for this process (for monitoring)."""
+    with _stats_lock:
+        counts = dict(_stats)
+        refreshing = len(_refreshing)
+    served = counts["hits"] + counts["stale"]
+    total = served + counts["misses"]
+    return {
+        "backend": settings.CACHES[CACHE_ALIAS]["BACKEND"],
+        **counts,
+        "hit_rate": round(served / total, 4) if total else 0.0,
+        "refreshing": refreshing,
+        "breaker": breaker.stats(),
+        "upstream": _flight.stats(),   # calls / executed / deduplicated
+        "in_flight": _flight.in_flight(),
+        "upstream_async": _aflight.stats(),
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+    _flight.reset_stats()
+    _aflight.reset_stats()
@@ -0,0 +1,104 @@
+# tracker/services/singleflight.py
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key within a process: the first
+    caller runs `fn`, everyone who arrives while it is in flight waits for and
+    shares its result (or its exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"calls": 0, "executed": 0, "deduplicated": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["deduplicated"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["executed"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for k in self._stats:
+                self._stats[k] = 0
+
+
+class AsyncSingleFlight:
+    """
+    asyncio flavour of SingleFlight for ASGI views: concurrent awaits of the
+    same key on one event loop share a single task.
+    """
+
+    def __init__(self):
+        self._tasks = weakref.WeakKeyDictionary()   # loop -> {key: task}
+        self._stats = {"calls": 0, "executed": 0, "deduplicated": 0}
+
+    async def do(self, key, coro_fn):
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        self._stats["calls"] += 1
+        task = tasks.get(key)
+        if task is None:
+            self._stats["executed"] += 1
+            task = tasks[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda t: tasks.pop(key) if tasks.get(key) is t else None)
+        else:
+            self._stats["deduplicated"] += 1
+        # shield: one cancelled waiter must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def in_flight(self):
+        return sum(len(t) for t in self._tasks.values())
+
+    def stats(self):
+        return dict(self._stats)
+
+    def reset_stats(self):
+        for k in self._stats:
+            self._stats[k] = 0
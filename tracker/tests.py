@@ -1,3 +1,1414 @@
-from django.test import TestCase
+import asyncio
+import datetime as dt
+import json
+import shutil
+import tempfile
+import threading
+import time
+from importlib.util import find_spec
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import DailyTotals, ExportJob, FavoriteFood, FoodItem, FoodToken, Goal, Meal, RecentFood, WeightProjection
+from tracker.templates.tracker.services import search_cache
+from tracker.templates.tracker.services import dashboard_cache
+from tracker.templates.tracker.services.dashboard import build_dashboard
+from tracker.templates.tracker.services.export_jobs import claim_next_job, run_job
+from tracker.templates.tracker.services.exports import ExportUnavailable
+from tracker.templates.tracker.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from tracker.templates.tracker.services.food_api import FoodApiClient, asearch_openfoodfacts, set_client
+from tracker.templates.tracker.services.food_catalog import search_local
+from tracker.templates.tracker.services.ai_assistant import FOODS, suggest_meals, suggest_meals_reference
+from tracker.templates.tracker.services.food_library import FoodLibrary, get_library, set_library
+from tracker.templates.tracker.services.meal_solver import solve_plan
+from tracker.management.commands.bench_suggest import synthetic_foods
+from tracker.templates.tracker.services.meal_import import import_meals
+from tracker.templates.tracker.services import meal_batch, nutrition, projection, recents
+from tracker.management.commands._off_stub import StubOFFServer
+from tracker.templates.tracker.services.product_cache import remember_products
+from tracker.templates.tracker.services.singleflight import SingleFlight
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# rendering pages in tests shouldn't require `collectstatic` for the manifest
+PLAIN_STATIC = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+class FoodCatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("import_food_catalog", str(FIXTURES / "off_sample.jsonl"), stdout=StringIO())
+        call_command("import_food_catalog", str(FIXTURES / "off_sample.csv"), stdout=StringIO())
+
+    def test_import_skips_products_without_code_or_macros(self):
+        self.assertEqual(FoodItem.objects.count(), 6)
+        self.assertFalse(FoodItem.objects.filter(code="0000000000055").exists())
+
+    def test_prefix_search_ranks_by_popularity(self):
+        names = [r["name"] for r in search_local("ban")]
+        self.assertEqual(names, ["Banana", "Banana Bread", "Banana Chips"])
+
+    def test_all_words_must_match(self):
+        names = [r["name"] for r in search_local("banana br")]
+        self.assertEqual(names, ["Banana Bread"])
+
+    def test_accents_and_brand_are_indexed(self):
+        self.assertEqual(search_local("creme")[0]["name"], "Crème fraîche")
+        self.assertEqual(search_local("skippy")[0]["name"], "Peanut Butter")
+
+    def test_popularity_walk_matches_sorted_plan(self):
+        from tracker.templates.tracker.services import food_catalog
+        queries = ["ban", "banana br", "creme", "pea but", "zz"]
+        sorted_plan = {q: search_local(q) for q in queries}
+        with mock.patch.object(food_catalog, "SELECTIVE_MATCHES", 1):   # every word counts as common
+            self.assertEqual({q: search_local(q) for q in queries}, sorted_plan)
+
+    def test_result_shape_matches_remote_search(self):
+        r = search_local("chicken")[0]
+        self.assertEqual(r["id"], "0000000000031")
+        self.assertEqual(r["calories"], round(690 / 4.184, 1))  # kJ converted
+        self.assertEqual(set(r), {"id", "name", "brand", "per", "calories", "protein",
+                                  "carbs", "fat", "serving_size"})
+
+    def test_reimport_replaces_instead_of_duplicating(self):
+        call_command("import_food_catalog", str(FIXTURES / "off_sample.csv"), stdout=StringIO())
+        self.assertEqual(FoodItem.objects.filter(code="0000000000062").count(), 1)
+        self.assertEqual(len(search_local("peanut")), 1)
+
+    def test_short_or_empty_query(self):
+        self.assertEqual(search_local("b"), [])
+        self.assertEqual(search_local("   "), [])
+
+    @override_settings(FOOD_SEARCH_MODE="local")
+    async def test_async_endpoint_serves_local_catalog(self):
+        user = await User.objects.acreate(username="async")
+        await self.async_client.aforce_login(user)
+        resp = await self.async_client.get(reverse("food_search_async"), {"q": "peanut"})
+        self.assertEqual([r["name"] for r in resp.json()["results"]], ["Peanut Butter"])
+
+
+class FoodApiClientTests(TestCase):
+    def setUp(self):
+        products = [json.loads(l) for l in (FIXTURES / "off_sample.jsonl").read_text().splitlines()
+                    if l.startswith("{")]
+        self.stub = StubOFFServer(products).start()
+        self.addCleanup(self.stub.stop)
+        self.client_ = FoodApiClient(base_url=self.stub.url, retries=0)
+        self.addCleanup(self.client_.close)
+
+    def test_search_against_stub(self):
+        names = [r["name"] for r in self.client_.search("banana", limit=5)]
+        self.assertEqual(names, ["Banana", "Banana Bread"])
+
+    def test_connection_is_reused(self):
+        self.client_.search("banana")
+        self.client_.search("chicken")
+        self.assertEqual(self.stub.requests, 2)
+        self.assertEqual(len(self.stub.peers), 1)
+
+    def test_upstream_error_raises(self):
+        self.stub.fail_status = 503
+        with self.assertRaises(requests.HTTPError):
+            self.client_.search("banana")
+
+    def test_read_timeout_is_not_retried(self):
+        self.stub.latency = 0.5
+        slow = FoodApiClient(base_url=self.stub.url, retries=2, backoff=0, read_timeout=0.1)
+        self.addCleanup(slow.close)
+        with self.assertRaises(requests.ReadTimeout):
+            slow.search("banana")
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_gateway_error_is_retried(self):
+        self.stub.fail_status = 503
+        flaky = FoodApiClient(base_url=self.stub.url, retries=2, backoff=0)
+        self.addCleanup(flaky.close)
+        with self.assertRaises(requests.HTTPError):
+            flaky.search("banana")
+        self.assertEqual(self.stub.requests, 3)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_identical_calls_share_one_execution(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return ["banana"]
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+                     for _ in range(4)]
+        for t in followers:
+            t.start()
+        while flight.stats()["calls"] < 5:
+            time.sleep(0.001)
+        release.set()
+        for t in [leader, *followers]:
+            t.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [["banana"]] * 5)
+        self.assertEqual(flight.stats(), {"calls": 5, "executed": 1, "deduplicated": 4})
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_error_is_not_remembered(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        self.assertEqual(flight.do("k", lambda: 42), 42)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_trips_then_half_opens_after_reset(self):
+        now = [0.0]
+        cb = CircuitBreaker(threshold=2, reset_after=10, clock=lambda: now[0])
+
+        def boom():
+            raise requests.Timeout()
+
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                cb.call(boom)
+        self.assertEqual(cb.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            cb.call(lambda: "never called")
+
+        now[0] = 10.0
+        self.assertEqual(cb.state, "half_open")
+        self.assertEqual(cb.call(lambda: "ok"), "ok")
+        self.assertEqual(cb.stats()["state"], "closed")
+        self.assertEqual(cb.stats()["trips"], 1)
+
+    def test_cancelled_half_open_trial_frees_the_slot(self):
+        now = [0.0]
+        cb = CircuitBreaker(threshold=1, reset_after=10, clock=lambda: now[0])
+        cb.record_failure()
+        now[0] = 10.0
+
+        async def trial():
+            task = asyncio.ensure_future(cb.acall(asyncio.sleep, 60))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return await cb.acall(asyncio.sleep, 0, "ok")
+
+        self.assertEqual(asyncio.run(trial()), "ok")
+        self.assertEqual(cb.state, "closed")
+
+
+class SearchCacheTests(SimpleTestCase):
+    def setUp(self):
+        search_cache._cache().clear()
+        search_cache.reset_stats()
+        search_cache.breaker.reset()
+        self.addCleanup(search_cache.breaker.reset)
+
+    def _wait_for_refresh(self):
+        deadline = time.monotonic() + 5
+        while search_cache.cache_stats()["refreshing"] and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def test_queries_differing_in_case_and_spacing_share_an_entry(self):
+        self.assertEqual(search_cache.normalize_query("  Banana   Bread "), "banana bread")
+        self.assertEqual(search_cache.cache_key("Banana ", 10), search_cache.cache_key("banana", 10))
+        self.assertNotEqual(search_cache.cache_key("banana", 10), search_cache.cache_key("banana", 20))
+
+        upstream = []
+        fetch = lambda q, limit: upstream.append(q) or [q]
+        self.assertEqual(search_cache.cached_search("Banana ", fetch=fetch), ["banana"])
+        self.assertEqual(search_cache.cached_search("banana", fetch=fetch), ["banana"])
+        self.assertEqual(upstream, ["banana"])
+
+    def test_hit_and_miss_counters(self):
+        fetch = lambda q, limit: [q]
+        for q in ["banana", "banana", "BANANA", "apple"]:
+            search_cache.cached_search(q, fetch=fetch)
+        stats = search_cache.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (2, 2, 0.5))
+
+        search_cache.reset_stats()
+        self.assertEqual(search_cache.cache_stats()["hits"], 0)
+
+    def test_cache_is_bounded_and_evicts_least_recently_used(self):
+        self.assertTrue(settings.CACHES[search_cache.CACHE_ALIAS]["OPTIONS"]["MAX_ENTRIES"])
+
+        small = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "food-search-small",
+                 "OPTIONS": {"MAX_ENTRIES": 2, "CULL_FREQUENCY": 2}}
+        with override_settings(CACHES={**settings.CACHES, search_cache.CACHE_ALIAS: small}):
+            upstream = []
+            fetch = lambda q, limit: upstream.append(q) or [q]
+            for q in ["apple", "banana", "apple", "cherry", "apple", "banana"]:
+                search_cache.cached_search(q, fetch=fetch)
+            search_cache._cache().clear()
+        # "banana" was the least recently used entry when "cherry" came in
+        self.assertEqual(upstream, ["apple", "banana", "cherry", "banana"])
+
+    def test_stale_entry_is_served_then_refreshed_in_background(self):
+        versions = iter(["v1", "v2", "v3"])
+        fetch = lambda q, limit: [next(versions)]
+
+        self.assertEqual(search_cache.cached_search("banana", fetch=fetch, timeout=0), ["v1"])
+        # expired: old value comes back immediately, refresh happens off-thread
+        self.assertEqual(search_cache.cached_search("banana", fetch=fetch, timeout=0), ["v1"])
+        self._wait_for_refresh()
+        self.assertEqual(search_cache.cached_search("banana", fetch=fetch, timeout=0), ["v2"])
+        stats = search_cache.cache_stats()
+        self.assertEqual((stats["misses"], stats["stale"]), (1, 2))
+
+    def test_open_breaker_keeps_serving_stale_and_fails_fast_on_miss(self):
+        search_cache.cached_search("banana", fetch=lambda q, l: ["cached"], timeout=0)
+        for _ in range(search_cache.breaker.threshold):
+            search_cache.breaker.record_failure()
+
+        upstream = []
+        fetch = lambda q, l: upstream.append(q) or ["fresh"]
+        self.assertEqual(search_cache.cached_search("banana", fetch=fetch, timeout=0), ["cached"])
+        self._wait_for_refresh()
+        with self.assertRaises(CircuitOpenError):
+            search_cache.cached_search("apple", fetch=fetch)
+        self.assertEqual(upstream, [])
+
+    def test_async_stale_refresh_outlives_a_wsgi_request(self):
+        versions = iter(["v1", "v2", "v3"])
+
+        async def fetch(q, limit):
+            await asyncio.sleep(0.05)   # still running when the view returns
+            return [next(versions)]
+
+        # WSGI runs an async view in its own event loop, closed on return
+        search = async_to_sync(search_cache.acached_search)
+        self.assertEqual(search("banana", fetch=fetch, timeout=0), ["v1"])
+        self.assertEqual(search("banana", fetch=fetch, timeout=0), ["v1"])
+        self._wait_for_refresh()
+        self.assertEqual(search("banana", fetch=fetch, timeout=0), ["v2"])
+        self._wait_for_refresh()
+        self.assertEqual(search_cache.cache_stats()["refresh_errors"], 0)
+
+    def test_async_search_runs_on_the_executor(self):
+        class Client:
+            def search(self, q, limit):
+                threads.append(threading.current_thread())
+                return [q]
+
+        async def run():
+            result = await asearch_openfoodfacts("banana", 5, client=Client(), executor=executor)
+            return result, threading.current_thread()
+
+        threads = []
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="food-api-test")
+        self.addCleanup(executor.shutdown)
+        result, loop_thread = asyncio.run(run())
+        self.assertEqual(result, ["banana"])
+        self.assertIsNot(threads[0], loop_thread)
+        self.assertTrue(threads[0].name.startswith("food-api-test"))
+
+
+class AsyncFoodSearchTests(TestCase):
+    def setUp(self):
+        caches[search_cache.CACHE_ALIAS].clear()
+        search_cache.breaker.reset()
+        products = [json.loads(l) for l in (FIXTURES / "off_sample.jsonl").read_text().splitlines()
+                    if l.startswith("{")]
+        self.stub = StubOFFServer(products).start()
+        self.addCleanup(self.stub.stop)
+        set_client(FoodApiClient(base_url=self.stub.url, retries=0))
+        self.addCleanup(set_client, None)
+
+    @override_settings(FOOD_SEARCH_MODE="remote")
+    async def test_remote_results_are_cached(self):
+        user = await User.objects.acreate(username="async-remote")
+        await self.async_client.aforce_login(user)
+        for _ in range(2):
+            resp = await self.async_client.get(reverse("food_search_async"), {"q": "banana"})
+            self.assertEqual([r["name"] for r in resp.json()["results"]], ["Banana", "Banana Bread"])
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual(search_cache.cache_stats()["hits"], 1)
+
+    @override_settings(FOOD_SEARCH_MODE="remote")
+    async def test_concurrent_searches_overlap_under_asgi(self):
+        # a sync-only middleware would run each request in turn on one thread
+        user = await User.objects.acreate(username="async-concurrent")
+        await self.async_client.aforce_login(user)
+        self.stub.latency = 0.2
+        queries = ["banana", "bread", "chicken", "peanut", "rice"]
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(*(
+            self.async_client.get(reverse("food_search_async"), {"q": q}) for q in queries
+        ))
+        self.assertEqual({r.status_code for r in responses}, {200})
+        self.assertEqual(self.stub.requests, len(queries))
+        self.assertLess(time.perf_counter() - t0, 0.2 * len(queries) / 2)
+
+
+class FoodSearchStatsTests(TestCase):
+    def test_counters_are_staff_only(self):
+        url = reverse("food_search_stats")
+        self.client.force_login(User.objects.create(username="user"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(User.objects.create(username="staff", is_staff=True))
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertLessEqual({"hits", "misses", "hit_rate"}, set(resp.json()))
+
+
+class FoodLookupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="lookup")
+        self.client.force_login(self.user)
+        caches[search_cache.CACHE_ALIAS].clear()
+        search_cache.breaker.reset()
+
+        self.stub = StubOFFServer([
+            {"code": "3017620422003", "product_name": "Nutella", "brands": "Ferrero",
+             "nutriments": {"energy-kcal_100g": 539, "proteins_100g": 6.3,
+                            "carbohydrates_100g": 57.5, "fat_100g": 30.9}},
+        ]).start()
+        self.addCleanup(self.stub.stop)
+        set_client(FoodApiClient(base_url=self.stub.url, retries=0))
+        self.addCleanup(set_client, None)
+
+    def lookup(self, code):
+        return self.client.get(reverse("food_lookup", args=[code]))
+
+    def test_upstream_once_then_local(self):
+        first = self.lookup("3017620422003")
+        self.assertEqual(first.json()["source"], "upstream")
+        self.assertEqual(first.json()["result"]["calories"], 539)
+
+        second = self.lookup("3017620422003")
+        self.assertEqual(second.json(), {**first.json(), "source": "cache"})
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_known_from_past_meal_never_hits_network(self):
+        Meal.objects.create(user=self.user, name="Oat Drink (250 g)", date="2025-01-01", grams=250,
+                            cal_per_100g=46, protein_per_100g=1, carbs_per_100g=6.6,
+                            fat_per_100g=1.5, source="OFF", source_id="7394376616037")
+        r = self.lookup("7394376616037").json()
+        self.assertEqual((r["source"], r["result"]["name"]), ("history", "Oat Drink"))
+        self.assertEqual(self.stub.requests, 0)
+
+    def test_history_is_not_shared_with_other_users(self):
+        Meal.objects.create(user=self.user, name="My Protein Bar", date="2025-01-01", grams=60,
+                            cal_per_100g=900, protein_per_100g=90, carbs_per_100g=1,
+                            fat_per_100g=1, source="OFF", source_id="4006381333931")
+        self.assertEqual(self.lookup("4006381333931").json()["source"], "history")
+        self.assertFalse(FoodItem.objects.filter(code="4006381333931").exists())
+
+        self.client.force_login(User.objects.create(username="other"))
+        self.assertEqual(self.lookup("4006381333931").status_code, 404)
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_unknown_code_is_negatively_cached(self):
+        self.assertEqual(self.lookup("123456789").status_code, 404)
+        self.assertEqual(self.lookup("123456789").status_code, 404)
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_invalid_code(self):
+        self.assertEqual(self.lookup("plan").status_code, 400)
+
+    def test_search_results_populate_product_cache_without_indexing(self):
+        remember_products([{"id": "5000112637922", "name": "Cola", "calories": 42}])
+        self.assertEqual(self.lookup("5000112637922").json()["source"], "cache")
+        self.assertEqual(search_local("cola"), [])
+
+    def test_search_results_do_not_overwrite_catalog_rows(self):
+        call_command("import_food_catalog", str(FIXTURES / "off_sample.jsonl"), stdout=StringIO())
+        self.assertEqual(remember_products([
+            {"id": "0000000000017", "name": "Cola", "calories": 42},
+            {"id": "5000112637922", "name": "Cola", "calories": 42},
+        ]), 1)
+        self.assertEqual(FoodItem.objects.get(code="0000000000017").name, "Banana")
+        self.assertEqual(search_local("cola"), [])
+        self.assertEqual(search_local("banana")[0]["id"], "0000000000017")
+
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dash")
+        self.client.force_login(self.user)
+        self.today = dt.date.today()
+
+    def add_meals(self, n, day):
+        Meal.objects.bulk_create([
+            Meal(user=self.user, name=f"Food {i}", date=day, calories=100, protein=10, carbs=5, fat=2)
+            for i in range(n)
+        ])
+
+    def test_query_count_does_not_grow_with_meals(self):
+        FavoriteFood.objects.create(user=self.user, name="Oats", cal_per_100g=389)
+        Goal.objects.create(user=self.user)
+        self.add_meals(1, self.today)
+        with self.assertNumQueries(5):
+            build_dashboard(self.user, self.today)
+
+        self.add_meals(200, self.today)
+        self.add_meals(200, self.today - dt.timedelta(days=3))
+        self.add_meals(200, self.today - dt.timedelta(days=30))
+        with self.assertNumQueries(5):
+            build_dashboard(self.user, self.today)
+
+    def test_totals_and_week_chart(self):
+        self.add_meals(3, self.today)
+        self.add_meals(2, self.today - dt.timedelta(days=6))
+        old_day = self.today - dt.timedelta(days=30)
+        self.add_meals(4, old_day)
+
+        dash = build_dashboard(self.user, self.today)
+        self.assertEqual(dash["totals"], {"calories": 300, "protein": 30, "carbs": 15, "fat": 6})
+        self.assertEqual(json.loads(dash["weekly_kcal"]), [200, 0, 0, 0, 0, 0, 300])
+        self.assertEqual(len(dash["meals"]), 3)
+
+        # a day outside the chart window still gets its own totals
+        self.assertEqual(build_dashboard(self.user, old_day)["totals"]["calories"], 400)
+
+    def test_page_renders(self):
+        self.add_meals(2, self.today)
+        resp = self.client.get(reverse("meal_list"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Food 1")
+
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        caches["dashboard"].clear()
+        dashboard_cache.reset_stats()
+        self.alice = User.objects.create(username="alice")
+        self.bob = User.objects.create(username="bob")
+        self.today = dt.date.today()
+
+    def test_repeat_loads_hit(self):
+        self.client.force_login(self.alice)
+        self.client.get(reverse("meal_list"))
+        with self.assertNumQueries(4):     # session, user, data version (ETag + cache key); no dashboard queries
+            resp = self.client.get(reverse("meal_list"))
+        self.assertEqual(resp.status_code, 200)
+        yesterday = (self.today - dt.timedelta(days=1)).isoformat()
+        self.client.get(reverse("meal_list"), {"date": yesterday})
+        self.client.get(reverse("meal_list"), {"date": yesterday})
+        stats = dashboard_cache.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_write_invalidates_only_that_user(self):
+        for user in (self.alice, self.bob):
+            dashboard_cache.cached_dashboard(user, self.today)
+        before = {u.pk: dashboard_cache.data_version(u.pk) for u in (self.alice, self.bob)}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Meal.objects.create(user=self.alice, name="Toast", calories=250, date=self.today)
+        self.assertNotEqual(dashboard_cache.data_version(self.alice.pk), before[self.alice.pk])
+        self.assertEqual(dashboard_cache.data_version(self.bob.pk), before[self.bob.pk])
+
+        dashboard_cache.reset_stats()
+        dash = dashboard_cache.cached_dashboard(self.alice, self.today)
+        self.assertEqual(dash["totals"]["calories"], 250)
+        dashboard_cache.cached_dashboard(self.bob, self.today)
+        stats = dashboard_cache.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))   # bob's entry survived
+
+    def test_goal_and_favorite_writes_bump(self):
+        goal = Goal.objects.create(user=self.alice)
+        for write in (
+            lambda: FavoriteFood.objects.create(user=self.alice, name="Oats"),
+            lambda: FavoriteFood.objects.get(user=self.alice).delete(),
+            lambda: goal.save(),
+            lambda: Meal.objects.filter(user=self.alice).update(calories=1),
+        ):
+            Meal.objects.bulk_create([Meal(user=self.alice, name="Egg", calories=70, date=self.today)])
+            version = dashboard_cache.data_version(self.alice.pk)
+            write()
+            self.assertNotEqual(dashboard_cache.data_version(self.alice.pk), version)
+
+    def test_stats_staff_only(self):
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse("dashboard_stats")).status_code, 403)
+
+
+@override_settings(STORAGES=PLAIN_STATIC, FOOD_SEARCH_MODE="local")
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        caches["dashboard"].clear()
+        self.user = User.objects.create(username="etag")
+        self.client.force_login(self.user)
+
+    def test_meal_list_304_until_a_write(self):
+        self.client.get(reverse("meal_list"))        # sets the CSRF cookie the page embeds
+        first = self.client.get(reverse("meal_list"))
+        etag = first["ETag"]
+        self.assertIn("no-cache", first["Cache-Control"])
+        self.assertIn("private", first["Cache-Control"])
+
+        with self.assertNumQueries(3):      # session, user, data version; nothing else runs
+            resp = self.client.get(reverse("meal_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        other_day = self.client.get(reverse("meal_list"), {"date": "2025-01-01"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other_day.status_code, 200)
+
+        Meal.objects.create(user=self.user, name="Soup", calories=120, date=dt.date.today())
+        resp = self.client.get(reverse("meal_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertContains(resp, "Soup")
+
+    def test_food_search_content_etag(self):
+        call_command("import_food_catalog", str(FIXTURES / "off_sample.jsonl"), stdout=StringIO())
+        resp = self.client.get(reverse("food_search"), {"q": "banana"})
+        self.assertEqual(resp.json()["results"][0]["name"], "Banana")
+        self.assertIn("max-age=300", resp["Cache-Control"])
+        again = self.client.get(reverse("food_search"), {"q": "banana"}, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(again.status_code, 304)
+        other = self.client.get(reverse("food_search"), {"q": "rice"}, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(other.status_code, 200)
+
+    def test_ai_suggest_get_revalidates(self):
+        params = {"date": dt.date.today().isoformat(), "message": "vegan"}
+        first = self.client.get(reverse("ai_suggest_api"), params)
+        self.assertEqual(len(first.json()["plans"]), 3)
+        resp = self.client.get(reverse("ai_suggest_api"), params, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(resp.status_code, 304)
+
+        goal = Goal.objects.get(user=self.user)
+        goal.protein = 200
+        goal.save()
+        resp = self.client.get(reverse("ai_suggest_api"), params, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(resp.status_code, 200)
+
+    def test_ai_suggest_get_without_date_plans_for_today(self):
+        undated = self.client.get(reverse("ai_suggest_api"), {"message": "vegan"})
+        self.assertEqual(undated.status_code, 200)
+        today = self.client.get(reverse("ai_suggest_api"), {"message": "vegan", "date": dt.date.today().isoformat()})
+        self.assertEqual(undated.json(), today.json())
+        self.assertEqual(undated["ETag"], today["ETag"])
+        self.assertEqual(self.client.get(reverse("ai_suggest_api"), {"date": "yesterday"}).status_code, 400)
+
+
+class DailyTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="rollup")
+        self.d1, self.d2 = dt.date(2025, 3, 1), dt.date(2025, 3, 2)
+
+    def rollup(self):
+        return {
+            r.date: (r.kcal, r.protein, r.meal_count)
+            for r in DailyTotals.objects.filter(user=self.user)
+        }
+
+    def meal(self, **kw):
+        return Meal.objects.create(**{"user": self.user, "name": "x", "date": self.d1,
+                                      "calories": 100, "protein": 10, **kw})
+
+    def test_save_edit_and_delete(self):
+        a = self.meal()
+        self.meal(calories=50, protein=5)
+        self.assertEqual(self.rollup(), {self.d1: (150, 15, 2)})
+
+        a = Meal.objects.get(pk=a.pk)
+        a.date = self.d2             # moving a meal updates both days
+        a.save()
+        self.assertEqual(self.rollup(), {self.d1: (50, 5, 1), self.d2: (100, 10, 1)})
+
+        a.delete()
+        self.assertEqual(self.rollup(), {self.d1: (50, 5, 1)})
+
+    def test_per_100g_totals_are_rolled_up(self):
+        self.meal(grams=200, cal_per_100g=50, protein_per_100g=2)
+        self.assertEqual(self.rollup(), {self.d1: (100, 4, 1)})
+
+    def test_bulk_create_update_and_queryset_delete(self):
+        Meal.objects.bulk_create([
+            Meal(user=self.user, name=f"m{i}", date=self.d1, calories=10) for i in range(3)
+        ])
+        self.assertEqual(self.rollup(), {self.d1: (30, 0, 3)})
+
+        Meal.objects.filter(user=self.user, name="m0").update(date=self.d2, calories=20)
+        self.assertEqual(self.rollup(), {self.d1: (20, 0, 2), self.d2: (20, 0, 1)})
+
+        Meal.objects.filter(user=self.user, date=self.d1).delete()
+        self.assertEqual(self.rollup(), {self.d2: (20, 0, 1)})
+
+    def test_copy_yesterday_updates_rollup(self):
+        self.client.force_login(self.user)
+        self.meal()
+        self.client.get(reverse("copy_yesterday"), {"to": self.d2.isoformat()})
+        self.assertEqual(self.rollup()[self.d2], (100, 10, 1))
+
+    def test_rebuild_matches_incremental(self):
+        self.meal()
+        self.meal(date=self.d2, calories=70)
+        expected = self.rollup()
+        DailyTotals.objects.all().delete()
+        DailyTotals.objects.create(user=self.user, date=dt.date(2020, 1, 1), kcal=1)   # junk
+        ghost = User.objects.create(username="no-meals")
+        DailyTotals.objects.create(user=ghost, date=self.d1, kcal=1)
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("rebuild_daily_totals", "--batch-size", "1", stdout=StringIO())
+        self.assertEqual(self.rollup(), expected)
+        self.assertFalse(DailyTotals.objects.filter(user=ghost).exists())
+        # users without meals are found with a subquery, not a NOT IN of every user id
+        self.assertFalse([q for q in ctx.captured_queries if "NOT IN" in q["sql"].upper()])
+
+
+class RecentFoodTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="recents")
+        self.d1, self.d2, self.d3 = dt.date(2025, 3, 1), dt.date(2025, 3, 2), dt.date(2025, 3, 3)
+
+    def snapshot(self):
+        return sorted(RecentFood.objects.filter(user=self.user).values_list(
+            "key", "name", "last_used", "last_meal_id", "use_count", "default_grams", "cal_per_100g"))
+
+    def test_recent_and_frequent_order(self):
+        Meal.objects.create(user=self.user, name="Oats", date=self.d1, grams=50, cal_per_100g=389)
+        Meal.objects.create(user=self.user, name="oats ", date=self.d2, grams=80, cal_per_100g=389)
+        Meal.objects.create(user=self.user, name="Apple", date=self.d2, grams=150, calories=78, protein=0.4)
+        Meal.objects.create(user=self.user, name="OATS", date=self.d1, grams=40, cal_per_100g=389)
+        Meal.objects.bulk_create([Meal(user=self.user, name="Tea", date=self.d3, calories=2)])
+
+        with self.assertNumQueries(1):
+            recent = recents.recent_foods(self.user)
+        self.assertEqual([r["name"] for r in recent], ["Tea", "Apple", "oats "])
+        self.assertEqual(recent[1]["cal_per_100g"], 52.0)       # derived from the totals
+        self.assertEqual(recent[1]["default_grams"], 150)
+        self.assertEqual(recent[2]["default_grams"], 80)       # latest portion
+        self.assertEqual(recent[0]["default_grams"], 100)      # no grams logged
+        frequent = recents.recent_foods(self.user, order="frequent")
+        self.assertEqual(frequent[0]["name"], "oats ")
+        self.assertEqual(RecentFood.objects.get(user=self.user, key="oats").use_count, 3)
+
+    def test_writes_match_rebuild(self):
+        a = Meal.objects.create(user=self.user, name="Rice", date=self.d1, grams=200, cal_per_100g=130)
+        Meal.objects.create(user=self.user, name="Rice", date=self.d2, grams=150, cal_per_100g=130)
+        Meal.objects.bulk_create([Meal(user=self.user, name=n, date=self.d2) for n in ("Egg", "egg", "Milk")])
+        a.name = "Pasta"                      # rename moves a use to another food
+        a.save()
+        Meal.objects.filter(user=self.user, name="Milk").update(name="Kefir")
+        Meal.objects.filter(user=self.user, name="egg").delete()
+        meal_batch.replay_meals(self.user, self.d2, self.d2, self.d3)
+        incremental = self.snapshot()
+
+        call_command("rebuild_recent_foods", "--batch-size", "1", stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual({r[0]: r[4] for r in incremental}, {"pasta": 1, "rice": 2, "egg": 2, "kefir": 2})
+
+        Meal.objects.filter(user=self.user).delete()
+        self.assertFalse(RecentFood.objects.filter(user=self.user).exists())
+
+    def test_refresh_rewrites_only_the_named_foods(self):
+        for name in ("Oat", " OAT", "Goat cheese", "Oat milk"):
+            Meal.objects.create(user=self.user, name=name, date=self.d1, grams=100, cal_per_100g=100)
+        with mock.patch.object(recents, "_upsert", wraps=recents._upsert) as upsert:
+            recents.refresh_recent_foods([(self.user.pk, "oat")])
+        self.assertEqual([o.key for o in upsert.call_args.args[0]], ["oat"])
+        self.assertEqual(RecentFood.objects.get(user=self.user, key="oat").use_count, 2)
+
+    def test_edits_keep_names_sql_cannot_normalize(self):
+        # SQLite's LOWER leaves "É" alone and TRIM keeps tabs: the food must survive an edit anyway
+        for names, key in [(("Éclair", "éclair"), "éclair"), (("banana\t", "Banana"), "banana")]:
+            with self.subTest(key):
+                meals = [Meal.objects.create(user=self.user, name=n, date=self.d1, grams=100) for n in names]
+                meals[0].grams = 120
+                meals[0].save()
+                self.assertEqual(RecentFood.objects.get(user=self.user, key=key).use_count, 2)
+                meals[1].delete()
+                self.assertEqual(RecentFood.objects.get(user=self.user, key=key).use_count, 1)
+
+    def test_missing_rows_exist_before_the_locked_read(self):
+        Meal.objects.create(user=self.user, name="Kefir", date=self.d1)
+        meal = Meal(user=self.user, name="kefir", date=self.d2)
+        with CaptureQueriesContext(connection) as ctx:
+            Meal.objects.bulk_create([meal])
+        recent = [q["sql"].split()[0] for q in ctx.captured_queries if "tracker_recentfood" in q["sql"]]
+        self.assertEqual(recent[:2], ["INSERT", "SELECT"])
+        self.assertEqual(RecentFood.objects.get(user=self.user, key="kefir").use_count, 2)
+
+    def test_api(self):
+        self.client.force_login(self.user)
+        Meal.objects.create(user=self.user, name="Bagel", date=self.d1, grams=90, cal_per_100g=250)
+        data = self.client.get(reverse("recent_foods"), {"order": "frequent"}).json()
+        self.assertEqual(data["results"][0]["name"], "Bagel")
+        self.assertEqual(self.client.get(reverse("recent_foods"), {"order": "alpha"}).status_code, 400)
+
+
+@skipUnless(connection.vendor in ("postgresql", "mysql"), "needs concurrent write transactions")
+class RecentFoodConcurrencyTests(TransactionTestCase):
+    def test_concurrent_first_uses_are_all_counted(self):
+        user = User.objects.create(username="racer")
+        n = 8
+        barrier = threading.Barrier(n)
+
+        def log():
+            barrier.wait(5)
+            try:
+                Meal.objects.bulk_create([Meal(user=user, name="Kefir", date=dt.date(2025, 3, 1))])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=log) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        self.assertEqual(RecentFood.objects.get(user=user, key="kefir").use_count, n)
+
+
+# (label, queryset factory, table, index that must serve it or None for "any",
+#  whether the index must also provide the ORDER BY)
+HOT_QUERIES = [
+    ("day meals", lambda u, d: Meal.objects.filter(user=u, date=d).order_by("-id"),
+     "tracker_meal", "meal_user_date_id_idx", True),
+    ("recent foods", lambda u, d: RecentFood.objects.filter(user=u).order_by("-last_used", "-last_meal_id")[:8],
+     "tracker_recentfood", "recent_user_last_idx", True),
+    ("frequent foods", lambda u, d: RecentFood.objects.filter(user=u).order_by("-use_count", "-last_used")[:8],
+     "tracker_recentfood", "recent_user_count_idx", True),
+    ("export range", lambda u, d: Meal.objects.filter(user=u, date__range=[d, d]).order_by("date", "id"),
+     "tracker_meal", "meal_user_date_id_idx", True),
+    ("barcode history", lambda u, d: Meal.objects.filter(user=u, source_id="3017620422003"),
+     "tracker_meal", "meal_user_source_idx", False),
+    ("favorites list", lambda u, d: FavoriteFood.objects.filter(user=u).order_by("-created_at"),
+     "tracker_favoritefood", "fav_user_created_idx", True),
+    ("favorite upsert", lambda u, d: FavoriteFood.objects.filter(user=u, name="Oats"),
+     "tracker_favoritefood", "fav_user_name_idx", False),
+    ("rollup range", lambda u, d: DailyTotals.objects.filter(user=u, date__range=[d, d]),
+     "tracker_dailytotals", None, False),
+    ("catalog prefix", lambda u, d: FoodToken.objects.filter(term__gte="ba", term__lt="bb"),
+     "tracker_foodtoken", "foodtoken_term_food_idx", False),
+]
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN every hot query and fail if it stops using an index. Add new
+    hot queries to HOT_QUERIES.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="plans")
+        self.day = dt.date(2025, 1, 1)
+        if connection.vendor == "postgresql":
+            # tiny test tables would otherwise always be seq-scanned
+            with connection.cursor() as cur:
+                cur.execute("SET LOCAL enable_seqscan = off")
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            self.skipTest(f"no plan checks for {connection.vendor}")
+        for label, make_qs, table, index, ordered in HOT_QUERIES:
+            with self.subTest(label):
+                plan = make_qs(self.user, self.day).explain()
+                if connection.vendor == "sqlite":
+                    self.assertNotRegex(plan, rf"SCAN {table}\b(?! USING)", plan)
+                    self.assertRegex(plan, rf"SEARCH {table} USING (COVERING )?INDEX {index or ''}", plan)
+                    if ordered:
+                        self.assertNotIn("TEMP B-TREE FOR ORDER BY", plan)
+                else:
+                    self.assertNotIn(f"Seq Scan on {table}", plan)
+                    self.assertIn("Index", plan)
+                    if index:
+                        self.assertIn(index, plan)
+                    if ordered:
+                        self.assertNotRegex(plan, r"(?m)^\s*(->\s*)?Sort\b")
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="export")
+        self.client.force_login(self.user)
+        Meal.objects.create(user=self.user, name="Eggs, scrambled", date="2025-01-02", calories=200, protein=14)
+        Meal.objects.create(user=self.user, name="Oats", date="2025-01-01", calories=380, protein=13)
+
+    def test_csv_is_streamed_oldest_first(self):
+        resp = self.client.get(reverse("export_csv"), {"start": "2025-01-01", "end": "2025-01-31"})
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp["Content-Disposition"],
+                         'attachment; filename="meals_2025-01-01_to_2025-01-31.csv"')
+        self.assertEqual(b"".join(resp.streaming_content).decode().splitlines(), [
+            "Date,Name,Calories,Protein,Carbs,Fat",
+            "2025-01-01,Oats,380,13.0,0.0,0.0",
+            '2025-01-02,"Eggs, scrambled",200,14.0,0.0,0.0',
+        ])
+
+    def test_ndjson_has_every_column(self):
+        resp = self.client.get(reverse("export_meals", args=["ndjson"]))
+        rows = [json.loads(l) for l in b"".join(resp.streaming_content).splitlines()]
+        self.assertEqual([r["name"] for r in rows], ["Oats", "Eggs, scrambled"])
+        self.assertEqual(set(rows[0]), {f.attname for f in Meal._meta.concrete_fields})
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(reverse("export_meals", args=["xlsx"])).status_code, 404)
+
+    @skipUnless(find_spec("pyarrow"), "pyarrow not installed")
+    def test_parquet_and_arrow_round_trip(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for fmt, read in [("parquet", lambda b: pq.read_table(pa.BufferReader(b))),
+                          ("arrow", lambda b: pa.ipc.open_stream(b).read_all())]:
+            with self.subTest(fmt):
+                resp = self.client.get(reverse("export_meals", args=[fmt]))
+                table = read(b"".join(resp.streaming_content))
+                self.assertEqual(table.column("name").to_pylist(), ["Oats", "Eggs, scrambled"])
+                self.assertEqual(table.column("date").to_pylist(), [dt.date(2025, 1, 1), dt.date(2025, 1, 2)])
+
+    def test_bulk_csv_has_user_column(self):
+        other = User.objects.create(username="other-exporter")
+        Meal.objects.create(user=other, name="Rice", date="2024-12-31", calories=200)
+        path = Path(tempfile.mkdtemp()) / "all.csv"
+        self.addCleanup(shutil.rmtree, path.parent, ignore_errors=True)
+        call_command("export_meals", "--format", "csv", "-o", str(path), stdout=StringIO())
+        lines = path.read_text().splitlines()
+        self.assertEqual(lines[0], "User ID,Date,Name,Calories,Protein,Carbs,Fat")
+        self.assertEqual([l.split(",")[0] for l in lines[1:]],
+                         sorted([str(self.user.pk)] * 2 + [str(other.pk)]))
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create(username="jobs")
+        self.client.force_login(self.user)
+        Meal.objects.create(user=self.user, name="Oats", date="2025-01-01", calories=380, protein=13)
+        Meal.objects.create(user=self.user, name="Rice", date="2025-02-01", calories=200)
+
+    def _finished_job(self, **data):
+        resp = self.client.post(reverse("export_job_create"), {"format": "csv", **data})
+        self.assertEqual(resp.status_code, 202)
+        job_id = resp.json()["id"]
+        self.assertEqual(resp.json()["status"], "pending")
+        call_command("run_export_jobs", "--once", stdout=StringIO())
+        return self.client.get(reverse("export_job_status", args=[job_id])).json()
+
+    def test_job_runs_in_worker_and_polls_done(self):
+        status = self._finished_job(start="2025-01-01", end="2025-01-31")
+        self.assertEqual((status["status"], status["rows"]), ("done", 1))
+        body = b"".join(self.client.get(status["download_url"]).streaming_content)
+        self.assertEqual(body.decode().splitlines(),
+                         ["Date,Name,Calories,Protein,Carbs,Fat", "2025-01-01,Oats,380,13.0,0.0,0.0"])
+        self.assertEqual(len(body), status["size"])
+
+    def test_range_requests_resume_download(self):
+        status = self._finished_job()
+        url = status["download_url"]
+        full = b"".join(self.client.get(url).streaming_content)
+
+        resp = self.client.get(url, headers={"Range": "bytes=10-"})
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], f"bytes 10-{len(full) - 1}/{len(full)}")
+        self.assertEqual(b"".join(resp.streaming_content), full[10:])
+
+        resp = self.client.get(url, headers={"Range": "bytes=-5", "If-Range": resp["ETag"]})
+        self.assertEqual(b"".join(resp.streaming_content), full[-5:])
+
+        # stale validator -> whole file again
+        resp = self.client.get(url, headers={"Range": "bytes=10-", "If-Range": '"old"'})
+        self.assertEqual(resp.status_code, 200)
+
+        resp = self.client.get(url, headers={"Range": f"bytes={len(full)}-"})
+        self.assertEqual((resp.status_code, resp["Content-Range"]), (416, f"bytes */{len(full)}"))
+
+    def test_jobs_are_private_and_claimed_once(self):
+        job = ExportJob.objects.create(user=self.user, format="ndjson")
+        other = User.objects.create(username="other")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse("export_job_status", args=[job.pk])).status_code, 404)
+
+        self.assertEqual(claim_next_job().pk, job.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_bad_format(self):
+        resp = self.client.post(reverse("export_job_create"), {"format": "xlsx"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_columnar_job_without_pyarrow_is_refused_at_enqueue(self):
+        with mock.patch("tracker.templates.tracker.services.export_jobs._pyarrow",
+                        side_effect=ExportUnavailable("needs pyarrow")):
+            resp = self.client.post(reverse("export_job_create"), {"format": "parquet"})
+        self.assertEqual((resp.status_code, resp.json()["error"]), (400, "needs pyarrow"))
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_rows_are_counted_while_writing(self):
+        for fmt in ["csv", "ndjson"] + (["parquet", "arrow"] if find_spec("pyarrow") else []):
+            with self.subTest(fmt=fmt):
+                job = ExportJob.objects.create(user=self.user, format=fmt, status="running")
+                with CaptureQueriesContext(connection) as ctx:
+                    run_job(job)
+                self.assertEqual((job.status, job.rows), ("done", 2))
+                self.assertFalse([q for q in ctx.captured_queries if "COUNT(" in q["sql"]])
+
+
+class MealImportTests(TestCase):
+    CSV = (
+        "date,name,grams,cal_per_100g,protein_per_100g,carbs_per_100g,fat_per_100g,calories\n"
+        "2025-03-01,Oats,50,380,13,60,7,\n"
+        "2025-03-01,Apple,,,,,,95\n"
+        "03/01/2025,Bad date,,,,,,10\n"
+        "2025-03-02,,,,,,,10\n"
+        "2025-03-02,Rice,150,130,2.7,28,0.3,999\n"
+    )
+
+    def setUp(self):
+        self.user = User.objects.create(username="importer")
+
+    def test_totals_from_per_100g_and_row_errors(self):
+        report = import_meals(self.user, StringIO(self.CSV), "csv", batch_size=2)
+        self.assertEqual((report["rows"], report["created"], report["skipped"]), (5, 3, 2))
+        self.assertEqual([e["line"] for e in report["errors"]], [4, 5])
+
+        oats = Meal.objects.get(user=self.user, name="Oats")
+        self.assertEqual((oats.calories, oats.protein, oats.carbs, oats.fat), (190, 6.5, 30.0, 3.5))
+        self.assertEqual(Meal.objects.get(name="Rice").calories, 195)   # per-100g wins over the total
+        self.assertEqual(Meal.objects.get(name="Apple").calories, 95)
+        self.assertEqual(DailyTotals.objects.get(user=self.user, date="2025-03-01").kcal, 285)
+
+    def test_non_finite_numbers_are_row_errors(self):
+        csv_rows = ("date,name,grams,calories\n"
+                    "2025-03-01,A,inf,10\n2025-03-01,B,100,1e999\n2025-03-01,C,nan,10\n")
+        ndjson = '{"date": "2025-03-01", "name": "D", "calories": 1e999}\n'
+        for fmt, data in [("csv", csv_rows), ("ndjson", ndjson)]:
+            with self.subTest(fmt):
+                report = import_meals(self.user, StringIO(data), fmt)
+                self.assertEqual(report["created"], 0)
+                self.assertTrue(all("between 0 and" in e["error"] for e in report["errors"]), report["errors"])
+        self.assertFalse(Meal.objects.filter(user=self.user).exists())
+
+    def test_oversized_numbers_and_totals_are_row_errors(self):
+        data = ("date,name,grams,cal_per_100g,calories\n"
+                "2025-03-01,A,,,1e300\n"
+                "2025-03-01,B,1e200,1e200,\n"
+                "2025-03-01,C,500000,900,\n"        # each value fine, the total 4.5M kcal is not
+                "2025-03-01,D,1000000,100,\n")      # exactly MAX_AMOUNT kcal
+        report = import_meals(self.user, StringIO(data), "csv")
+        self.assertEqual(report["created"], 1)
+        self.assertEqual([e["line"] for e in report["errors"]], [2, 3, 4])
+        self.assertEqual(report["errors"][2]["error"], "calories (grams x cal_per_100g) must be at most 1000000")
+        self.assertEqual(Meal.objects.get(user=self.user).calories, 1_000_000)
+        self.assertEqual(DailyTotals.objects.get(user=self.user).kcal, 1_000_000)
+
+    def test_strict_rolls_back(self):
+        report = import_meals(self.user, StringIO(self.CSV), "csv", strict=True)
+        self.assertEqual((report["created"], report["skipped"]), (0, 2))
+        self.assertFalse(Meal.objects.filter(user=self.user).exists())
+
+    def test_ndjson_export_round_trips_through_upload(self):
+        src = User.objects.create(username="source")
+        Meal.objects.create(user=src, name="Eggs", date="2025-01-02", grams=120, cal_per_100g=150,
+                            protein_per_100g=12.5, carbs_per_100g=1, fat_per_100g=10, source="OFF", source_id="123")
+        self.client.force_login(src)
+        dump = b"".join(self.client.get(reverse("export_meals", args=["ndjson"])).streaming_content)
+
+        self.client.force_login(self.user)
+        resp = self.client.post(reverse("import_meals"),
+                                {"file": SimpleUploadedFile("meals.ndjson", dump + b"not json\n")})
+        self.assertEqual((resp.json()["created"], resp.json()["errors"]),
+                         (1, [{"line": 2, "error": "not a JSON object"}]))
+        m = Meal.objects.get(user=self.user)
+        self.assertEqual((m.calories, m.protein, m.grams, m.source, m.source_id), (180, 15.0, 120, "OFF", "123"))
+
+
+class AiLogPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="planner")
+        self.client.force_login(self.user)
+
+    def test_plan_logged_with_one_insert(self):
+        items = [{"name": "Banana", "grams": 120},
+                 {"name": "Homemade stew", "grams": 200, "kcal": 300, "p": 20, "c": 30, "f": 10}]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(reverse("ai_log_plan"),
+                                    {"date": "2025-04-01", "items": json.dumps(items)})
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "tracker_meal"')]
+        self.assertEqual(len(inserts), 1)
+        data = resp.json()
+        self.assertTrue(data["ok"])
+        self.assertEqual(data["created"], 2)
+        meals = Meal.objects.filter(pk__in=data["ids"]).order_by("id")
+        self.assertEqual([(m.name, m.calories) for m in meals], [("Banana", 115), ("Homemade stew", 300)])
+        self.assertEqual(DailyTotals.objects.get(user=self.user, date="2025-04-01").kcal, 415)
+
+    def test_invalid_item_logs_nothing(self):
+        items = [{"name": "Banana", "grams": 120}, {"name": "Mystery", "grams": 100}]
+        resp = self.client.post(reverse("ai_log_plan"), {"items": json.dumps(items)})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual((resp.json()["ok"], resp.json()["created"]), (False, 0))
+        self.assertEqual(resp.json()["errors"], ["Mystery: not in library and no macros provided"])
+        self.assertFalse(Meal.objects.exists())
+
+    def test_non_finite_and_huge_numbers_are_rejected(self):
+        body = ('{"items": [{"name": "Stew", "grams": "inf", "kcal": 300}, {"name": "Soup", "grams": 200, "kcal": "nan"},'
+                ' {"name": "Pie", "grams": 100, "kcal": 1e308}, {"name": "Banana", "grams": 1e999},'
+                ' {"name": "Oats (dry)", "grams": 1000000}]}')
+        resp = self.client.post(reverse("ai_log_plan"), body, content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["errors"], [
+            "Stew: grams must be between 0 and 1000000", "Soup: kcal must be between 0 and 1000000",
+            "Pie: kcal must be between 0 and 1000000", "Banana: grams must be between 0 and 1000000",
+            "Oats (dry): calories (grams x cal_per_100g) must be at most 1000000",
+        ])
+        self.assertFalse(Meal.objects.exists())
+
+    def test_several_days_in_one_request(self):
+        plans = [{"date": f"2025-04-0{d}", "items": [{"name": "Oats (dry)", "grams": 60}]} for d in (1, 2, 3)]
+        data = self.client.post(reverse("ai_log_plan"), json.dumps({"plans": plans}),
+                                content_type="application/json").json()
+        self.assertEqual(data["created"], 3)
+        self.assertEqual(sorted(Meal.objects.values_list("date", flat=True)),
+                         [dt.date(2025, 4, d) for d in (1, 2, 3)])
+
+
+class MealReplayTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="prep")
+        self.client.force_login(self.user)
+        for d, name in [(1, "Oats"), (1, "Chicken"), (2, "Rice")]:
+            Meal.objects.create(user=self.user, name=name, date=dt.date(2025, 5, d), grams=200,
+                                cal_per_100g=100, protein_per_100g=10, source="OFF", source_id=f"code{d}")
+
+    def _copies(self, since):
+        return list(Meal.objects.filter(user=self.user, date__gte=since)
+                    .order_by("date", "id").values_list("date", "name", "calories", "grams", "source_id"))
+
+    def test_range_cycles_over_target_with_all_fields(self):
+        data = self.client.post(reverse("meal_replay"), {
+            "src_start": "2025-05-01", "src_end": "2025-05-02",
+            "dst_start": "2025-05-10", "dst_end": "2025-05-12",
+        }).json()
+        self.assertEqual((data["created"], data["days"]), (5, 3))
+        self.assertEqual(self._copies(dt.date(2025, 5, 10)), [
+            (dt.date(2025, 5, 10), "Oats", 200, 200.0, "code1"),
+            (dt.date(2025, 5, 10), "Chicken", 200, 200.0, "code1"),
+            (dt.date(2025, 5, 11), "Rice", 200, 200.0, "code2"),
+            (dt.date(2025, 5, 12), "Oats", 200, 200.0, "code1"),
+            (dt.date(2025, 5, 12), "Chicken", 200, 200.0, "code1"),
+        ])
+        self.assertEqual(DailyTotals.objects.get(user=self.user, date="2025-05-12").kcal, 400)
+
+    def test_bulk_fallback_matches_insert_select(self):
+        mapping = meal_batch.replay_days(dt.date(2025, 5, 1), dt.date(2025, 5, 2), dt.date(2025, 6, 1))
+        self.assertEqual(meal_batch._replay_bulk(self.user.pk, mapping), 3)
+        bulk = [r[1:] for r in self._copies(dt.date(2025, 6, 1))]
+        Meal.objects.filter(date__gte="2025-06-01").delete()
+        meal_batch._replay_insert_select(self.user.pk, mapping)
+        self.assertEqual([r[1:] for r in self._copies(dt.date(2025, 6, 1))], bulk)
+
+    def test_replace_and_copy_yesterday(self):
+        Meal.objects.create(user=self.user, name="Old", date=dt.date(2025, 5, 3))
+        self.client.post(reverse("meal_replay"), {"src_start": "2025-05-02", "dst_start": "2025-05-03",
+                                                  "replace": "1"})
+        self.assertEqual(list(Meal.objects.filter(date="2025-05-03").values_list("name", flat=True)), ["Rice"])
+
+        self.client.get(reverse("copy_yesterday"), {"to": "2025-05-04"})
+        self.assertEqual(self._copies(dt.date(2025, 5, 4)), [(dt.date(2025, 5, 4), "Rice", 200, 200.0, "code2")])
+
+
+class QuickAddBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="batch")
+        self.client.force_login(self.user)
+
+    def _post(self, payload):
+        return self.client.post(reverse("quick_add_batch"), json.dumps(payload), content_type="application/json")
+
+    def test_one_insert_with_per_item_results(self):
+        items = [
+            {"name": "Banana", "grams": 150, "cal_per_100g": 89, "protein_per_100g": 1.1,
+             "carbs_per_100g": 22.8, "fat_per_100g": 0.3, "source_id": "123"},
+            {"name": "Sandwich", "grams": 200, "calories": 450, "protein": 20},
+            {"name": "", "grams": 10},
+            {"name": "Soup", "grams": "lots"},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._post({"date": "2025-06-01", "items": items}).json()
+        self.assertEqual(sum(q["sql"].startswith('INSERT INTO "tracker_meal"') for q in ctx.captured_queries), 1)
+
+        self.assertFalse(data["ok"])
+        self.assertEqual(data["created"], 2)
+        self.assertEqual([r["ok"] for r in data["results"]], [True, True, False, False])
+        self.assertEqual(data["results"][3]["error"], "grams is not a number")
+
+        banana = Meal.objects.get(pk=data["results"][0]["id"])
+        self.assertEqual((banana.calories, banana.carbs, banana.source_id), (134, 34.2, "123"))
+        sandwich = Meal.objects.get(pk=data["results"][1]["id"])
+        self.assertEqual((sandwich.calories, sandwich.cal_per_100g, sandwich.protein_per_100g), (450, 225, 10))
+        self.assertEqual(DailyTotals.objects.get(user=self.user, date="2025-06-01").kcal, 584)
+
+    def test_non_finite_and_huge_numbers_are_item_errors(self):
+        body = ('{"date": "2025-06-01", "items": [{"name": "A", "grams": 1e999}, {"name": "B", "calories": "inf"},'
+                ' {"name": "C", "grams": "nan"}, {"name": "D", "grams": 1e300, "cal_per_100g": 100},'
+                ' {"name": "E", "grams": 1000000, "cal_per_100g": 900}]}')
+        data = self.client.post(reverse("quick_add_batch"), body, content_type="application/json").json()
+        self.assertEqual(data["created"], 0)
+        self.assertEqual([r["error"] for r in data["results"]],
+                         [f"{k} must be between 0 and 1000000" for k in ("grams", "calories", "grams", "grams")]
+                         + ["calories (grams x cal_per_100g) must be at most 1000000"])
+
+    def test_all_or_nothing(self):
+        data = self._post({"items": [{"name": "Tea"}, {"grams": 5}], "all_or_nothing": True}).json()
+        self.assertEqual(data["created"], 0)
+        self.assertEqual([r["ok"] for r in data["results"]], [False, False])
+        self.assertFalse(Meal.objects.exists())
+
+    def test_single_quick_add_unchanged(self):
+        resp = self.client.post(reverse("quick_add_food"), {"name": "Rice", "grams": 200, "cal_per_100g": 130,
+                                                            "date": "2025-06-02"})
+        self.assertEqual(resp.json(), {"ok": True})
+        self.assertEqual(Meal.objects.get(name="Rice").calories, 260)
+        self.assertEqual(self.client.post(reverse("quick_add_food"), {"grams": 5}).status_code, 400)
+
+
+class FoodLibraryTests(SimpleTestCase):
+    PREFS = [{}, {"vegan": True}, {"vegetarian": True, "no_dairy": True}, {"gluten_free": True, "no_nuts": True},
+             {"vegan": True, "no_nuts": True, "gluten_free": True, "no_dairy": True}]
+    NEEDS = [{"kcal": 650, "p": 45, "c": 70, "f": 20}, {"kcal": 200, "p": 5, "c": 10, "f": 30},
+             {"kcal": -100, "p": -5, "c": 0, "f": 0}, {"kcal": 2400, "p": 160, "c": 300, "f": 80}]
+
+    def test_matches_greedy_reference(self):
+        for foods in (FOODS, synthetic_foods(300, seed=3)):
+            lib = FoodLibrary.from_foods(foods)
+            for need in self.NEEDS:
+                for prefs in self.PREFS:
+                    with self.subTest(n=len(foods), need=need, prefs=prefs):
+                        self.assertEqual(lib.suggest(need, prefs), suggest_meals_reference(need, prefs, foods))
+
+    def test_preferences_are_bitmask_filters(self):
+        lib = FoodLibrary.from_foods(FOODS)
+        vegan = {lib.names[i] for i in np.flatnonzero(lib.fits({"vegan": True, "no_nuts": True}))}
+        self.assertEqual(vegan, {"Tofu (firm)", "Cooked White Rice", "Banana", "Avocado", "Broccoli"})
+        plans = suggest_meals({"kcal": 600, "p": 40, "c": 60, "f": 15}, {"vegan": True, "no_nuts": True})
+        self.assertTrue(all(i["name"] in vegan for plan in plans for i in plan["items"]))
+
+    def test_partitions_precomputed_and_invalidated(self):
+        lib = get_library()
+        self.assertEqual(len(lib._partitions), 32)        # every flag combination, built at load
+        vegan = lib.partition({"vegan": True, "high_protein": True})   # non-dietary flags don't matter
+        self.assertIs(vegan, lib.partition({"vegan": True}))
+        self.assertEqual([lib.names[i] for i in vegan.ranks["lean_protein"][:2]],
+                         ["Almonds", "Tofu (firm)"])
+        with self.assertRaises(ValueError):
+            lib.p[0] = 99                                  # columns are frozen
+
+        set_library(None)                                  # library changed: rebuild on next use
+        self.addCleanup(set_library, None)
+        self.assertIsNot(get_library(), lib)
+
+
+class MealSolverTests(SimpleTestCase):
+    NEED = {"kcal": 700, "p": 45, "c": 80, "f": 20}
+
+    @staticmethod
+    def _error(plan, need):
+        t = np.array([need["kcal"], 4 * need["p"], 4 * need["c"], 9 * need["f"]])
+        got = np.array([plan["totals"]["kcal"], 4 * plan["totals"]["p"], 4 * plan["totals"]["c"], 9 * plan["totals"]["f"]])
+        return float(np.sqrt((np.array([1.0, 1.3, 1.0, 0.7]) * (got - t) ** 2).sum()))
+
+    def test_beats_greedy_within_bounds(self):
+        lib = FoodLibrary.from_foods(synthetic_foods(2000, seed=5))
+        for prefs in ({}, {"vegan": True}):
+            with self.subTest(prefs=prefs):
+                plan = solve_plan(self.NEED, prefs, lib=lib, deadline_ms=1000)
+                self.assertTrue(plan["solver"]["complete"])
+                self.assertLessEqual(len(plan["items"]), 3)
+                self.assertTrue(all(30 <= i["grams"] <= 400 for i in plan["items"]))
+                self.assertLessEqual(plan["totals"]["kcal"], self.NEED["kcal"] * 1.1 + 1)
+                allowed = {lib.names[i] for i in np.flatnonzero(lib.fits(prefs))}
+                self.assertTrue(all(i["name"] in allowed for i in plan["items"]))
+                greedy = min(self._error(p, self.NEED) for p in lib.suggest(self.NEED, prefs))
+                self.assertLess(self._error(plan, self.NEED), greedy)
+
+    def test_deadline_returns_best_so_far(self):
+        ticks = iter(range(0, 10_000, 100))      # every clock read is 100 ms later
+        plan = solve_plan(self.NEED, {}, clock=lambda: next(ticks) / 1000, deadline_ms=50)
+        self.assertFalse(plan["solver"]["complete"])
+        self.assertEqual(len(plan["items"]), 1)   # stopped after the first batch (single foods)
+
+    def test_nothing_needed(self):
+        self.assertIsNone(solve_plan({"kcal": 0, "p": 0, "c": 0, "f": 0}, {}))
+
+    def test_suggest_meals_puts_solver_plan_first(self):
+        plans = suggest_meals(self.NEED, {}, solver=True)
+        self.assertEqual([p["title"] for p in plans],
+                         ["Optimized Plan", "Quick Protein Fix", "Balanced Bowl", "Macro Gap Filler"])
+
+
+class RecommendationTests(TestCase):
+    def _goals(self, n, seed=0):
+        rnd = np.random.default_rng(seed)
+        goals = []
+        for i in range(n):
+            complete = i % 7 != 0
+            goals.append(Goal(
+                sex=rnd.choice(["M", "F", ""]) if complete else "",
+                age=int(rnd.integers(16, 80)) if complete else None,
+                height_cm=float(rnd.uniform(140, 205)) if complete else None,
+                weight_kg=None if i % 5 == 0 else round(float(rnd.uniform(40, 160)), 1),
+                activity=rnd.choice(list(nutrition.ACTIVITY_FACTORS) + [""]),
+                objective=rnd.choice(["lose", "maintain", "gain"]),
+                weekly_rate_kg=round(float(rnd.uniform(0, 1.5)), 2),
+                calories=int(rnd.integers(900, 4000)),
+            ))
+        return goals
+
+    def test_batch_matches_scalar(self):
+        self._assert_batch_matches_scalar(self._goals(2000))
+
+    def test_batch_matches_scalar_at_boundaries(self):
+        full = dict(sex="M", age=30, height_cm=180, activity="moderate", objective="maintain", weekly_rate_kg=0)
+        self._assert_batch_matches_scalar([
+            Goal(sex=None, age=None, height_cm=None, weight_kg=None, activity=None, objective=None,
+                 weekly_rate_kg=None, calories=None),                                   # nothing filled in
+            Goal(sex="", age=None, height_cm=None, weight_kg=None, activity="", objective="", calories=0),
+            Goal(sex="", weight_kg=80, calories=0),                                     # no target at all
+            Goal(sex="", weight_kg=100, calories=1000),                                 # fat squeezed
+            Goal(sex="", weight_kg=140, calories=300),                                  # squeezed to the floors
+            Goal(sex="", weight_kg=20, calories=900),                                   # protein/fat floors
+            Goal(sex="", weight_kg=0, calories=1800),                                   # 0 kg: ratio split
+            Goal(sex="", weight_kg=40.625, calories=1234),                              # x.5 rounding
+            Goal(**{**full, "weight_kg": 80, "age": 0}),                                # one field missing
+            Goal(**{**full, "weight_kg": 80, "activity": "couch"}),                     # unknown activity
+            Goal(**{**full, "weight_kg": 80, "objective": "lose", "weekly_rate_kg": 5}),   # capped deficit
+            Goal(**{**full, "weight_kg": 80, "objective": "gain", "weekly_rate_kg": 5}),   # capped surplus
+            Goal(**{**full, "weight_kg": 40, "age": 90, "height_cm": 120, "sex": "F",
+                    "objective": "lose", "weekly_rate_kg": 1, "calories": 0}),           # low TDEE, squeezed
+        ])
+
+    def _assert_batch_matches_scalar(self, goals):
+        res = nutrition.recommend_batch([nutrition.goal_key(g) for g in goals])
+        for i, g in enumerate(goals):
+            reco = nutrition.suggest_calorie_target(g)
+            macros = nutrition.suggest_macros(g, reco.get("recommended") or g.calories)
+            self.assertEqual(bool(res["valid"][i]), reco["recommended"] is not None)
+            if reco["recommended"] is not None:
+                self.assertEqual(res["recommended"][i], reco["recommended"])
+                self.assertEqual(round(res["tdee"][i]), reco["tdee"])
+            self.assertEqual(
+                (res["calories"][i], res["protein"][i], res["fat"][i], res["carbs"][i]),
+                (macros["calories"], macros["protein"], macros["fat"], macros["carbs"]), g.__dict__,
+            )
+
+    def test_memoized_until_goal_changes(self):
+        user = User.objects.create_user("reco", password="pw")
+        goal = Goal.objects.create(user=user, sex="F", age=30, height_cm=165, weight_kg=60, objective="lose")
+        nutrition.cache_clear()
+        first, _ = nutrition.recommend(goal)
+        self.assertEqual(nutrition.recommend(Goal.objects.get(pk=goal.pk))[0], first)
+        self.assertEqual(nutrition.cache_info()["calories"].hits, 1)
+
+        goal.weight_kg = 70
+        goal.save()
+        second, macros = nutrition.recommend(Goal.objects.get(pk=goal.pk))
+        self.assertGreater(second["recommended"], first["recommended"])
+        self.assertEqual(macros["protein"], 125)    # 1.8 g/kg of the new weight
+
+    def test_reevaluate_command(self):
+        user = User.objects.create_user("nightly", password="pw")
+        Goal.objects.create(user=user, sex="M", age=40, height_cm=180, weight_kg=80, calories=1500)
+        other = User.objects.create_user("partial", password="pw")
+        Goal.objects.create(user=other, calories=1800)
+        out = StringIO()
+        call_command("reevaluate_goals", "--apply", stdout=out)
+        self.assertIn("2 goals, 1 with a TDEE estimate, 1 off by", out.getvalue())
+        goal = Goal.objects.get(user=user)
+        reco, macros = nutrition.recommend(goal)
+        self.assertEqual(goal.calories, reco["recommended"])
+        self.assertEqual((goal.protein, goal.carbs, goal.fat), (macros["protein"], macros["carbs"], macros["fat"]))
+        self.assertEqual(Goal.objects.get(user=other).calories, 1800)
+
+
+class ProjectionTests(TestCase):
+    def test_closed_form_matches_daily_simulation(self):
+        people = [("M", 80.0, 180.0, 35, "moderate", 2100.0), ("F", 95.0, 165.0, 52, "light", 1500.0),
+                  ("F", 55.0, 160.0, 24, "very_active", 2900.0)]
+        days = 120
+        got = projection.project_weights(
+            [p[1] for p in people], [p[2] for p in people], [p[3] for p in people],
+            np.array([5.0 if p[0] == "M" else -161.0 for p in people]),
+            [nutrition.activity_factor(p[4]) for p in people], [p[5] for p in people], days,
+        )
+        for row, (sex, w, h, age, activity, intake) in zip(got, people):
+            expected = [w]
+            for _ in range(days):
+                tdee = nutrition.mifflin_bmr(sex, w, h, age) * nutrition.activity_factor(activity)
+                w += (intake - tdee) / 7700
+                expected.append(w)
+            np.testing.assert_allclose(row, expected, rtol=1e-9)
+
+    def test_per_day_intake(self):
+        flat = projection.project_weights([80], [180], [35], [5.0], [1.55], [2000], 14)
+        plan = projection.project_weights([80], [180], [35], [5.0], [1.55], np.full((1, 14), 2000.0), 14)
+        np.testing.assert_allclose(flat, plan)
+
+    def test_projects_from_logged_intake_and_serves_cached_chart(self):
+        user = User.objects.create_user("proj", password="pw")
+        Goal.objects.create(user=user, sex="M", age=30, height_cm=180, weight_kg=90, calories=2600)
+        Goal.objects.create(user=User.objects.create_user("nodata", password="pw"))
+        today = dt.date.today()
+        for i in range(1, 6):
+            Meal.objects.create(user=user, name="Dinner", calories=1800, date=today - dt.timedelta(days=i))
+
+        result = projection.project_users(weeks=4)
+        self.assertEqual(result["user_ids"], [user.pk])
+        self.assertEqual(result["intake"][0], 1800)
+        self.assertEqual(result["weights"].shape, (1, 29))
+        self.assertTrue(np.all(np.diff(result["weights"][0]) < 0))     # eating below TDEE
+        self.assertLess(result["tdee_end"][0], result["tdee_start"][0])
+
+        call_command("project_weights", stdout=StringIO())
+        self.assertEqual(WeightProjection.objects.filter(user=user).count(), 1)
+        self.client.login(username="proj", password="pw")
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse("weight_projection")).json()
+        self.assertTrue(data["ok"])
+        self.assertTrue(data["from_log"])
+        self.assertEqual(len(data["weight_kg"]), 13)
+        # served from the nightly row, nothing re-projected
+        self.assertFalse([q for q in ctx.captured_queries if "tracker_dailytotals" in q["sql"]])
+
+        Meal.objects.filter(user=user).delete()
+        data = self.client.get(reverse("weight_projection")).json()
+        self.assertFalse(data["from_log"])
+        self.assertEqual(data["intake"], 2600)
+
+        self.client.post(reverse("apply_calorie_reco"))
+        data = self.client.get(reverse("weight_projection")).json()
+        self.assertEqual(data["intake"], Goal.objects.get(user=user).calories)
+        self.assertNotEqual(data["intake"], 2600)
+
+    def test_incomplete_goal(self):
+        User.objects.create_user("anon", password="pw")
+        self.client.login(username="anon", password="pw")
+        resp = self.client.get(reverse("weight_projection"), {"weeks": 8})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.client.get(reverse("weight_projection"), {"weeks": 99}).status_code, 400)
@@ -10,9 +10,22 @@ urlpatterns = [
     path('logout-now/', views.logout_now, name='logout_now'),
     path('goals/', views.edit_goal, name='edit_goal'),
     path('export.csv', views.export_csv, name='export_csv'),
+    path('export.<str:fmt>', views.export_meals, name='export_meals'),
+    path('exports/', views.export_job_create, name='export_job_create'),
+    path('exports/<int:pk>/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:pk>/download/', views.export_job_download, name='export_job_download'),
+    path('import/', views.import_meals_upload, name='import_meals'),
     path('copy-yesterday/', views.copy_yesterday, name='copy_yesterday'),
+    path('api/replay/', views.meal_replay, name='meal_replay'),
+    path('api/projection/', views.weight_projection, name='weight_projection'),
     path('api/food-search/', views.food_search, name='food_search'),
+    path('api/food-search/async/', views.food_search_async, name='food_search_async'),
+    path('api/food-search/stats/', views.food_search_stats, name='food_search_stats'),
+    path('api/dashboard/stats/', views.dashboard_stats, name='dashboard_stats'),
+    path('api/food/<str:code>/', views.food_lookup, name='food_lookup'),
     path('api/quick-add/', views.quick_add_food, name='quick_add_food'),
+    path('api/quick-add/batch/', views.quick_add_batch_api, name='quick_add_batch'),
+    path('api/recent-foods/', views.recent_foods_api, name='recent_foods'),
     path('favorites/add/<int:pk>/', views.add_favorite_from_meal, name='add_favorite'),
     path('favorites/quick-add/<int:fav_id>/', views.quick_add_favorite, name='quick_add_favorite'),
     path('ai/', views.ai_assist, name='ai_assist'),
@@ -1,22 +1,26 @@
 # tracker/views.py
 import datetime as dt
 import json as _json
+import logging
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.contrib.auth import login as auth_login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
-from django.db.models import Sum
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_GET
-import csv
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 from .forms import GoalForm, MealForm
 from .models import Goal, Meal
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
-from tracker.templates.tracker.services.food_api import search_openfoodfacts
+from tracker.templates.tracker.services.search_cache import acached_search, cached_search, cache_stats
+from asgiref.sync import sync_to_async
+from tracker.templates.tracker.services.food_catalog import search_local
+from tracker.templates.tracker.services.circuit_breaker import CircuitOpenError
+from tracker.templates.tracker.services.product_cache import is_barcode, lookup_product, remember_products
+from django.conf import settings
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 from .models import Meal, Goal, FavoriteFood
@@ -26,8 +30,36 @@ from django.urls import reverse
 from django.views.decorators.http import require_POST
 import json
 from django.views.decorators.http import require_POST
-from tracker.templates.tracker.services.ai_assistant import parse_message, suggest_meals, food_by_name
-from tracker.templates.tracker.services.nutrition import suggest_calorie_target, suggest_macros
+from tracker.templates.tracker.services.ai_assistant import parse_message, suggest_meals
+from tracker.templates.tracker.services.nutrition import calorie_target, macro_target, recommend
+from tracker.templates.tracker.services.recents import ORDERINGS as RECENT_ORDERINGS, recent_foods
+from tracker.templates.tracker.services.projection import DEFAULT_WEEKS, projection_for
+from tracker.templates.tracker.services.dashboard_cache import (
+    cache_stats as dashboard_cache_stats, cached_dashboard, user_etag,
+)
+from tracker.templates.tracker.services.rollups import day_totals
+from tracker.templates.tracker.services.exports import (
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES, FORMATS as EXPORT_FORMATS, ExportUnavailable, stream_csv,
+    stream_export,
+)
+from tracker.templates.tracker.services.export_jobs import JOB_FORMATS, enqueue_export, job_filename
+from .models import ExportJob
+from tracker.templates.tracker.services.meal_import import guess_format, import_meals
+from tracker.templates.tracker.services.meal_batch import (
+    log_plans, parse_plans, quick_add_batch, replay_meals, resolve_quick_add_item,
+)
+import hashlib
+import io
+import re
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
+from django.contrib.messages import get_messages
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
 
 
 @require_GET
@@ -51,142 +83,43 @@ def signup(request):
 
 # ---- Meals ------------------------------------------------------------------
 
-@login_required
-def meal_list(request):
+def _selected_day(request):
     # Date filter (defaults to today)
     selected_date_str = request.GET.get("date")
     if selected_date_str:
         try:
-            day = dt.date.fromisoformat(selected_date_str)
+            return dt.date.fromisoformat(selected_date_str)
         except ValueError:
-            day = dt.date.today()
-    else:
-        day = dt.date.today()
-
-    # Meals for the selected day (scoped to current user)
-    meals = (
-        Meal.objects.filter(user=request.user, date=day)
-        .order_by("-id")
-    )
-
-    # Daily totals
-    totals = {
-        "calories": sum(m.calories for m in meals),
-        "protein": sum(m.protein for m in meals),
-        "carbs":   sum(m.carbs   for m in meals),
-        "fat":     sum(m.fat     for m in meals),
-    }
-
-    # Goals (create defaults if missing)
-    goal, _ = Goal.objects.get_or_create(user=request.user)
-    reco = suggest_calorie_target(goal)
-    macro_reco = suggest_macros(goal, (reco.get("recommended") or goal.calories))
-
+            pass
+    return dt.date.today()
 
-    # Progress % and capped values for bar widths
-    def pct(x, g):  # avoid div-by-zero
-        return round(100 * x / g, 1) if g else 0
 
-    progress = {
-        "calories": pct(totals["calories"], goal.calories),
-        "protein":  pct(totals["protein"],  goal.protein),
-        "carbs":    pct(totals["carbs"],    goal.carbs),
-        "fat":      pct(totals["fat"],      goal.fat),
-    }
-    progress_capped = {k: min(100, v) for k, v in progress.items()}
-
-    # ---- Last 7 days calories (for the bar chart) ----
-    today = dt.date.today()
-    days = [today - dt.timedelta(days=i) for i in range(6, -1, -1)]
-    labels = [d.strftime("%b %d") for d in days]
-    kcal_map = {d: 0 for d in days}
-
-    agg = (
-        Meal.objects.filter(user=request.user, date__range=[days[0], days[-1]])
-        .values("date")
-        .annotate(kcal=Sum("calories"))
-    )
-    for row in agg:
-        kcal_map[row["date"]] = row["kcal"] or 0
+def _meal_list_etag(request):
+    """
+    The page only depends on the user's data version, the day and the
+    session's CSRF cookie (embedded in its forms). Flash messages are
+    one-off, so a page carrying them is never revalidated.
+    """
+    if not request.user.is_authenticated or len(get_messages(request)):
+        return None
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+    return user_etag(request.user.pk, "meal_list", _selected_day(request), dt.date.today(), csrf)
 
-    weekly_kcal = [kcal_map[d] for d in days]
-    favorites = FavoriteFood.objects.filter(user=request.user).order_by('-created_at')
-    
-    recent_qs = Meal.objects.filter(user=request.user).order_by('-date', '-id')[:100]
-    seen, recents = set(), []
-    for m in recent_qs:
-        key = (m.name or "").strip().lower()
-        if not key or key in seen:
-            continue
-        seen.add(key)
-
-        cal100  = m.cal_per_100g
-        pro100  = m.protein_per_100g
-        carb100 = m.carbs_per_100g
-        fat100  = m.fat_per_100g
-        if (cal100 is None or pro100 is None or carb100 is None or fat100 is None) and m.grams:
-            s = 100.0 / m.grams
-            cal100  = cal100  if cal100  is not None else round(m.calories * s, 1)
-            pro100  = pro100  if pro100  is not None else round(m.protein  * s, 1)
-            carb100 = carb100 if carb100 is not None else round(m.carbs    * s, 1)
-            fat100  = fat100  if fat100  is not None else round(m.fat      * s, 1)
-
-        recents.append({
-            "name": m.name,
-            "default_grams": m.grams or 100,
-            "cal_per_100g": cal100 or 0,
-            "protein_per_100g": pro100 or 0,
-            "carbs_per_100g": carb100 or 0,
-            "fat_per_100g": fat100 or 0,
-        })
-        if len(recents) >= 8:
-            break
-
-            # ---- badge colors for totals vs goals ----
-    def badge_status(total, goal_val, kind):
-        if not goal_val or goal_val <= 0:
-            return "secondary"
-        ratio = total / goal_val
-        if kind == "calories":
-            # under/on target = green, up to +10% = amber, beyond = red
-            if ratio <= 1.00:
-                return "success"
-            elif ratio <= 1.10:
-                return "warning"
-            else:
-                return "danger"
-        else:  # macros
-            # within ±10% of goal = green, under = amber, over = red
-            if 0.90 <= ratio <= 1.10:
-                return "success"
-            elif ratio < 0.90:
-                return "warning"
-            else:
-                return "danger"
-
-    badges = {
-        "calories": badge_status(totals["calories"], goal.calories, "calories"),
-        "protein":  badge_status(totals["protein"],  goal.protein,  "macro"),
-        "carbs":    badge_status(totals["carbs"],    goal.carbs,    "macro"),
-        "fat":      badge_status(totals["fat"],      goal.fat,      "macro"),
-    }
 
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_meal_list_etag)
+def meal_list(request):
+    day = _selected_day(request)
+    dash = cached_dashboard(request.user, day)
+    goal = dash["goal"]
+    reco, macro_reco = recommend(goal)
 
     context = {
-        "meals": meals,
-        "totals": totals,
+        **dash,
         "selected_date": day.strftime("%Y-%m-%d"),
-        "goal": goal,
-        "progress": progress,                 # raw % (e.g., 120.0)
-        "progress_capped": progress_capped,   # 0–100 (for bar widths)
-        "weekly_labels": _json.dumps(labels),
-        "weekly_kcal": _json.dumps(weekly_kcal),
-        "favorites": favorites,
-        "recents": recents,
-        "badges": badges, 
         "reco": reco,
         "macro_reco": macro_reco,
-
     }
 
     return render(request, "tracker/meal_list.html", context)
@@ -241,11 +174,9 @@ def edit_goal(request):
         return redirect("meal_list")
     return render(request, "tracker/edit_goal.html", {"form": form})
 
-@login_required
-def export_csv(request):
+def _export_queryset(request):
     """
-    Download meals as CSV.
-    Supports:
+    The user's meals narrowed by the export query string, plus a file stem:
       - ?date=YYYY-MM-DD  (single day)
       - ?start=YYYY-MM-DD&end=YYYY-MM-DD  (range)
       - otherwise: all meals for the user
@@ -256,29 +187,199 @@ def export_csv(request):
     end   = request.GET.get('end')
     date_str = request.GET.get('date')
 
-    filename = "meals.csv"
+    stem = "meals"
     try:
         if start and end:
             s = dt.date.fromisoformat(start)
             e = dt.date.fromisoformat(end)
             qs = qs.filter(date__range=[s, e])
-            filename = f"meals_{s.isoformat()}_to_{e.isoformat()}.csv"
+            stem = f"meals_{s.isoformat()}_to_{e.isoformat()}"
         elif date_str:
             d = dt.date.fromisoformat(date_str)
             qs = qs.filter(date=d)
-            filename = f"meals_{d.isoformat()}.csv"
+            stem = f"meals_{d.isoformat()}"
     except ValueError:
         messages.warning(request, "Invalid date format in query; exporting all meals.")
+    return qs, stem
+
+
+@login_required
+def export_csv(request):
+    """
+    Download meals as CSV (same filters as _export_queryset).
+    Streamed row by row, so large histories don't build up in worker memory.
+    """
+    qs, stem = _export_queryset(request)
+    resp = StreamingHttpResponse(stream_csv(qs), content_type='text/csv')
+    resp['Content-Disposition'] = f'attachment; filename="{stem}.csv"'
+    return resp
+
+
+@login_required
+def export_meals(request, fmt):
+    """
+    Full-fidelity export with every Meal column: export.ndjson,
+    export.parquet or export.arrow (the last two need pyarrow).
+    """
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"ok": False, "error": f"Unknown format: {fmt}"}, status=404)
+    qs, stem = _export_queryset(request)
+    try:
+        chunks = stream_export(qs, fmt)
+    except ExportUnavailable as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=501)
+    resp = StreamingHttpResponse(chunks, content_type=EXPORT_CONTENT_TYPES[fmt])
+    resp['Content-Disposition'] = f'attachment; filename="{stem}.{fmt}"'
+    return resp
+
+
+def _job_json(job):
+    data = {
+        "id": job.pk,
+        "status": job.status,
+        "format": job.format,
+        "status_url": reverse("export_job_status", args=[job.pk]),
+    }
+    if job.status == "done":
+        data.update(rows=job.rows, size=job.size,
+                    download_url=reverse("export_job_download", args=[job.pk]))
+    elif job.status == "failed":
+        data["error"] = job.error
+    return data
+
+
+@login_required
+@require_POST
+def export_job_create(request):
+    """
+    Queue a background export and return its id right away (202).
+    POST: format=csv|ndjson|parquet|arrow, and optionally date=YYYY-MM-DD
+    or start/end. `manage.py run_export_jobs` does the work; poll status_url.
+    """
+    fmt = request.POST.get("format") or "csv"
+    if fmt not in JOB_FORMATS:
+        return JsonResponse({"ok": False, "error": f"Unknown format: {fmt}"}, status=400)
+    date_str = request.POST.get("date")
+    start = request.POST.get("start") or date_str
+    end   = request.POST.get("end") or date_str
+    try:
+        start = dt.date.fromisoformat(start) if start else None
+        end   = dt.date.fromisoformat(end) if end else None
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Invalid date (use YYYY-MM-DD)"}, status=400)
+
+    try:
+        job = enqueue_export(request.user, fmt, start, end)
+    except ExportUnavailable as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=400)
+    return JsonResponse({"ok": True, **_job_json(job)}, status=202)
+
+
+@login_required
+@require_GET
+def export_job_status(request, pk):
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    return JsonResponse({"ok": True, **_job_json(job)})
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=a-b" / "bytes=a-" / "bytes=-n"
+    range, None to send the whole file, or "unsatisfiable".
+    Multi-range requests are answered with the whole file (allowed by RFC 9110).
+    """
+    m = _RANGE_RE.match(header.strip()) if header else None
+    if not m or m.group(1) == m.group(2) == "":
+        return None
+    first, last = m.group(1), m.group(2)
+    if first == "":                       # suffix: last n bytes
+        n = int(last)
+        if n == 0:
+            return "unsatisfiable"
+        return max(0, size - n), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return "unsatisfiable"
+    return start, end
+
+
+def _file_range(f, start, length, block=64 * 1024):
+    try:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(block, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
 
-    resp = HttpResponse(content_type='text/csv')
-    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
-    w = csv.writer(resp)
-    w.writerow(['Date', 'Name', 'Calories', 'Protein', 'Carbs', 'Fat'])
-    for m in qs.order_by('date', 'id'):
-        w.writerow([m.date, m.name, m.calories, m.protein, m.carbs, m.fat])
+
+@login_required
+@require_GET
+def export_job_download(request, pk):
+    """
+    Serve a finished export with HTTP Range support, so an interrupted
+    download resumes from the last byte (Range / If-Range, 206, 416).
+    """
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    if job.status != "done" or not job.file:
+        return JsonResponse({"ok": False, "error": f"Export is {job.status}"}, status=409)
+
+    size = job.size if job.size is not None else job.file.size
+    etag = quote_etag(f"export-{job.pk}-{size}-{int(job.finished_at.timestamp()) if job.finished_at else 0}")
+    content_type = EXPORT_CONTENT_TYPES[job.format]
+    filename = job_filename(job)
+
+    rng = _parse_range(request.headers.get("Range"), size)
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        rng = None                        # file changed since the partial download: start over
+
+    if rng == "unsatisfiable":
+        resp = HttpResponse(status=416)
+        resp["Content-Range"] = f"bytes */{size}"
+    elif rng is None:
+        resp = FileResponse(job.file.open("rb"), content_type=content_type,
+                            as_attachment=True, filename=filename)
+    else:
+        start, end = rng
+        resp = StreamingHttpResponse(_file_range(job.file.open("rb"), start, end - start + 1),
+                                     content_type=content_type, status=206)
+        resp["Content-Range"] = f"bytes {start}-{end}/{size}"
+        resp["Content-Length"] = str(end - start + 1)
+        resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    resp["Accept-Ranges"] = "bytes"
+    resp["ETag"] = etag
     return resp
 
 
+@login_required
+@require_POST
+def import_meals_upload(request):
+    """
+    Bulk-import meals from an uploaded CSV/TSV or NDJSON file (multipart
+    field `file`; optional `format`, `strict=1`). Rows are validated while
+    streaming and inserted in batches in one transaction; the JSON report
+    lists invalid rows by line number.
+    """
+    upload = request.FILES.get("file")
+    if upload is None:
+        return JsonResponse({"ok": False, "error": "No file uploaded"}, status=400)
+    fmt = request.POST.get("format") or guess_format(upload.name)
+    if fmt not in ("csv", "ndjson"):
+        return JsonResponse({"ok": False, "error": f"Unknown format: {fmt}"}, status=400)
+
+    fh = io.TextIOWrapper(upload.file, encoding="utf-8-sig", errors="replace", newline="")
+    report = import_meals(request.user, fh, fmt, strict=request.POST.get("strict") in ("1", "true", "on"))
+    return JsonResponse({"ok": not (report["skipped"] and not report["created"]), **report})
+
+
 @login_required
 def copy_yesterday(request):
     """
@@ -293,91 +394,195 @@ def copy_yesterday(request):
 
     source = target - dt.timedelta(days=1)
 
-    src_meals = Meal.objects.filter(user=request.user, date=source)
-    clones = [
-        Meal(
-            user=request.user,
-            name=m.name,
-            calories=m.calories,
-            protein=m.protein,
-            carbs=m.carbs,
-            fat=m.fat,
-            date=target,
-        )
-        for m in src_meals
-    ]
-
-    if clones:
-        Meal.objects.bulk_create(clones)
-        messages.success(request, f"Copied {len(clones)} meal(s) from {source} → {target}.")
+    n = replay_meals(request.user, source, source, target)["created"]
+    if n:
+        messages.success(request, f"Copied {n} meal(s) from {source} → {target}.")
     else:
         messages.info(request, f"No meals found on {source} to copy.")
 
     return redirect(f"{reverse('meal_list')}?date={target.isoformat()}")
 
 
+@login_required
+@require_POST
+def meal_replay(request):
+    """
+    Replay a range of days onto another range, e.g. last week's meal prep
+    over the next month. POST: src_start, src_end, dst_start, optional
+    dst_end (default: one copy of the source range) and replace=1 to clear
+    the target days first. Every meal field is copied, inside the database.
+    """
+    try:
+        src_start = dt.date.fromisoformat(request.POST["src_start"])
+        src_end   = dt.date.fromisoformat(request.POST.get("src_end") or request.POST["src_start"])
+        dst_start = dt.date.fromisoformat(request.POST["dst_start"])
+        dst_end   = request.POST.get("dst_end")
+        dst_end   = dt.date.fromisoformat(dst_end) if dst_end else None
+    except KeyError as e:
+        return JsonResponse({"ok": False, "error": f"Missing {e.args[0]}"}, status=400)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Invalid date (use YYYY-MM-DD)"}, status=400)
+
+    try:
+        result = replay_meals(request.user, src_start, src_end, dst_start, dst_end,
+                              replace=request.POST.get("replace") in ("1", "true", "on"))
+    except ValueError as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=400)
+    return JsonResponse({
+        "ok": True,
+        **result,
+        "redirect": reverse("meal_list") + f"?date={dst_start.isoformat()}",
+    })
+
+
 @login_required
 def food_search(request):
     q = (request.GET.get("q") or "").strip()
     if not q:
         return JsonResponse({"results": []})
+    mode = getattr(settings, "FOOD_SEARCH_MODE", "local-first")
+    results = []
+    if mode in ("local", "local-first"):
+        results = search_local(q)
+    if not results and mode != "local":
+        try:
+            results = cached_search(q, on_fetch=remember_products)
+        except CircuitOpenError:
+            # upstream is down: answer from the local catalog, don't wait on it
+            results = search_local(q) if mode == "remote" else []
+        except Exception:
+            logger.warning("food search upstream failed for %r", q, exc_info=True)
+            results = []
+    return _search_response(request, results)
+
+
+def _search_response(request, results):
+    """
+    Search results with a strong ETag of the body itself: a client
+    repeating a search gets a 304 instead of the payload.
+    """
+    body = _json.dumps({"results": results}, cls=DjangoJSONEncoder).encode()
+    etag = quote_etag(hashlib.sha1(body).hexdigest())
+    resp = get_conditional_response(request, etag=etag)
+    if resp is None:
+        resp = HttpResponse(body, content_type="application/json")
+        resp["ETag"] = etag
+    patch_cache_control(resp, private=True, max_age=settings.FOOD_SEARCH_BROWSER_TTL)
+    return resp
+
+
+@login_required
+async def food_search_async(request):
+    """
+    Same as food_search, but non-blocking: serve it under an ASGI server
+    (calorie_counter.asgi) so one worker can hold many in-flight searches.
+    """
+    q = (request.GET.get("q") or "").strip()
+    if not q:
+        return JsonResponse({"results": []})
+    mode = getattr(settings, "FOOD_SEARCH_MODE", "local-first")
+    results = []
+    if mode in ("local", "local-first"):
+        results = await sync_to_async(search_local)(q)
+    if not results and mode != "local":
+        try:
+            results = await acached_search(q, on_fetch=remember_products)
+        except CircuitOpenError:
+            results = await sync_to_async(search_local)(q) if mode == "remote" else []
+        except Exception:
+            logger.warning("food search upstream failed for %r", q, exc_info=True)
+            results = []
+    return _search_response(request, results)
+
+
+@login_required
+def food_lookup(request, code):
+    """
+    Resolve a barcode (OFF product code) to per-100g macros.
+    Local product cache and the user's own history first; network only on a miss.
+    """
+    code = code.strip()
+    if not is_barcode(code):
+        return JsonResponse({"result": None, "error": "invalid barcode"}, status=400)
     try:
-        results = search_openfoodfacts(q)
+        result, source = lookup_product(code, user=request.user)
+    except CircuitOpenError:
+        return JsonResponse({"result": None, "error": "food database unavailable"}, status=503)
     except Exception:
-        results = []
-    return JsonResponse({"results": results})
+        logger.warning("product lookup failed for %s", code, exc_info=True)
+        return JsonResponse({"result": None, "error": "lookup failed"}, status=502)
+    if result is None:
+        return JsonResponse({"result": None, "error": "not found"}, status=404)
+    return JsonResponse({"result": result, "source": source})
+
+
+@login_required
+def food_search_stats(request):
+    """Cache hit/miss counters for monitoring (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "forbidden"}, status=403)
+    return JsonResponse(cache_stats())
+
+
+@login_required
+def dashboard_stats(request):
+    """Dashboard cache hit rate for monitoring (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "forbidden"}, status=403)
+    return JsonResponse(dashboard_cache_stats())
 
 
 # tracker/views.py
 
+@login_required
+def recent_foods_api(request):
+    """The user's foods for quick re-adding: ?order=recent (default) or frequent, ?limit=1..50."""
+    order = request.GET.get("order") or "recent"
+    if order not in RECENT_ORDERINGS:
+        return JsonResponse({"ok": False, "error": f"order must be one of {', '.join(RECENT_ORDERINGS)}"}, status=400)
+    try:
+        limit = min(max(int(request.GET.get("limit") or 8), 1), 50)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "limit must be a number"}, status=400)
+    return JsonResponse({"ok": True, "results": recent_foods(request.user, limit=limit, order=order)})
+
+
 @login_required
 @require_POST
 def quick_add_food(request):
     try:
-        name     = request.POST['name']
-        grams    = float(request.POST.get('grams', 100))
-        # per-100g values from client (preferred), else compute from totals+grams
-        cal100   = request.POST.get('cal_per_100g')
-        pro100   = request.POST.get('protein_per_100g')
-        carb100  = request.POST.get('carbs_per_100g')
-        fat100   = request.POST.get('fat_per_100g')
-        date_str = request.POST.get('date') or dt.date.today().isoformat()
-        day      = dt.date.fromisoformat(date_str)
-
-        # Totals (client may send them, but we'll recompute on save)
-        calories = int(float(request.POST.get('calories', 0)))
-        protein  = float(request.POST.get('protein', 0))
-        carbs    = float(request.POST.get('carbs', 0))
-        fat      = float(request.POST.get('fat', 0))
-
-        meal = Meal(
-            user=request.user,
-            name=name,
-            date=day,
-            grams=grams,
-            calories=calories, protein=protein, carbs=carbs, fat=fat,
-            # set per-100g if provided
-            cal_per_100g=float(cal100) if cal100 else None,
-            protein_per_100g=float(pro100) if pro100 else None,
-            carbs_per_100g=float(carb100) if carb100 else None,
-            fat_per_100g=float(fat100) if fat100 else None,
-            source="OFF",
-            source_id=request.POST.get('source_id',''),
-        )
-
-        # If per-100g missing but totals+grams present, derive them (so future edits still work)
-        if meal.grams and meal.cal_per_100g is None and grams > 0:
-            scale100 = 100.0 / grams
-            meal.cal_per_100g     = round(meal.calories * scale100, 1)
-            meal.protein_per_100g = round(meal.protein  * scale100, 1)
-            meal.carbs_per_100g   = round(meal.carbs    * scale100, 1)
-            meal.fat_per_100g     = round(meal.fat      * scale100, 1)
-
+        meal = Meal(user=request.user, **resolve_quick_add_item(request.POST, dt.date.today()))
         meal.save()  # .save() will recalc totals from per-100g if available
         return JsonResponse({"ok": True})
     except Exception as e:
         return JsonResponse({"ok": False, "error": str(e)}, status=400)
-    
+
+
+@login_required
+@require_POST
+def quick_add_batch_api(request):
+    """
+    Log several foods in one round trip. JSON body: {"date": "YYYY-MM-DD",
+    "items": [quick-add entries], "all_or_nothing": false} or just the list.
+    Entries take the same fields as api/quick-add/. One bulk INSERT; the
+    response has a result (id or error) per entry, in order.
+    """
+    try:
+        data = _json.loads(request.body or b"[]")
+    except ValueError as e:
+        return JsonResponse({"ok": False, "error": f"Bad JSON: {e}"}, status=400)
+    if isinstance(data, list):
+        data = {"items": data}
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return JsonResponse({"ok": False, "error": "items must be a list"}, status=400)
+    try:
+        day = dt.date.fromisoformat(data["date"]) if data.get("date") else dt.date.today()
+        report = quick_add_batch(request.user, items, day, all_or_nothing=bool(data.get("all_or_nothing")))
+    except ValueError as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=400)
+    return JsonResponse({"ok": all(r["ok"] for r in report["results"]), **report})
+
 
 @login_required
 def add_favorite_from_meal(request, pk):
@@ -452,13 +657,7 @@ def ai_assist(request):
     selected_date_str = request.GET.get("date")
     day = dt.date.fromisoformat(selected_date_str) if selected_date_str else dt.date.today()
 
-    meals = Meal.objects.filter(user=request.user, date=day)
-    totals = {
-        "kcal": sum(m.calories for m in meals),
-        "p":    sum(m.protein  for m in meals),
-        "c":    sum(m.carbs    for m in meals),
-        "f":    sum(m.fat      for m in meals),
-    }
+    totals = day_totals(request.user, day)
     goal, _ = Goal.objects.get_or_create(user=request.user)
     need = {
         "kcal": max(goal.calories - totals["kcal"], 0),
@@ -474,18 +673,38 @@ def ai_assist(request):
         "plans": plans,
     })
 
+def _ai_suggest_day(params):
+    """The ?date= the coach plans for (today when missing); ValueError when malformed."""
+    date_str = params.get("date")
+    return dt.date.fromisoformat(date_str) if date_str else dt.date.today()
+
+
+def _ai_suggest_etag(request):
+    """GET polls: plans only depend on the user's data, the day and the message."""
+    if request.method != "GET" or not request.user.is_authenticated:
+        return None
+    q = request.GET
+    try:
+        day = _ai_suggest_day(q)
+    except ValueError:
+        return None     # the view answers 400
+    return user_etag(request.user.pk, "ai_suggest", day, q.get("message", ""), q.get("solver", ""),
+                     settings.COACH_SOLVER, settings.COACH_SOLVER_DEADLINE_MS)
+
+
 @login_required
-@require_POST
+@require_http_methods(["GET", "POST"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_ai_suggest_etag)
 def ai_suggest_api(request):
+    """Coach plans for the rest of a day. POST from the page; GET (cacheable, ETag) for polling clients."""
+    params = request.POST if request.method == "POST" else request.GET
     # compute remaining need for the posted date
-    day = dt.date.fromisoformat(request.POST.get("date"))
-    meals = Meal.objects.filter(user=request.user, date=day)
-    totals = {
-        "kcal": sum(m.calories for m in meals),
-        "p":    sum(m.protein  for m in meals),
-        "c":    sum(m.carbs    for m in meals),
-        "f":    sum(m.fat      for m in meals),
-    }
+    try:
+        day = _ai_suggest_day(params)
+    except ValueError:
+        return JsonResponse({"error": "date must be YYYY-MM-DD"}, status=400)
+    totals = day_totals(request.user, day)
     goal, _ = Goal.objects.get_or_create(user=request.user)
     need = {
         "kcal": max(goal.calories - totals["kcal"], 0),
@@ -494,9 +713,10 @@ def ai_suggest_api(request):
         "f":    max(goal.fat      - totals["f"],    0),
     }
 
-    msg = request.POST.get("message", "")
+    msg = params.get("message", "")
     prefs = parse_message(msg)
-    plans = suggest_meals(need, prefs)
+    solver = settings.COACH_SOLVER or params.get("solver") in ("1", "true", "on")
+    plans = suggest_meals(need, prefs, solver=solver, deadline_ms=settings.COACH_SOLVER_DEADLINE_MS)
     return JsonResponse({"need": need, "plans": plans})
 
 
@@ -504,10 +724,11 @@ def ai_suggest_api(request):
 @login_required
 @require_POST
 def ai_log_plan(request):
-    created = 0
-    errors = []
-    seen = 0
-
+    """
+    Log coach plans all-or-nothing with one INSERT. POST form fields
+    date + items (JSON list), or plans (JSON list of {date, items}) to log
+    several days at once; a JSON request body with the same keys also works.
+    """
     # date
     date_str = request.POST.get("date")
     try:
@@ -515,81 +736,48 @@ def ai_log_plan(request):
     except Exception:
         day = dt.date.today()
 
-    # items (json)
+    # items / plans (json)
     try:
-        items = _json.loads(request.POST.get("items", "[]"))
-    except Exception as e:
-        return JsonResponse({"ok": False, "created": 0, "errors": [f"Bad JSON: {e}"]})
-
-    for it in items:
-        seen += 1
-        name = (it.get("name") or "").strip()
-        try:
-            grams = float(it.get("grams") or 0)
-        except Exception:
-            grams = 0
-
-        if not name:
-            errors.append("Missing name")
-            continue
-        if grams <= 0:
-            errors.append(f"{name}: grams <= 0")
-            continue
-
-        f = food_by_name(name)
-
-        if f:
-            cal100, p100, c100, fat100 = f.cal, f.p, f.c, f.f
+        if request.content_type == "application/json":
+            data = _json.loads(request.body or b"{}")
         else:
-            # fallback from totals sent by client
-            try:
-                kcal = float(it.get("kcal") or 0)
-                p    = float(it.get("p") or 0)
-                c    = float(it.get("c") or 0)
-                fat  = float(it.get("f") or 0)
-            except Exception:
-                kcal = p = c = fat = 0.0
-
-            if (kcal, p, c, fat) == (0, 0, 0, 0):
-                errors.append(f"{name}: not in library and no macros provided")
-                continue
-
-            factor = 100.0 / grams  # grams > 0 checked above
-            cal100 = round(kcal * factor, 2)
-            p100   = round(p    * factor, 2)
-            c100   = round(c    * factor, 2)
-            fat100 = round(fat  * factor, 2)
-
-        Meal.objects.create(
-            user=request.user,
-            name=name,
-            date=day,
-            grams=grams,
-            cal_per_100g=cal100,
-            protein_per_100g=p100,
-            carbs_per_100g=c100,
-            fat_per_100g=fat100,
-            source="coach",
-            source_id="plan",
-        )
-        created += 1
+            data = {k: _json.loads(request.POST[k]) for k in ("items", "plans") if k in request.POST}
+        plans = parse_plans(data, day)
+    except Exception as e:
+        return JsonResponse({"ok": False, "created": 0, "errors": [f"Bad JSON: {e}"]}, status=400)
 
+    report = log_plans(request.user, plans)
+    first_day = plans[0]["date"] if plans else day
     return JsonResponse({
-        "ok": True,
-        "created": created,
-        "seen": seen,
-        "errors": errors,
-        "redirect": reverse("meal_list") + f"?date={day.isoformat()}",
-    })
+        "ok": not report["errors"],
+        **report,
+        "redirect": reverse("meal_list") + f"?date={first_day.isoformat()}",
+    }, status=400 if report["errors"] else 200)
 
 # tracker/views.py (inside meal_list, after totals/goal are computed)
 
 
+@login_required
+def weight_projection(request):
+    """Projected weight, one point per week (?weeks=1..52, default 12), for the dashboard chart."""
+    try:
+        weeks = int(request.GET.get("weeks") or DEFAULT_WEEKS)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "weeks must be a number"}, status=400)
+    if not 1 <= weeks <= 52:
+        return JsonResponse({"ok": False, "error": "weeks must be between 1 and 52"}, status=400)
+    chart = projection_for(request.user, weeks)
+    if chart is None:
+        return JsonResponse({"ok": False, "error": "Add sex, age, height and weight in Goals to get a projection."},
+                            status=400)
+    return JsonResponse({"ok": True, **chart})
+
+
 @login_required
 @require_POST
 def apply_calorie_reco(request):
     goal, _ = Goal.objects.get_or_create(user=request.user)
-    rec = suggest_calorie_target(goal)
+    rec = calorie_target(goal)
     if rec.get("recommended"):
         goal.calories = rec["recommended"]
         goal.save()
@@ -607,12 +795,12 @@ def apply_macro_reco(request):
     use_reco = request.POST.get("use_reco") == "1"
     calories_target = goal.calories or 2000
     if use_reco:
-        rec = suggest_calorie_target(goal)
+        rec = calorie_target(goal)
         if rec.get("recommended"):
             calories_target = rec["recommended"]
             goal.calories = calories_target  # also update calories when using reco
 
-    m = suggest_macros(goal, calories_target)
+    m = macro_target(goal, calories_target)
     goal.protein = m["protein"]
     goal.carbs   = m["carbs"]
     goal.fat     = m["fat"]